@@ -1,14 +1,36 @@
 # -*- coding: utf-8 -*-
 # flake8: noqa
 
+import importlib
 import os
 import sys
 
 from . import _timing
-from .autocrop import Cropper
-from .cli import command_line_interface
 from .__version__ import __version__
 
+# Public names loaded on first access (PEP 562), so `import autocrop` and
+# `autocrop --version` do not pay for importing OpenCV, NumPy and Pillow.
+_LAZY_ATTRIBUTES = {
+    "Cropper": ".autocrop",
+    "command_line_interface": ".cli",
+}
+
+__all__ = ["Cropper", "command_line_interface", "__version__"]
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
 _timing.mark_imports_complete()
 
 __doc__ = """
@@ -33,4 +55,4 @@ v_path = os.path.abspath(
 sys.path.insert(0, v_path)
 
 if __name__ == "__main__":
-    command_line_interface()
+    __getattr__("command_line_interface")()
@@ -1,7 +1,10 @@
+import importlib
+import sys
 import time
 
 IMPORT_START = time.perf_counter()
 _IMPORT_SECONDS = None
+_DEFERRED_IMPORT_SECONDS = 0.0
 
 
 def mark_imports_complete():
@@ -10,8 +13,24 @@ def mark_imports_complete():
     _IMPORT_SECONDS = time.perf_counter() - IMPORT_START
 
 
+def timed_import(name):
+    """
+    Import module `name`, counting its first import towards import duration.
+
+    The package defers importing OpenCV, NumPy and Pillow until they are
+    needed; this keeps the time spent on them visible in verbose timings.
+    """
+    global _DEFERRED_IMPORT_SECONDS
+    module = sys.modules.get(name)
+    if module is None:
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        _DEFERRED_IMPORT_SECONDS += time.perf_counter() - started
+    return module
+
+
 def import_seconds():
     """Return completed import duration, or duration so far while importing."""
     if _IMPORT_SECONDS is None:
         return time.perf_counter() - IMPORT_START
-    return _IMPORT_SECONDS
+    return _IMPORT_SECONDS + _DEFERRED_IMPORT_SECONDS
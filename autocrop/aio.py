@@ -0,0 +1,128 @@
+"""
+Asyncio cropping.
+
+`acrop` and `acrop_many` run every blocking step of a crop, including
+reading path inputs from disk, on a thread pool, so the event loop only
+awaits results and stays responsive while images are decoded, detected and
+resized. `acrop_many` keeps at most `concurrency` items in flight, pulls
+inputs lazily, and cancels items that have not started when it is closed or
+cancelled.
+"""
+
+import asyncio
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .pipeline import run_job
+
+# Worker threads of the executor shared by calls that do not pass one.
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def default_executor():
+    """Return the thread pool shared by async crops, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=DEFAULT_WORKERS, thread_name_prefix="autocrop-async"
+            )
+        return _executor
+
+
+async def acrop(cropper, path_or_array, executor=None):
+    """
+    Crop one image on `executor` without blocking the event loop.
+
+    Same inputs, return value and exceptions as `Cropper.crop`. Cancelling
+    the awaiting task stops waiting at once; a crop that has already started
+    still finishes on its worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor or default_executor(), cropper.crop, path_or_array
+    )
+
+
+async def _items(items):
+    """Iterate a regular or asynchronous iterable of inputs."""
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def acrop_many(cropper, items, concurrency=4, ordered=True, encode=None, executor=None):
+    """
+    Crop many images asynchronously with bounded concurrency.
+
+    Parameters
+    ----------
+    - `cropper` : `Cropper`
+    - `items` : iterable or async iterable
+        * Crop inputs accepted by `Cropper.crop`, pulled lazily as slots free
+          up.
+    - `concurrency` : `int`, default=4
+        * Most items in flight at once. Items run on `executor`, so its
+          worker count also caps how many crop in parallel.
+    - `ordered` : `bool`, default=True
+        * Yield results in input order. When False, results are yielded as
+          soon as each item finishes.
+    - `encode` : {`str`, callable, `None`}, default=None
+        * Encode crops like `crop_many` does.
+    - `executor` : {`concurrent.futures.Executor`, `None`}, default=None
+        * Runs the blocking work. Defaults to `default_executor()`.
+
+    Yields
+    ------
+    - `CropResult`
+        * One per input item, with per-item errors reported on the result
+          instead of raised.
+
+    Closing the generator, or cancelling the task iterating it, cancels the
+    items that have not started; items already running finish on their
+    worker threads and their results are dropped.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    loop = asyncio.get_running_loop()
+    executor = executor or default_executor()
+    inputs = _items(items)
+    pending = deque()
+    submitted, exhausted = 0, False
+    try:
+        while True:
+            while not exhausted and len(pending) < concurrency:
+                try:
+                    item = await inputs.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                pending.append(
+                    loop.run_in_executor(executor, run_job, cropper, submitted, item, encode)
+                )
+                submitted += 1
+            if not pending:
+                return
+            if ordered:
+                yield await pending.popleft()
+                continue
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for result in sorted((future.result() for future in finished), key=_index):
+                yield result
+            pending = deque(future for future in pending if future not in finished)
+    finally:
+        for future in pending:
+            future.cancel()
+        await inputs.aclose()
+
+
+def _index(result):
+    return result.index
@@ -1,10 +1,52 @@
+import io
 import itertools
+import math
+import os
+import time
+from collections import namedtuple
 
 import cv2
 import numpy as np
 from PIL import Image, ImageOps
 
-from .yunet import YuNetDetector
+from .cache import content_key
+from .constants import DETECT_STRATEGIES, RESIZE_BACKENDS
+from .mapped import map_file
+from .metrics import CropMetrics, source_label, timed
+from .regions import decode_window, reduce_decode
+from .tiling import detect_tiled
+from .yunet import CoarseToFineDetector, detect_scored, detection_proxy, get_detector
+
+ORIENTATION_EXIF_TAG = 274
+TRANSPOSED_ORIENTATIONS = frozenset({5, 6, 7, 8})
+
+# Orders `Cropper(channel_order=...)` accepts. "input" keeps the input's own
+# order: BGR/BGRA for arrays, RGB/RGBA for files and encoded bytes.
+CHANNEL_ORDERS = ("rgb", "bgr", "input")
+
+# Array types cv2.cvtColor converts; others are swapped with NumPy indexing.
+CV2_COLOR_DTYPES = (np.uint8, np.uint16, np.float32)
+
+# Array types cv2.resize handles with INTER_AREA.
+CV2_RESIZE_DTYPES = (np.uint8, np.uint16, np.int16, np.float32, np.float64)
+
+# Pillow `reducing_gap` for "pillow-reduce". Downscales by more than this
+# factor first shrink by an integer factor with `Image.reduce`.
+REDUCING_GAP = 2.0
+
+# Inputs Cropper decodes with Pillow: file paths and encoded image bytes.
+ENCODED_INPUT_TYPES = (str, os.PathLike, bytes, bytearray, memoryview)
+
+# A decoded crop input. `image` may be a reduced-resolution decode of
+# `source`, in which case `full_shape` is the (height, width) of the original.
+# `format` is the Pillow format of encoded sources, and None for arrays.
+# `cache_key` is the detection cache key of the input, when caching is enabled.
+# `metrics` is the `CropMetrics` of the crop, when a metrics callback is set.
+DecodedImage = namedtuple(
+    "DecodedImage",
+    ["source", "image", "image_is_bgr", "full_shape", "format", "cache_key", "metrics"],
+    defaults=(None, None),
+)
 
 
 class ImageReadError(Exception):
@@ -40,6 +82,129 @@ def distance(pt1, pt2):
     return distance
 
 
+def _rows(values, n):
+    """Return an int64 (n, 2) array from one pair or n pairs."""
+    return np.broadcast_to(np.asarray(values, dtype=np.int64).reshape(-1, 2), (n, 2))
+
+
+def safe_zooms(boxes, image_sizes, face_percent):
+    """
+    Vectorized `Cropper._determine_safe_zoom` for N boxes at once.
+
+    Parameters
+    ----------
+    - `boxes` : array-like of shape (N, 4)
+        * Integer (x, y, w, h) face boxes.
+    - `image_sizes` : array-like of shape (N, 2) or (2,)
+        * (height, width) of the image each box belongs to.
+    - `face_percent` : `int`
+        * Preferred zoom, returned where the image leaves enough room.
+
+    Returns
+    -------
+    - `zooms` : `np.ndarray` of shape (N,)
+        * The same values `_determine_safe_zoom` returns for each box.
+    """
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    n = len(boxes)
+    imgh, imgw = _rows(image_sizes, n).T
+    x, y, w, h = boxes.T
+    half_w = np.trunc(w / 2).astype(np.int64)
+    half_h = np.trunc(h / 2).astype(np.int64)
+    center = np.stack([x + half_w, y + half_h], axis=-1)
+    corners = np.stack(
+        [np.stack(c, axis=-1) for c in itertools.product((x, x + w), (y, y + h))],
+        axis=1,
+    )
+    zero = np.zeros(n, dtype=np.int64)
+    image_corners = np.stack(
+        [
+            np.stack(point, axis=-1)
+            for point in [(zero, zero), (zero, imgh), (imgw, imgh), (imgw, zero), (zero, zero)]
+        ],
+        axis=1,
+    )
+    # Shapes below are (N, corner, side, xy), mirroring intersect() per pair.
+    side_start = image_corners[:, None, :4]
+    side_vector = image_corners[:, None, 1:] - side_start
+    da = (corners - center[:, None])[:, :, None]
+    dap = np.stack([-da[..., 1], da[..., 0]], axis=-1)
+    denom = (dap * side_vector).sum(axis=-1).astype(float)
+    num = (dap * (center[:, None, None] - side_start)).sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pt = (num / denom)[..., None] * side_vector + side_start
+        offset = pt - center[:, None, None]
+        # matmul uses the same dot kernel as np.linalg.norm in distance(), so
+        # results round identically.
+        dist_to_pt = np.sqrt((offset[..., None, :] @ offset[..., :, None])[..., 0, 0])
+        corner_dist = np.linalg.norm((corners - center[:, None]).astype(float), axis=-1)
+        ratios = 100 * corner_dist[:, :, None] / dist_to_pt
+    limit = np.stack([imgw, imgh], axis=-1)[:, None, None]
+    valid = (
+        (denom != 0)
+        & np.isfinite(pt).all(axis=-1)
+        & (pt >= 0).all(axis=-1)
+        & (pt <= limit).all(axis=-1)
+        & (dist_to_pt > 0)
+    )
+    ratios = np.where(valid, ratios, -np.inf).reshape(n, 16)
+    return np.maximum(ratios.max(axis=1, initial=-np.inf), face_percent)
+
+
+def crop_positions(boxes, image_sizes, width=500, height=500, face_percent=50):
+    """
+    Vectorized `Cropper._crop_positions` for N boxes at once.
+
+    Parameters
+    ----------
+    - `boxes` : array-like of shape (N, 4)
+        * Integer (x, y, w, h) face boxes.
+    - `image_sizes` : array-like of shape (N, 2) or (2,)
+        * (height, width) of the image each box belongs to.
+    - `width`, `height`, `face_percent` : `int`
+        * Output size and face percent, as given to `Cropper`.
+
+    Returns
+    -------
+    - `positions` : `np.ndarray` of shape (N, 4)
+        * (top, bottom, left, right) crop rectangles, identical to
+          `_crop_positions` for every box.
+    """
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    imgh, imgw = _rows(image_sizes, len(boxes)).T
+    x, y, w, h = boxes.T
+    zoom = safe_zooms(boxes, image_sizes, face_percent)
+    aspect_ratio = width / height
+
+    if height >= width:
+        height_crop = h * 100.0 / zoom
+        width_crop = aspect_ratio * height_crop
+    else:
+        width_crop = w * 100.0 / zoom
+        height_crop = width_crop / aspect_ratio
+
+    xpad = (width_crop - w) / 2
+    ypad = (height_crop - h) / 2
+    h1 = np.trunc(x - xpad).astype(np.int64)
+    h2 = np.trunc(x + w + xpad).astype(np.int64)
+    v1 = np.trunc(y - ypad).astype(np.int64)
+    v2 = np.trunc(y + h + ypad).astype(np.int64)
+
+    h2 = np.where(h1 < 0, h2 - h1, h2)
+    h1 = np.maximum(h1, 0)
+    h1 = np.where(h2 > imgw, h1 - (h2 - imgw), h1)
+    h2 = np.minimum(h2, imgw)
+    v2 = np.where(v1 < 0, v2 - v1, v2)
+    v1 = np.maximum(v1, 0)
+    v1 = np.where(v2 > imgh, v1 - (v2 - imgh), v1)
+    v2 = np.minimum(v2, imgh)
+
+    return np.stack(
+        [np.maximum(v1, 0), np.minimum(v2, imgh), np.maximum(h1, 0), np.minimum(h2, imgw)],
+        axis=-1,
+    )
+
+
 def bgr_to_rbg(img):
     """Given a BGR (cv2) numpy array, returns a RBG (standard) array."""
     # Don't do anything for grayscale images
@@ -51,6 +216,45 @@ def bgr_to_rbg(img):
     return img
 
 
+def resize_image(image, size, backend="pillow"):
+    """
+    Return `image` resized to `size` (width, height) as a new array.
+
+    * "pillow": Pillow's default resampling filter.
+    * "cv2-area": `cv2.resize` with `INTER_AREA`, which works on the array
+      directly without round trips through Pillow images.
+    * "pillow-reduce": Pillow resampling preceded by an integer `reduce()`
+      step for large downscales, via `reducing_gap`.
+
+    Arrays cv2 cannot resize fall back to "pillow".
+    """
+    if backend == "cv2-area" and image.dtype in CV2_RESIZE_DTYPES:
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    reducing_gap = REDUCING_GAP if backend == "pillow-reduce" else None
+    with Image.fromarray(image) as img:
+        return np.array(img.resize(size, reducing_gap=reducing_gap))
+
+
+def swap_red_blue(image, in_place=False):
+    """
+    Return a BGR(A) array as RGB(A), or the reverse, with one conversion.
+
+    Without `in_place` the result is a new array and `image` is untouched, so
+    `image` may be a view of a caller's buffer. With `in_place`, `image` is
+    converted in its own memory and returned.
+    """
+    code = {3: cv2.COLOR_BGR2RGB, 4: cv2.COLOR_BGRA2RGBA}[image.shape[2]]
+    if image.dtype in CV2_COLOR_DTYPES:
+        if in_place:
+            return cv2.cvtColor(image, code, dst=image)
+        return cv2.cvtColor(image, code)
+    swapped = image[:, :, [2, 1, 0, 3][: image.shape[2]]]
+    if in_place:
+        image[...] = swapped
+        return image
+    return swapped
+
+
 def detector_color_image(image, image_is_bgr):
     """
     Return a 3-channel BGR image suitable for OpenCV DNN face detectors.
@@ -75,6 +279,38 @@ def detector_color_image(image, image_is_bgr):
     return image
 
 
+def detection_scale(image, max_side):
+    """Return the factor `detection_proxy` scales `image` by, 1.0 if it does not."""
+    long_side = max(image.shape[:2])
+    if max_side is None or long_side <= max_side:
+        return 1.0
+    return max_side / long_side
+
+
+def scale_boxes(boxes, scale):
+    """Map (x, y, w, h) boxes by (x, y) scale factors, rounding to pixels."""
+    if scale == (1.0, 1.0) or len(boxes) == 0:
+        return boxes
+    scale_x, scale_y = scale
+    factors = np.array([scale_x, scale_y, scale_x, scale_y])
+    return np.round(np.asarray(boxes) * factors).astype(np.int32)
+
+
+def image_for_format(image, image_format):
+    """Return a Pillow image compatible with the requested output format."""
+    img_new = Image.fromarray(image)
+    if image_format in {"JPEG", "EPS", "PCX"} and img_new.mode in {"LA", "P", "RGBA"}:
+        return img_new.convert("RGB")
+    return img_new
+
+
+def encode_image(image, image_format, **save_kwargs):
+    """Return an RGB/RGBA array encoded as `image_format` bytes."""
+    buffer = io.BytesIO()
+    image_for_format(image, image_format).save(buffer, format=image_format, **save_kwargs)
+    return buffer.getvalue()
+
+
 def check_positive_scalar(num):
     """Returns True if value if a positive scalar."""
     if num > 0 and not isinstance(num, str) and np.isscalar(num):
@@ -88,6 +324,163 @@ def open_file(input_filename):
         return np.array(ImageOps.exif_transpose(img_orig))
 
 
+def open_file_reduced(input_filename, min_side):
+    """
+    Decode a file at the smallest cheap resolution with a long side >= `min_side`.
+
+    Only the header is read to find the full image size. Formats that support
+    decode-time scaling are then decoded smaller: JPEGs at 1/2, 1/4 or 1/8
+    scale, JPEG 2000 at power-of-two reductions and pyramidal TIFFs at a
+    smaller page (see `autocrop.regions`). Other formats are decoded at full
+    resolution.
+
+    Returns the EXIF-oriented array and the oriented full-resolution
+    (height, width) of the file.
+    """
+    image, full_shape, _ = decode_file(input_filename, min_side)
+    return image, full_shape
+
+
+def decode_file(input_file, min_side=None):
+    """
+    Decode a file path or binary file object like `open_file_reduced`.
+
+    Returns the EXIF-oriented array, the oriented full-resolution
+    (height, width) and the Pillow format name of the file.
+    """
+    with Image.open(input_file) as img_orig:
+        full_width, full_height = img_orig.size
+        if min_side:
+            reduce_decode(img_orig, min_side)
+        if img_orig.getexif().get(ORIENTATION_EXIF_TAG) in TRANSPOSED_ORIENTATIONS:
+            full_width, full_height = full_height, full_width
+        image = np.array(ImageOps.exif_transpose(img_orig))
+        return image, (full_height, full_width), img_orig.format
+
+
+def level_box(box, full_size, level_size):
+    """
+    Map a (left, top, right, bottom) box from full-resolution to decode level
+    coordinates, widened by a pixel to cover rounding and clipped to the level.
+    """
+    scale_x, scale_y = level_size[0] / full_size[0], level_size[1] / full_size[1]
+    return (
+        max(0, math.floor(box[0] * scale_x) - 1),
+        max(0, math.floor(box[1] * scale_y) - 1),
+        min(level_size[0], math.ceil(box[2] * scale_x) + 1),
+        min(level_size[1], math.ceil(box[3] * scale_y) + 1),
+    )
+
+
+def decode_region(input_file, min_side, box):
+    """
+    Decode the part of a file a (left, top, right, bottom) full-resolution
+    `box` needs, at the smallest cheap resolution with a long side of at
+    least `min_side`.
+
+    Uncompressed files without EXIF rotation are decoded only inside the box
+    (see `autocrop.regions.decode_window`); other files are decoded whole, at
+    reduced resolution where the format allows. Returns the array, the
+    (height, width) of the whole decode level and the (top, left) of the
+    array inside that level.
+    """
+    with Image.open(input_file) as img_orig:
+        full_size = img_orig.size
+        reduce_decode(img_orig, min_side)
+        level_size = img_orig.size
+        origin, windowed = (0, 0), False
+        if img_orig.getexif().get(ORIENTATION_EXIF_TAG, 1) == 1:
+            window = level_box(box, full_size, level_size)
+            windowed = decode_window(img_orig, window)
+            if windowed:
+                origin = (window[1], window[0])
+        image = np.array(ImageOps.exif_transpose(img_orig))
+    if not windowed:
+        # Whole decodes may only learn their size on load, as with JPEG 2000
+        # reduction, or be rotated by EXIF orientation.
+        level_size = image.shape[1::-1]
+    return image, level_size[::-1], origin
+
+
+def read_bytes(source):
+    """Return the encoded bytes of a file path or bytes-like `source`."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def detect_batch_scored(detector, images):
+    """
+    Return (boxes, scores) of every image from a detector with
+    `detect_batch(images)`.
+
+    Scores are None for detectors without `detect_batch_scored(images)`.
+    """
+    if hasattr(detector, "detect_batch_scored"):
+        return detector.detect_batch_scored(images)
+    return [(boxes, None) for boxes in detector.detect_batch(images)]
+
+
+def detector_settings(detector):
+    """
+    Describe `detector` for detection cache keys.
+
+    Raises ValueError for detectors without `cache_settings()`: their class
+    alone does not tell differently configured instances apart, and sharing
+    entries between them would return another configuration's faces.
+    """
+    if not hasattr(detector, "cache_settings"):
+        raise ValueError(
+            f"{type(detector).__qualname__} must implement cache_settings() "
+            "to be used with a detection cache"
+        )
+    return detector.cache_settings()
+
+
+def file_source(source):
+    """Return a path or a fresh binary stream Pillow can open for `source`."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+
+def axis_scale(from_shape, to_shape):
+    """Return (x, y) factors mapping `from_shape` coordinates to `to_shape`."""
+    return (to_shape[1] / from_shape[1], to_shape[0] / from_shape[0])
+
+
+def crop_box(positions):
+    """Return the (left, top, right, bottom) box around [v1, v2, h1, h2] crop positions."""
+    return (
+        min(pos[2] for pos in positions),
+        min(pos[0] for pos in positions),
+        max(pos[3] for pos in positions),
+        max(pos[1] for pos in positions),
+    )
+
+
+def scale_positions(pos, scale, shape):
+    """Map [v1, v2, h1, h2] crop positions by (x, y) factors, inside `shape`."""
+    scale_x, scale_y = scale
+    return [
+        max(0, round(pos[0] * scale_y)),
+        min(shape[0], round(pos[1] * scale_y)),
+        max(0, round(pos[2] * scale_x)),
+        min(shape[1], round(pos[3] * scale_x)),
+    ]
+
+
+def shift_positions(pos, top, left, shape):
+    """Move [v1, v2, h1, h2] crop positions by (-top, -left), inside `shape`."""
+    return [
+        max(0, pos[0] - top),
+        min(shape[0], pos[1] - top),
+        max(0, pos[2] - left),
+        min(shape[1], pos[3] - left),
+    ]
+
+
 class Cropper:
     """
     Crops the largest detected face from images.
@@ -109,9 +502,69 @@ class Cropper:
     * `resize`: `bool`, default=`True`
         - Resizes the image to the specified width and height,
         otherwise, returns the original image pixels.
+    * `detect_max_side`: `int`, default=`None`
+        - When set, faces are detected on a copy of the image downscaled
+        so its long side is at most this many pixels. Boxes are mapped
+        back to full resolution before cropping, which makes detection
+        on large camera originals much faster. For resized crops of
+        file paths, JPEGs, JPEG 2000 and pyramidal TIFFs are also decoded
+        at reduced resolution, only as many pixels as the output needs
+        are decoded, and uncompressed TIFFs are decoded only around the
+        crop.
+    * `face_detector`: object with a `detect(image)` method, default=`None`
+        - Custom detector. When omitted, a shared YuNet detector is taken
+        from the process-wide registry in `autocrop.yunet`, so creating
+        many `Cropper` objects does not reload the model.
+    * `detection_cache`: `autocrop.cache.DetectionCache`, default=`None`
+        - Cache of face detections keyed by image content and detector
+        settings. Cropping an image the cache has seen, at any `width`,
+        `height` or `face_percent`, skips face detection. The cache can be
+        shared between `Cropper` objects. Custom detectors must implement
+        `cache_settings()` to be cached.
+    * `channel_order`: {`"rgb"`, `"bgr"`, `"input"`}, default=`"rgb"`
+        - Channel order of returned arrays. `"input"` keeps the order of
+        the input: BGR/BGRA for arrays, RGB/RGBA for files.
+    * `copy`: `bool`, default=`True`
+        - When `False`, crops of array inputs that need neither resizing
+        nor a channel conversion are returned as views of the input
+        array. Otherwise returned arrays never share memory with the
+        input array. Input arrays are never modified.
+    * `resize_backend`: {`"pillow"`, `"cv2-area"`, `"pillow-reduce"`}, default=`"pillow"`
+        - How crops are resized. `"cv2-area"` resizes with OpenCV's
+        `INTER_AREA`; `"pillow-reduce"` shrinks large downscales by an
+        integer factor first. Both are much faster than `"pillow"` when a
+        large crop is reduced to a small output.
+    * `metrics_callback`: callable, default=`None`
+        - Called with an `autocrop.metrics.CropMetrics` holding stage
+        timings and the face count of every image this cropper processes,
+        once its crop is done. Called from the thread that finished the
+        crop, which for `crop_many` is a pipeline thread.
+    * `detect_tile_size`: `int`, default=`None`
+        - When set, images larger than this many pixels on a side at
+        detection scale (see `detect_max_side`) are detected in
+        overlapping square tiles of this size, one at a time, and boxes are
+        merged across tile borders. Memory used for detection then grows
+        with the tile size instead of the image size, for gigapixel scans
+        and panoramas.
+    * `detect_tile_overlap`: `int`, default=`None`
+        - Overlap of neighbouring tiles in pixels at detection scale, a
+        quarter of `detect_tile_size` by default. Faces smaller than the
+        overlap are always seen whole by at least one tile; larger ones are
+        found by one pass over the whole image shrunk to the tile size.
+    * `detect_strategy`: {`"full"`, `"coarse-to-fine"`}, default=`"full"`
+        - `"coarse-to-fine"` wraps the face detector in an
+        `autocrop.yunet.CoarseToFineDetector`: it detects on a small proxy
+        first, stops there when no face is found, and otherwise detects
+        again only around each candidate at the detection resolution.
+        Faces too small to be seen on the proxy are missed.
 
     NumPy array inputs are interpreted as OpenCV-style BGR/BGRA arrays. Returned
-    arrays are RGB/RGBA so they can be passed directly to Pillow or Matplotlib.
+    arrays are RGB/RGBA by default so they can be passed directly to Pillow or
+    Matplotlib.
+
+    A `Cropper` keeps no per-call state, so one instance can crop from many
+    threads at once when its detector is thread-safe, as the default YuNet
+    detector is.
     """
 
     def __init__(
@@ -121,21 +574,64 @@ class Cropper:
         face_percent=50,
         resize=True,
         face_detector=None,
+        detect_max_side=None,
         yunet_model_path=None,
         yunet_score_threshold=0.6,
         yunet_nms_threshold=0.3,
         yunet_top_k=5000,
+        yunet_input_buckets=None,
+        detection_cache=None,
+        channel_order="rgb",
+        copy=True,
+        resize_backend="pillow",
+        metrics_callback=None,
+        detect_tile_size=None,
+        detect_tile_overlap=None,
+        detect_strategy="full",
     ):
         self.height = check_positive_scalar(height)
         self.width = check_positive_scalar(width)
         self.aspect_ratio = width / height
         self.resize = resize
-        self.face_detector = face_detector or YuNetDetector(
+        self.detect_max_side = (
+            None if detect_max_side is None else check_positive_scalar(detect_max_side)
+        )
+        self.detect_tile_size = (
+            None if detect_tile_size is None else check_positive_scalar(detect_tile_size)
+        )
+        if detect_tile_overlap is None:
+            detect_tile_overlap = (detect_tile_size or 0) // 4
+        if not 0 <= detect_tile_overlap < (detect_tile_size or 1):
+            raise ValueError("detect_tile_overlap must be at least 0 and below detect_tile_size")
+        self.detect_tile_overlap = detect_tile_overlap
+        self.face_detector = face_detector or get_detector(
             model_path=yunet_model_path,
             score_threshold=yunet_score_threshold,
             nms_threshold=yunet_nms_threshold,
             top_k=yunet_top_k,
+            input_buckets=yunet_input_buckets,
         )
+        if detect_strategy not in DETECT_STRATEGIES:
+            raise ValueError(f"detect_strategy must be one of {', '.join(DETECT_STRATEGIES)}")
+        self.detect_strategy = detect_strategy
+        if detect_strategy == "coarse-to-fine":
+            self.face_detector = CoarseToFineDetector(self.face_detector)
+        if channel_order not in CHANNEL_ORDERS:
+            raise ValueError(f"channel_order must be one of {', '.join(CHANNEL_ORDERS)}")
+        self.channel_order = channel_order
+        if resize_backend not in RESIZE_BACKENDS:
+            raise ValueError(f"resize_backend must be one of {', '.join(RESIZE_BACKENDS)}")
+        self.resize_backend = resize_backend
+        self.copy = copy
+        self.metrics_callback = metrics_callback
+        self.detection_cache = detection_cache
+        if detection_cache is not None:
+            self._cache_settings = {
+                "face_detector": detector_settings(self.face_detector),
+                "detect_max_side": self.detect_max_side,
+                "reduced_decode": bool(self.detect_max_side and self.resize),
+                "detect_tiles": (self.detect_tile_size, self.detect_tile_overlap),
+            }
 
         # Face percent
         if face_percent > 100 or face_percent < 1:
@@ -151,63 +647,470 @@ class Cropper:
 
         Parameters
         ----------
-        - `path_or_array` : {`str`, `np.ndarray`}
-            * The filepath or numpy array of the image. Array inputs are
-              interpreted as OpenCV-style BGR/BGRA arrays.
+        - `path_or_array` : {`str`, `os.PathLike`, `bytes`, `np.ndarray`}
+            * The filepath, encoded image bytes or numpy array of the image.
+              Array inputs are interpreted as OpenCV-style BGR/BGRA arrays.
 
         Returns
         -------
         - `image` : {`np.ndarray`, `None`}
             * A cropped numpy array if face detected, else None.
         """
-        if isinstance(path_or_array, str):
-            image = open_file(path_or_array)
-            image_is_bgr = False
-        else:
-            image = path_or_array
-            image_is_bgr = True
+        decoded = self._load(path_or_array)
+        pos = self._locate(decoded)
+        image = None if pos is None else self._extract(decoded, pos)
+        self._report(decoded)
+        return image
+
+    def crop_all(self, path_or_array, min_face_size=None, min_score=None):
+        """
+        Crop every detected face of an image.
+
+        The image is decoded once and detection runs once; every face's
+        crop rectangle is computed in one vectorized pass.
 
-        detection_image = detector_color_image(image, image_is_bgr)
+        Parameters
+        ----------
+        - `path_or_array` : {`str`, `os.PathLike`, `bytes`, `np.ndarray`}
+            * As accepted by `crop`.
+        - `min_face_size` : {`int`, `None`}, default=None
+            * Skip faces whose full-resolution box is narrower or shorter
+              than this many pixels.
+        - `min_score` : {`float`, `None`}, default=None
+            * Skip faces the detector scored below this. Requires a detector
+              reporting scores, like the built-in YuNet detector.
+
+        Returns
+        -------
+        - `images` : `list` of `np.ndarray`
+            * One crop per face, largest face first, so the first one is
+              what `crop` returns. Empty if no face was kept.
+        """
+        decoded = self._load(path_or_array)
+        positions = self._locate_all(decoded, min_face_size, min_score)
+        images = self._extract_all(decoded, positions)
+        self._report(decoded)
+        return images
 
-        # Scale the image
+    def crop_batch(self, images):
+        """
+        Crop a batch of images, detecting faces with one batched call.
+
+        When the face detector provides `detect_batch(images)`, like
+        `autocrop.yunet.YuNetBatchDetector`, every image that is not cached
+        or tiled is detected in a single call; other detectors are called
+        once per image.
+
+        Parameters
+        ----------
+        - `images` : {`np.ndarray`, iterable}
+            * A 4-D (N, H, W, C) BGR array, or any inputs `crop` accepts.
+
+        Returns
+        -------
+        - `images` : `list`
+            * For every input, what `crop` returns for it: the cropped
+              array, or None when no face was found.
+        """
+        batch = [self._load(image) for image in images]
+        faces = self._faces_batch(batch)
+        results = []
+        for decoded, (boxes, _) in zip(batch, faces):
+            with timed(decoded.metrics, "geometry"):
+                pos = self._face_positions(boxes, *decoded.full_shape)
+            results.append(None if pos is None else self._extract(decoded, pos))
+            self._report(decoded)
+        return results
+
+    def crop_many(self, items, workers=4, ordered=True, encode=None):
+        """
+        Crop many images, overlapping decode, detection, cropping and encoding.
+
+        See `autocrop.pipeline.crop_many` for details. Yields one
+        `CropResult` per input item, lazily, with per-item errors reported
+        on the result instead of raised.
+        """
+        from .pipeline import crop_many
+
+        return crop_many(self, items, workers=workers, ordered=ordered, encode=encode)
+
+    async def acrop(self, path_or_array, executor=None):
+        """
+        Crop one image on a thread pool without blocking the event loop.
+
+        See `autocrop.aio.acrop`. Takes the same inputs and returns the same
+        result as `crop`; reading path inputs also happens off the loop.
+        """
+        from .aio import acrop
+
+        return await acrop(self, path_or_array, executor=executor)
+
+    def acrop_many(self, items, concurrency=4, ordered=True, encode=None, executor=None):
+        """
+        Crop many images asynchronously, with at most `concurrency` in flight.
+
+        See `autocrop.aio.acrop_many` for details. Returns an async generator
+        of one `CropResult` per input item, like `crop_many`.
+        """
+        from .aio import acrop_many
+
+        return acrop_many(
+            self,
+            items,
+            concurrency=concurrency,
+            ordered=ordered,
+            encode=encode,
+            executor=executor,
+        )
+
+    def _load(self, path_or_array):
+        """
+        Decode a crop input into a `DecodedImage`, timing it when metrics
+        are recorded.
+        """
+        if self.metrics_callback is None:
+            return self._decode(path_or_array)
+        metrics = CropMetrics(source_label(path_or_array))
+        with metrics.stage("decode"):
+            decoded = self._decode(path_or_array)
+        metrics.image_size = tuple(decoded.full_shape[::-1])
+        return decoded._replace(metrics=metrics)
+
+    def _report(self, decoded):
+        """Pass the metrics of a finished crop to the metrics callback."""
+        if decoded.metrics is not None:
+            self.metrics_callback(decoded.metrics)
+
+    def _decode(self, path_or_array):
+        """
+        Decode a crop input into a `DecodedImage`.
+
+        File paths and encoded image bytes are decoded with Pillow and EXIF
+        orientation applied. With
+        `detect_max_side` and `resize`, they are decoded at reduced
+        resolution; `_extract` decodes more pixels later if the crop needs
+        them. `.npy` and binary PGM/PPM paths are memory-mapped instead, and
+        cropped like array inputs.
+        """
+        if isinstance(path_or_array, (str, os.PathLike)):
+            mapped = map_file(path_or_array)
+            if mapped is not None:
+                return self._decode_array(*mapped)
+        if isinstance(path_or_array, ENCODED_INPUT_TYPES):
+            min_side = self.detect_max_side if self.resize else None
+            source, cache_key = file_source(path_or_array), None
+            if self.detection_cache is not None:
+                data = read_bytes(path_or_array)
+                source, cache_key = io.BytesIO(data), self._cache_key(data)
+            image, full_shape, image_format = decode_file(source, min_side)
+            return DecodedImage(
+                path_or_array, image, False, full_shape, image_format, cache_key
+            )
+
+        return self._decode_array(path_or_array)
+
+    def _decode_array(self, image, image_is_bgr=True, image_format=None):
+        """
+        Wrap an image array, which is never modified, in a `DecodedImage`.
+        """
         try:
-            img_height, img_width = image.shape[:2]
+            full_shape = image.shape[:2]
         except AttributeError:
             raise ImageReadError
-        # ====== Detect faces in the image ======
-        faces = self.face_detector.detect(detection_image)
+        cache_key = None
+        if self.detection_cache is not None:
+            cache_key = self._cache_key(image)
+        return DecodedImage(None, image, image_is_bgr, full_shape, image_format, cache_key)
+
+    def _cache_key(self, data):
+        return content_key(data, self._cache_settings)
+
+    def _locate(self, decoded):
+        """Return full-resolution crop positions for a `DecodedImage`, or None."""
+        faces, _ = self._faces(decoded)
+        with timed(decoded.metrics, "geometry"):
+            return self._face_positions(faces, *decoded.full_shape)
+
+    def _locate_all(self, decoded, min_face_size=None, min_score=None):
+        """Return crop positions of every kept face, largest face first."""
+        faces, scores = self._faces(decoded)
+        with timed(decoded.metrics, "geometry"):
+            faces = np.asarray(faces).reshape(-1, 4)
+            keep = (faces[:, 2] > 0) & (faces[:, 3] > 0)
+            if min_face_size is not None:
+                keep &= np.minimum(faces[:, 2], faces[:, 3]) >= min_face_size
+            if min_score is not None:
+                if scores is None:
+                    raise ValueError("min_score needs a face detector that reports scores")
+                keep &= np.asarray(scores) >= min_score
+            faces = faces[keep]
+            areas = faces[:, 2].astype(np.int64) * faces[:, 3]
+            faces = faces[np.argsort(-areas, kind="stable")]
+            positions = self.crop_positions(faces, decoded.full_shape)
+            valid = (positions[:, 0] < positions[:, 1]) & (positions[:, 2] < positions[:, 3])
+            return positions[valid].tolist()
+
+    def _faces(self, decoded):
+        """
+        Return full-resolution face boxes of a `DecodedImage` and their
+        scores, from the detection cache when it has them.
+        """
+        cached = self._cached(decoded)
+        detected = None
+        if cached is None:
+            detected = self._detect_scored(
+                decoded.image, decoded.image_is_bgr, decoded.metrics
+            )
+        return self._found(decoded, cached, detected)
+
+    def _faces_batch(self, batch):
+        """
+        Return `_faces` of many `DecodedImage`s, detecting every image that
+        is neither cached nor tiled in one `detect_batch` call.
+        """
+        if not hasattr(self.face_detector, "detect_batch"):
+            return [self._faces(decoded) for decoded in batch]
+        cached = [self._cached(decoded) for decoded in batch]
+        detected = [None] * len(batch)
+        inputs = {}
+        for index, decoded in enumerate(batch):
+            if cached[index] is not None:
+                continue
+            if self._tiled(decoded.image):
+                detected[index] = self._detect_scored(
+                    decoded.image, decoded.image_is_bgr, decoded.metrics
+                )
+            else:
+                inputs[index] = self._detection_input(
+                    decoded.image, decoded.image_is_bgr, decoded.metrics
+                )
+        results = self._detect_batch(
+            [image for image, _ in inputs.values()],
+            [batch[index].metrics for index in inputs],
+        )
+        for (index, (_, scale)), (faces, scores) in zip(inputs.items(), results):
+            detected[index] = scale_boxes(faces, scale), scores
+        return [
+            self._found(decoded, hit, found)
+            for decoded, hit, found in zip(batch, cached, detected)
+        ]
+
+    def _cached(self, decoded):
+        """Return cached boxes and scores of a `DecodedImage`, or None."""
+        if decoded.cache_key is None:
+            return None
+        return self.detection_cache.get(decoded.cache_key)
 
+    def _found(self, decoded, cached, detected):
+        """
+        Return full-resolution boxes and scores from the cache or from
+        (boxes, scores) `detected` in `decoded.image` coordinates, caching
+        and counting them.
+        """
+        metrics = decoded.metrics
+        if cached is None:
+            faces, scores = detected
+            faces = scale_boxes(
+                faces, axis_scale(decoded.image.shape, decoded.full_shape)
+            )
+            if decoded.cache_key is not None:
+                self.detection_cache.put(decoded.cache_key, faces, scores)
+        else:
+            faces, scores = cached
+        if metrics is not None:
+            metrics.faces = len(faces)
+            metrics.cache_hit = cached is not None
+        return faces, scores
+
+    def _extract(self, decoded, pos):
+        """
+        Cut the crop at `pos` out of a `DecodedImage`, resized and in RGB.
+
+        Reduced-resolution decodes are used when they still hold at least
+        `width` x `height` pixels inside the crop window. Otherwise the file is
+        decoded again at the smallest scale that does, which is a full
+        resolution decode only when the output really needs those pixels.
+        """
+        image, (pos,) = self._pixels_for(decoded, [pos])
+
+        # ====== Actual cropping ======
+        return self._finish(
+            image[pos[0] : pos[1], pos[2] : pos[3]],
+            decoded.image_is_bgr,
+            borrowed=decoded.source is None,
+            metrics=decoded.metrics,
+        )
+
+    def _extract_all(self, decoded, positions):
+        """Cut every crop in `positions` out of one `DecodedImage`."""
+        if not positions:
+            return []
+        image, positions = self._pixels_for(decoded, positions)
+        # Crops may overlap, so none of them may be converted in place.
+        borrowed = decoded.source is None or not self.resize
+        return [
+            self._finish(
+                image[pos[0] : pos[1], pos[2] : pos[3]],
+                decoded.image_is_bgr,
+                borrowed=borrowed,
+                metrics=decoded.metrics,
+            )
+            for pos in positions
+        ]
+
+    def _pixels_for(self, decoded, positions):
+        """
+        Return an image holding enough pixels for every crop in
+        `positions`, and the positions mapped into it.
+
+        Reduced-resolution decodes are decoded again, once, at the smallest
+        scale the most demanding crop needs, and only around the crops when
+        the file format allows it.
+        """
+        image = decoded.image
+        if image.shape[:2] == tuple(decoded.full_shape):
+            return image, positions
+        needed = min(
+            1.0,
+            max(
+                max(self.height / (pos[1] - pos[0]), self.width / (pos[3] - pos[2]))
+                for pos in positions
+            ),
+        )
+        level_shape, (top, left) = image.shape, (0, 0)
+        if min(axis_scale(decoded.full_shape, image.shape)) < needed:
+            with timed(decoded.metrics, "decode"):
+                image, level_shape, (top, left) = decode_region(
+                    file_source(decoded.source),
+                    math.ceil(max(decoded.full_shape) * needed),
+                    crop_box(positions),
+                )
+        scale = axis_scale(decoded.full_shape, level_shape)
+        return image, [
+            shift_positions(scale_positions(pos, scale, level_shape), top, left, image.shape)
+            for pos in positions
+        ]
+
+    def _face_positions(self, faces, img_height, img_width):
+        """Return crop positions around the largest face, or None."""
         # Handle no faces
         if len(faces) == 0:
             return None
 
         # Make crop margins from biggest face found
-        x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
-        if w <= 0 or h <= 0:
+        face = max(faces, key=lambda face: face[2] * face[3])
+        if face[2] <= 0 or face[3] <= 0:
             return None
-        pos = self._crop_positions(
-            img_height,
-            img_width,
-            x,
-            y,
-            w,
-            h,
-        )
+        pos = self.crop_positions([face], (img_height, img_width))[0].tolist()
 
         if pos[0] >= pos[1] or pos[2] >= pos[3]:
             return None
+        return pos
 
-        # ====== Actual cropping ======
-        image = image[pos[0] : pos[1], pos[2] : pos[3]]
+    def _finish(self, image, image_is_bgr, borrowed=False, metrics=None):
+        """
+        Resize a cropped array and return it in `self.channel_order`.
 
+        `borrowed` marks `image` as a view of the caller's array, which is
+        never written to and is only returned as is when `copy` is False.
+        """
         # Resize
         if self.resize:
-            with Image.fromarray(image) as img:
-                image = np.array(img.resize((self.width, self.height)))
+            with timed(metrics, "resize"):
+                image = resize_image(image, (self.width, self.height), self.resize_backend)
+            borrowed = False
 
-        if image_is_bgr:
-            return bgr_to_rbg(image)
-        return image
+        with timed(metrics, "color"):
+            if self._needs_swap(image, image_is_bgr):
+                return swap_red_blue(image, in_place=not borrowed)
+            if borrowed and self.copy:
+                return image.copy()
+            return image
+
+    def _needs_swap(self, image, image_is_bgr):
+        if image.ndim != 3 or image.shape[2] not in (3, 4):
+            return False
+        if self.channel_order == "input":
+            return False
+        return image_is_bgr != (self.channel_order == "bgr")
+
+    def _detect(self, image, image_is_bgr):
+        """Return (x, y, w, h) face boxes in `image` coordinates."""
+        return self._detect_scored(image, image_is_bgr)[0]
+
+    def _detect_scored(self, image, image_is_bgr, metrics=None):
+        """Return face boxes in `image` coordinates and their scores, or None."""
+        if self._tiled(image):
+            with timed(metrics, "detect"):
+                return self._detect_tiled(
+                    image, image_is_bgr, detection_scale(image, self.detect_max_side)
+                )
+        detection_image, scale = self._detection_input(image, image_is_bgr, metrics)
+        with timed(metrics, "detect"):
+            faces, scores = detect_scored(self.face_detector, detection_image)
+        return scale_boxes(faces, scale), scores
+
+    def _tiled(self, image):
+        """Whether `image` is large enough at detection scale to detect in tiles."""
+        if not self.detect_tile_size:
+            return False
+        scale = detection_scale(image, self.detect_max_side)
+        return max(image.shape[:2]) * scale > self.detect_tile_size
+
+    def _detection_input(self, image, image_is_bgr, metrics=None):
+        """
+        Return the BGR detector input for `image` and the (x, y) factors
+        mapping its coordinates back to `image`.
+        """
+        with timed(metrics, "detect"):
+            proxy, scale = detection_proxy(image, self.detect_max_side)
+        with timed(metrics, "color"):
+            return detector_color_image(proxy, image_is_bgr), scale
+
+    def _detect_batch(self, images, metrics):
+        """
+        Detect faces on BGR detector inputs in one `detect_batch` call,
+        sharing its time equally between the images' `metrics`.
+        """
+        if not images:
+            return []
+        started = time.perf_counter()
+        results = detect_batch_scored(self.face_detector, images)
+        share = (time.perf_counter() - started) / len(images)
+        for image_metrics in metrics:
+            if image_metrics is not None:
+                image_metrics.add("detect", share)
+        return results
+
+    def _detect_tiled(self, image, image_is_bgr, scale):
+        """Detect faces in overlapping tiles, color-converting one tile at a time."""
+
+        def detect(tile):
+            return detect_scored(self.face_detector, detector_color_image(tile, image_is_bgr))
+
+        return detect_tiled(image, detect, self.detect_tile_size, self.detect_tile_overlap, scale)
+
+    def crop_positions(self, boxes, image_sizes):
+        """
+        Return crop rectangles around many faces in one vectorized pass.
+
+        Parameters
+        ----------
+        - `boxes` : array-like of shape (N, 4)
+            * Integer (x, y, w, h) face boxes.
+        - `image_sizes` : array-like of shape (N, 2) or (2,)
+            * (height, width) of the image each box belongs to, or a single
+              size shared by every box.
+
+        Returns
+        -------
+        - `positions` : `np.ndarray` of shape (N, 4)
+            * (top, bottom, left, right) rectangles, the same as
+              `_crop_positions` returns for each box.
+        """
+        return crop_positions(
+            boxes, image_sizes, self.width, self.height, self.face_percent
+        )
 
     def _determine_safe_zoom(self, imgh, imgw, x, y, w, h):
         """
@@ -0,0 +1,225 @@
+"""
+Content-addressed face detection cache.
+
+Detections are keyed by a hash of the image content together with the
+detector settings, so cropping the same original again at a new width, height
+or face percent reuses its face boxes instead of running the detector.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    key TEXT PRIMARY KEY,
+    boxes BLOB NOT NULL,
+    scores BLOB,
+    accessed REAL NOT NULL
+)
+"""
+
+# Disk hits whose access times are buffered before they are written together.
+_TOUCH_BATCH = 64
+
+
+def content_key(data, settings):
+    """
+    Return the cache key for encoded image bytes or an image array.
+
+    `settings` is a JSON-serializable description of everything besides the
+    image content that changes detection results.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    if isinstance(data, np.ndarray):
+        digest.update(f"{data.shape}{data.dtype.str}".encode())
+        data = np.ascontiguousarray(data)
+    digest.update(memoryview(data).cast("B"))
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    """
+    Two-tier cache of face detections: an in-memory LRU plus optional SQLite.
+
+    Entries are `(boxes, scores)` pairs: an int32 (N, 4) array of full
+    resolution (x, y, w, h) boxes, and a float32 (N,) array of detector
+    scores or None when the detector does not report them.
+
+    Parameters
+    ----------
+    - `path` : {`str`, `os.PathLike`, `None`}, default=None
+        * SQLite database file for the on-disk tier. Memory only when None.
+          The file can be shared by several processes.
+    - `max_entries` : `int`, default=1024
+        * Entries kept in memory; the least recently used are evicted.
+    - `max_disk_entries` : `int`, default=100000
+        * Entries kept on disk. Once they pass the limit the least recently
+          used tenth is evicted, so the table is only counted again after
+          that many more stores. Access times of disk hits are written in
+          batches, so eviction order is approximate.
+    """
+
+    def __init__(self, path=None, max_entries=1024, max_disk_entries=100_000):
+        self.path = None if path is None else os.fspath(path)
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+        self._db = None
+        self._disk_count = 0
+        self._touched = {}
+        if self.path is not None:
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(_SCHEMA)
+            self._db.commit()
+            self._disk_count = self._disk_entries()
+
+    def get(self, key):
+        """Return the cached `(boxes, scores)` for key, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return entry
+            entry = self._disk_get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._remember(key, entry)
+            return entry
+
+    def put(self, key, boxes, scores=None):
+        """Store face boxes, and optionally their scores, under key."""
+        boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        if scores is not None:
+            scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        with self._lock:
+            self._stats["stores"] += 1
+            self._remember(key, (boxes, scores))
+            self._disk_put(key, boxes, scores)
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _disk_get(self, key):
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT boxes, scores FROM detections WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._touched[key] = time.time()
+        if len(self._touched) >= _TOUCH_BATCH:
+            self._flush_touched()
+            self._db.commit()
+        boxes = np.frombuffer(row[0], dtype=np.int32).reshape(-1, 4)
+        scores = None if row[1] is None else np.frombuffer(row[1], dtype=np.float32)
+        return boxes, scores
+
+    def _disk_put(self, key, boxes, scores):
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?)",
+            (key, boxes.tobytes(), None if scores is None else scores.tobytes(), time.time()),
+        )
+        self._touched.pop(key, None)
+        self._flush_touched()
+        # Replacements and other processes sharing the file make this count
+        # approximate; it is only used to decide when to count again.
+        self._disk_count += 1
+        if self._disk_count > self.max_disk_entries:
+            self._disk_evict()
+        self._db.commit()
+
+    def _disk_evict(self):
+        self._disk_count = self._disk_entries()
+        excess = self._disk_count - self.max_disk_entries
+        if excess <= 0:
+            return
+        excess += self.max_disk_entries // 10
+        deleted = self._db.execute(
+            "DELETE FROM detections WHERE key IN "
+            "(SELECT key FROM detections ORDER BY accessed LIMIT ?)",
+            (excess,),
+        ).rowcount
+        self._disk_count -= deleted
+        self._stats["evictions"] += deleted
+
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany(
+                "UPDATE detections SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _disk_entries(self):
+        return self._db.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+
+    def stats(self):
+        """
+        Return cache counters.
+
+        `hit_rate` is the share of lookups answered from either tier.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._disk_entries() if self._db is not None else 0
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM detections")
+                self._db.commit()
+                self._disk_count = 0
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._flush_touched()
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+    def __getstate__(self):
+        # Worker processes open their own connection to the same database.
+        return {
+            "path": self.path,
+            "max_entries": self.max_entries,
+            "max_disk_entries": self.max_disk_entries,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
@@ -1,87 +1,231 @@
 import argparse
+import contextlib
 import io
+import json
 import os
-import shutil
 import stat
+import struct
 import sys
+import threading
 import time
-
-import numpy as np
-from PIL import Image, ImageOps
+from collections import deque, namedtuple
 
 from . import _timing
 from .__version__ import __version__
-from .autocrop import Cropper
 from .constants import (
+    DETECT_STRATEGIES,
     INPUT_FILETYPES,
     OUTPUT_FILETYPES,
     OUTPUT_FORMATS,
     OUTPUT_FORMATS_BY_EXTENSION,
+    RESIZE_BACKENDS,
 )
+from .metrics import CropMetrics
+
+# OpenCV, NumPy and Pillow are imported inside the functions that need them,
+# so arguments are parsed, and --help or --version answered, without loading
+# them. See `make_cropper`.
 
 ORIENTATION_EXIF_TAG = 274
+STREAM_MODES = ("frames", "paths")
+# Batch inputs in flight per --jobs worker, bounding memory on huge trees.
+BATCH_TASKS_PER_JOB = 4
+# Stream frames are a 4-byte big-endian length followed by that many bytes.
+FRAME_HEADER = struct.Struct(">I")
 
 
 class CliError(Exception):
     """A user-facing CLI error that should not produce a traceback."""
 
 
-def _preserve_metadata(input_filename, output_filename, source_stat):
-    """Preserve safe filesystem metadata from the source image."""
-    if input_filename != output_filename:
-        shutil.copystat(input_filename, output_filename)
-    os.chmod(output_filename, stat.S_IMODE(source_stat.st_mode))
-    os.utime(
-        output_filename,
-        ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns),
-    )
+class MetricsRecorder:
+    """
+    Cropper metrics callback keeping the latest `CropMetrics` of each thread.
+
+    The CLI crops one image at a time per thread, so the metrics of a crop
+    can be taken right after `Cropper.crop` returns.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def __call__(self, metrics):
+        self._local.metrics = metrics
+
+    def take(self):
+        metrics = getattr(self._local, "metrics", None)
+        self._local.metrics = None
+        return metrics
+
+    def __reduce__(self):
+        # Batch worker processes get a recorder of their own.
+        return MetricsRecorder, ()
+
+
+def take_metrics(cropper):
+    """Return the metrics of the last crop on this thread, or None."""
+    callback = getattr(cropper, "metrics_callback", None)
+    if isinstance(callback, MetricsRecorder):
+        return callback.take()
+    return None
+
+
+def write_metrics(stream, metrics, input_label, output_label, status, **cli_seconds):
+    """
+    Write one --metrics-json record.
+
+    The Cropper stage timings are completed with the CLI's own stages, such
+    as reading the input file and writing the output.
+    """
+    metrics = metrics or CropMetrics()
+    for name, seconds in cli_seconds.items():
+        metrics.add(name, seconds)
+    record = {"input": input_label, "output": output_label, "status": status}
+    record.update(metrics.as_dict())
+    del record["source"]
+    stream.write(json.dumps(record) + "\n")
+
+
+@contextlib.contextmanager
+def metrics_output(path):
+    """Open the --metrics-json file, line buffered, or yield None."""
+    if path is None:
+        yield None
+        return
+    try:
+        stream = open(path, "w", buffering=1, encoding="utf-8")
+    except OSError as exc:
+        raise CliError(f"Could not open metrics file {path}: {exc}") from None
+    with stream:
+        yield stream
 
 
-def _image_save_kwargs(input_filename):
+def make_cropper(**options):
+    """
+    Return a Cropper, importing the image processing modules on first use.
+
+    Their import time is reported as part of `imports` in verbose timings.
+    """
+    return _timing.timed_import(f"{__package__}.autocrop").Cropper(**options)
+
+
+# Metadata of an input file, captured while its header is read so writing the
+# crop never has to open or stat the input again. `stat` and `save_kwargs` are
+# None when metadata is not preserved.
+SourceMetadata = namedtuple("SourceMetadata", ["format", "stat", "save_kwargs"])
+
+
+def image_save_kwargs(img_orig):
     """Return image metadata Pillow can preserve while writing the crop."""
     save_kwargs = {}
-    with Image.open(input_filename) as img_orig:
-        exif = img_orig.getexif()
+    exif = img_orig.getexif()
+    if exif:
+        if ORIENTATION_EXIF_TAG in exif:
+            del exif[ORIENTATION_EXIF_TAG]
         if exif:
-            if ORIENTATION_EXIF_TAG in exif:
-                del exif[ORIENTATION_EXIF_TAG]
-            if exif:
-                save_kwargs["exif"] = exif.tobytes()
-        if "icc_profile" in img_orig.info:
-            save_kwargs["icc_profile"] = img_orig.info["icc_profile"]
+            save_kwargs["exif"] = exif.tobytes()
+    if "icc_profile" in img_orig.info:
+        save_kwargs["icc_profile"] = img_orig.info["icc_profile"]
     return save_kwargs
 
 
-def image_for_format(image, image_format):
-    """Return a Pillow image compatible with the requested output format."""
-    img_new = Image.fromarray(image)
-    if image_format in {"JPEG", "EPS", "PCX"} and img_new.mode in {"LA", "P", "RGBA"}:
-        return img_new.convert("RGB")
-    return img_new
+def read_source(input_filename, preserve_metadata=True):
+    """
+    Read the header of an input file.
+
+    Returns the path for Cropper to decode and the file's `SourceMetadata`.
+    Only the header is read here, so Cropper can decode just the region and
+    resolution the crop needs instead of every byte of the file.
+    """
+    from PIL import Image
+
+    with open(input_filename, "rb") as f:
+        source_stat = os.fstat(f.fileno()) if preserve_metadata else None
+        with Image.open(f) as img_orig:
+            save_kwargs = image_save_kwargs(img_orig) if preserve_metadata else None
+            return input_filename, SourceMetadata(img_orig.format, source_stat, save_kwargs)
+
+
+def _open_temporary(output_filename):
+    """
+    Create a new temporary file next to output_filename.
+
+    Like any new file, it gets mode 0o666 minus the umask.
+    """
+    while True:
+        temp_filename = f"{output_filename}.{os.urandom(4).hex()}.tmp"
+        try:
+            flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+            return temp_filename, os.open(temp_filename, flags, 0o666)
+        except FileExistsError:
+            continue
+
+
+def _apply_stat(f, temp_filename, source_stat):
+    """Give the temporary file the mode and timestamps of the source."""
+    mode = stat.S_IMODE(source_stat.st_mode)
+    if hasattr(os, "fchmod"):
+        os.fchmod(f.fileno(), mode)
+    else:
+        os.chmod(temp_filename, mode)
+    target = f.fileno() if os.utime in os.supports_fd else temp_filename
+    os.utime(target, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+
+
+def output(
+    input_filename,
+    output_filename,
+    image,
+    source_stat=None,
+    image_format=None,
+    metadata=None,
+    preserve_metadata=True,
+):
+    """
+    Write cropped image data to an output file.
 
+    The crop is written to a temporary file in the output directory, which
+    then atomically replaces output_filename, so readers never see a partial
+    image and overwriting the input in place is safe. With
+    preserve_metadata, EXIF (minus orientation), ICC profile, permissions and
+    timestamps of the input are carried over, taken from metadata when given
+    instead of reading the input again.
+    """
+    from .autocrop import image_for_format
 
-def output(input_filename, output_filename, image, source_stat=None, image_format=None):
-    """Write cropped image data to an output file."""
-    if source_stat is None:
-        source_stat = os.stat(input_filename)
     if image_format is None:
         image_format = output_format(output_filename=output_filename)
-    if input_filename != output_filename:
-        shutil.copy(input_filename, output_filename)
-    save_kwargs = _image_save_kwargs(input_filename)
+    save_kwargs = {}
+    if preserve_metadata:
+        if metadata is None or metadata.stat is None:
+            _, metadata = read_source(input_filename)
+        save_kwargs = metadata.save_kwargs
+        source_stat = source_stat or metadata.stat
     img_new = image_for_format(image, image_format)
-    img_new.save(output_filename, format=image_format, **save_kwargs)
-    _preserve_metadata(input_filename, output_filename, source_stat)
+    temp_filename, fd = _open_temporary(output_filename)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            img_new.save(f, format=image_format, **save_kwargs)
+            f.flush()
+            if preserve_metadata:
+                _apply_stat(f, temp_filename, source_stat)
+        os.replace(temp_filename, output_filename)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_filename)
+        raise
 
 
 def output_bytes(image, output_stream, image_format):
     """Write cropped image bytes to a binary stream."""
+    from .autocrop import image_for_format
+
     img_new = image_for_format(image, image_format)
     img_new.save(output_stream, format=image_format)
 
 
 def input_path(p):
-    """Return path, only if input is a valid image file or stdin."""
+    """Return path, only if input is a valid image file, directory or stdin."""
     no_file = "Input image does not exist"
     no_image_file = "Input file type is not supported"
     if p == "-":
@@ -89,6 +233,8 @@ def input_path(p):
     p = os.path.abspath(p)
     if not os.path.exists(p):
         raise argparse.ArgumentTypeError(no_file)
+    if os.path.isdir(p):
+        return p
     if not os.path.isfile(p) or os.path.splitext(p)[-1].lower() not in INPUT_FILETYPES:
         raise argparse.ArgumentTypeError(no_image_file)
     return p
@@ -107,6 +253,78 @@ def size(i):
         raise argparse.ArgumentTypeError(error)
 
 
+def jobs(i):
+    """Returns valid only if input is a positive worker count."""
+    error = "Invalid number of jobs"
+    try:
+        i = int(i)
+    except ValueError:
+        raise argparse.ArgumentTypeError(error)
+    if i > 0:
+        return i
+    raise argparse.ArgumentTypeError(error)
+
+
+def port(i):
+    """Returns valid only if input is a TCP port number, 0 meaning any free port."""
+    error = "Invalid port"
+    try:
+        i = int(i)
+    except ValueError:
+        raise argparse.ArgumentTypeError(error)
+    if 0 <= i <= 65535:
+        return i
+    raise argparse.ArgumentTypeError(error)
+
+
+def milliseconds(i):
+    """Returns valid only if input is a non-negative number of milliseconds."""
+    error = "Invalid duration"
+    try:
+        i = float(i)
+    except ValueError:
+        raise argparse.ArgumentTypeError(error)
+    if 0 <= i < 1e5:
+        return i
+    raise argparse.ArgumentTypeError(error)
+
+
+def score(i):
+    """Returns valid only if input is a detection score between 0 and 1."""
+    error = "Invalid score"
+    try:
+        i = float(i)
+    except ValueError:
+        raise argparse.ArgumentTypeError(error)
+    if 0 <= i <= 1:
+        return i
+    raise argparse.ArgumentTypeError(error)
+
+
+def smoothing(i):
+    """Returns valid only if input is a smoothing weight from 0 up to, not including, 1."""
+    error = "Invalid smoothing"
+    try:
+        i = float(i)
+    except ValueError:
+        raise argparse.ArgumentTypeError(error)
+    if 0 <= i < 1:
+        return i
+    raise argparse.ArgumentTypeError(error)
+
+
+def frame_rate(i):
+    """Returns valid only if input is a positive frame rate."""
+    error = "Invalid frame rate"
+    try:
+        i = float(i)
+    except ValueError:
+        raise argparse.ArgumentTypeError(error)
+    if 0 < i <= 1000:
+        return i
+    raise argparse.ArgumentTypeError(error)
+
+
 def output_format(input_format=None, output_filename=None):
     """Return a Pillow format name for stream or file output."""
     if output_filename:
@@ -175,14 +393,16 @@ def crop_image(
     fwidth,
     face_percent,
     resize,
+    cropper=None,
 ):
-    """Crop a single image path or numpy array."""
-    cropper = Cropper(
-        width=fwidth,
-        height=fheight,
-        face_percent=face_percent,
-        resize=resize,
-    )
+    """Crop a single image path, encoded image bytes or numpy array."""
+    if cropper is None:
+        cropper = make_cropper(
+            width=fwidth,
+            height=fheight,
+            face_percent=face_percent,
+            resize=resize,
+        )
     image = cropper.crop(path_or_array)
     if image is None:
         return None, None
@@ -197,6 +417,9 @@ def cropper_array_from_pillow_image(img_orig):
     to RGB/RGBA before returning. Pillow decodes stream input as RGB/RGBA, so swap
     the first and third channels up front to keep stdin output colors stable.
     """
+    import numpy as np
+    from PIL import ImageOps
+
     oriented = ImageOps.exif_transpose(img_orig)
     input_image = np.array(oriented)
     if input_image.ndim == 3 and input_image.shape[2] >= 3:
@@ -205,13 +428,69 @@ def cropper_array_from_pillow_image(img_orig):
     return input_image
 
 
-def read_input_file(input_filename):
-    """Read one image file into the ndarray form expected by Cropper."""
+def read_input_file(input_filename, preserve_metadata=True):
+    """
+    Read the header of one image file and return the source to crop and
+    its `SourceMetadata`.
+
+    Pixels are decoded later by Cropper, which can decode at reduced
+    resolution, and only around the crop, when the crop does not need every
+    pixel.
+    """
+    try:
+        return read_source(input_filename, preserve_metadata)
+    except OSError as exc:
+        raise CliError(f"Could not read image file: {input_filename}: {exc}") from exc
+
+
+def crop_input_file(input_filename, source, *crop_args):
+    """Crop an image file, reporting undecodable pixels as a CliError."""
+    try:
+        return crop_image(source, *crop_args)
+    except OSError as exc:
+        raise CliError(f"Could not read image file: {input_filename}: {exc}") from exc
+
+
+def face_output_filename(output_filename, index):
+    """Return the --all-faces output path of face `index`: NAME_face_INDEX.EXT."""
+    root, extension = os.path.splitext(output_filename)
+    return f"{root}_face_{index}{extension}"
+
+
+def crop_input_faces(input_filename, source, input_format, output_filename, cropper, all_faces):
+    """
+    Crop every face in an image file.
+
+    Returns (output_filename, image) pairs named by `face_output_filename`,
+    and the output format.
+    """
+    cropper = cropper or make_cropper()
     try:
-        with Image.open(input_filename) as img_orig:
-            return img_orig.format, cropper_array_from_pillow_image(img_orig)
+        images = cropper.crop_all(source, **all_faces)
     except OSError as exc:
         raise CliError(f"Could not read image file: {input_filename}: {exc}") from exc
+    except ValueError as exc:
+        raise CliError(str(exc)) from None
+    outputs = [
+        (face_output_filename(output_filename, i), image) for i, image in enumerate(images)
+    ]
+    return outputs, output_format(input_format, output_filename)
+
+
+def write_outputs(input_filename, outputs, image_format, stdout, metadata, preserve_metadata):
+    """Write (output_filename, image) crops, to stdout when output_filename is None."""
+    for output_filename, image in outputs:
+        if output_filename is None:
+            output_bytes(image, stdout or sys.stdout.buffer, image_format)
+        else:
+            output(
+                input_filename,
+                output_filename,
+                image,
+                image_format=image_format,
+                metadata=metadata,
+                preserve_metadata=preserve_metadata,
+            )
 
 
 def crop_file_to_output(
@@ -223,51 +502,80 @@ def crop_file_to_output(
     resize=True,
     stdout=None,
     verbose=False,
+    cropper=None,
+    preserve_metadata=True,
+    metrics_stream=None,
+    all_faces=None,
 ):
-    """Crop one image file to a file path or stdout."""
+    """
+    Crop one image file to a file path or stdout.
+
+    With all_faces, a dict of `Cropper.crop_all` options, every face is
+    written to its own `face_output_filename`. With metrics_stream, one
+    --metrics-json record is written for the file.
+    """
     timings = empty_timings()
     started = time.perf_counter()
     image_format = None
     output_label = output_filename or "stdout"
+    status = "error"
 
     try:
-        input_format, input_image = timed_step(
-            timings, "read", lambda: read_input_file(input_filename)
-        )
-        image, image_format = timed_step(
+        source, metadata = timed_step(
             timings,
-            "process",
-            lambda: crop_image(
-                input_image,
-                input_format,
-                output_filename,
-                fheight,
-                fwidth,
-                face_percent,
-                resize,
+            "read",
+            lambda: read_input_file(
+                input_filename, preserve_metadata and output_filename is not None
             ),
         )
-        if image is None:
-            print(f"No face detected: {input_filename}", file=sys.stderr)
-            return 1
-
-        if output_filename is None:
-            timed_step(
+        if all_faces is None:
+            image, image_format = timed_step(
                 timings,
-                "write",
-                lambda: output_bytes(image, stdout or sys.stdout.buffer, image_format),
+                "process",
+                lambda: crop_input_file(
+                    input_filename,
+                    source,
+                    metadata.format,
+                    output_filename,
+                    fheight,
+                    fwidth,
+                    face_percent,
+                    resize,
+                    cropper,
+                ),
             )
+            outputs = [] if image is None else [(output_filename, image)]
         else:
-            timed_step(
+            outputs, image_format = timed_step(
                 timings,
-                "write",
-                lambda: output(
+                "process",
+                lambda: crop_input_faces(
                     input_filename,
+                    source,
+                    metadata.format,
                     output_filename,
-                    image,
-                    image_format=image_format,
+                    cropper,
+                    all_faces,
                 ),
             )
+        if not outputs:
+            status = "no_face"
+            print(f"No face detected: {input_filename}", file=sys.stderr)
+            return 1
+
+        timed_step(
+            timings,
+            "write",
+            lambda: write_outputs(
+                input_filename,
+                outputs,
+                image_format,
+                stdout,
+                metadata,
+                preserve_metadata,
+            ),
+        )
+        status = "ok"
         return 0
     except CliError as exc:
         print(exc, file=sys.stderr)
@@ -278,6 +586,16 @@ def crop_file_to_output(
         finish_timings(timings, started)
         if verbose:
             print_verbose(input_filename, output_label, image_format, timings)
+        if metrics_stream is not None:
+            write_metrics(
+                metrics_stream,
+                take_metrics(cropper),
+                input_filename,
+                output_filename,
+                status,
+                read=timings["read"],
+                write=timings["write"],
+            )
 
 
 def crop_stdin_to_stdout(
@@ -288,6 +606,8 @@ def crop_stdin_to_stdout(
     face_percent=50,
     resize=True,
     verbose=False,
+    cropper=None,
+    metrics_stream=None,
 ):
     """Read image bytes from stdin, crop, and write image bytes to stdout."""
     stdin = stdin or sys.stdin.buffer
@@ -295,10 +615,13 @@ def crop_stdin_to_stdout(
     timings = empty_timings()
     started = time.perf_counter()
     image_format = None
+    status = "error"
 
     try:
 
         def read_stdin_image():
+            from PIL import Image
+
             image_bytes = stdin.read()
             if not image_bytes:
                 return None, None, "No image bytes received on stdin"
@@ -330,12 +653,15 @@ def crop_stdin_to_stdout(
                 fwidth,
                 face_percent,
                 resize,
+                cropper,
             ),
         )
         if image is None:
+            status = "no_face"
             print("No face detected on stdin image", file=sys.stderr)
             return 1
         timed_step(timings, "write", lambda: output_bytes(image, stdout, image_format))
+        status = "ok"
         return 0
     except BrokenPipeError:
         return 1
@@ -343,27 +669,255 @@ def crop_stdin_to_stdout(
         finish_timings(timings, started)
         if verbose:
             print_verbose("stdin", "stdout", image_format, timings)
+        if metrics_stream is not None:
+            write_metrics(
+                metrics_stream,
+                take_metrics(cropper),
+                "-",
+                None,
+                status,
+                read=timings["read"],
+                write=timings["write"],
+            )
+
+
+def read_frames(stream):
+    """Yield length-prefixed frames from a binary stream until end of file."""
+    while True:
+        header = stream.read(FRAME_HEADER.size)
+        if not header:
+            return
+        if len(header) < FRAME_HEADER.size:
+            raise CliError("Truncated frame header on stdin")
+        (length,) = FRAME_HEADER.unpack(header)
+        frame = stream.read(length)
+        if len(frame) < length:
+            raise CliError("Truncated frame on stdin")
+        yield frame
+
+
+def read_nul_delimited(stream, chunk_size=65536):
+    """Yield NUL-delimited paths from a binary stream as soon as they arrive."""
+    read = getattr(stream, "read1", stream.read)
+    pending = b""
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        pending += chunk
+        *paths, pending = pending.split(b"\0")
+        for path in paths:
+            if path:
+                yield os.fsdecode(path)
+    if pending:
+        yield os.fsdecode(pending)
+
+
+def write_frame(stream, data):
+    """Write one length-prefixed frame and flush it to the reader."""
+    stream.write(FRAME_HEADER.pack(len(data)))
+    stream.write(data)
+    stream.flush()
+
+
+def stream_status(result):
+    """Return the JSON status object for one streamed crop result."""
+    if result.error is not None:
+        return {"index": result.index, "status": "error", "error": str(result.error)}
+    if result.image is None:
+        return {"index": result.index, "status": "no_face"}
+    return {"index": result.index, "status": "ok"}
+
+
+def write_status(stream, status):
+    """Write one JSON status line and flush it to the reader."""
+    stream.write(json.dumps(status) + "\n")
+    stream.flush()
+
+
+def stream_frames(cropper, stdin, stdout, status_stream, workers, metrics_stream=None):
+    """Crop length-prefixed image frames, answering each with a frame."""
+    results = cropper.crop_many(read_frames(stdin), workers=workers, encode=output_format)
+    for result in results:
+        write_frame(stdout, result.data or b"")
+        status = stream_status(result)
+        if result.data is not None:
+            status.update(format=result.format, bytes=len(result.data))
+        write_status(status_stream, status)
+        if metrics_stream is not None:
+            write_metrics(metrics_stream, result.metrics, result.index, None, status["status"])
+
+
+def stream_paths(
+    cropper,
+    stdin,
+    stdout,
+    output_dir,
+    workers,
+    preserve_metadata=True,
+    metrics_stream=None,
+):
+    """Crop NUL-delimited input paths into output_dir, answering in JSON lines."""
+    results = cropper.crop_many(read_nul_delimited(stdin), workers=workers)
+    outputs = {}
+    for result in results:
+        status = stream_status(result)
+        status["input"] = result.source
+        written = {}
+        if result.image is not None:
+            started = time.perf_counter()
+            write_stream_output(result, status, output_dir, preserve_metadata, outputs)
+            written["write"] = time.perf_counter() - started
+        write_status(stdout, status)
+        if metrics_stream is not None:
+            write_metrics(
+                metrics_stream,
+                result.metrics,
+                result.source,
+                status.get("output"),
+                status["status"],
+                **written,
+            )
+
+
+def write_stream_output(result, status, output_dir, preserve_metadata, written):
+    """
+    Write the crop of a --stream paths result, recording it in status.
+
+    `written` maps the output names already written to their inputs; an
+    input whose name is taken is reported as an error instead of
+    overwriting the earlier crop.
+    """
+    name = os.path.basename(result.source)
+    output_filename = os.path.join(output_dir, name)
+    key = os.path.normcase(name)
+    try:
+        if key in written:
+            raise CliError(
+                f"Inputs {written[key]} and {result.source} would both be "
+                f"written to {name}"
+            )
+        validate_output_extension(output_filename)
+        output(
+            result.source,
+            output_filename,
+            result.image,
+            preserve_metadata=preserve_metadata,
+        )
+        written[key] = result.source
+        status["output"] = output_filename
+    except (CliError, OSError) as exc:
+        status.update(status="error", error=str(exc))
+
+
+def crop_stream(
+    mode,
+    stdin=None,
+    stdout=None,
+    output_dir=None,
+    cropper=None,
+    workers=2,
+    preserve_metadata=True,
+    metrics_stream=None,
+):
+    """
+    Crop many images over stdin/stdout in one long-lived process.
+
+    In "frames" mode, stdin carries length-prefixed image bytes and every
+    frame is answered on stdout with a length-prefixed cropped image, or an
+    empty frame when it fails; JSON status lines go to stderr. In "paths"
+    mode, stdin carries NUL-delimited image paths, crops are written to
+    output_dir and JSON status lines go to stdout.
+
+    One warm Cropper serves every image, and the next input is read while
+    the previous one is processed. Returns 0 at end of input, or 1 when the
+    input stream is malformed. With metrics_stream, a --metrics-json record
+    is written for every image.
+    """
+    stdin = stdin or sys.stdin.buffer
+    cropper = cropper or make_cropper()
+    try:
+        if mode == "frames":
+            stream_frames(
+                cropper,
+                stdin,
+                stdout or sys.stdout.buffer,
+                sys.stderr,
+                workers,
+                metrics_stream,
+            )
+        else:
+            stream_paths(
+                cropper,
+                stdin,
+                stdout or sys.stdout,
+                output_dir,
+                workers,
+                preserve_metadata,
+                metrics_stream,
+            )
+    except CliError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        return 1
+    return 0
 
 
 def parse_args(args):
     """Helper function. Parses the arguments given to the CLI."""
     help_d = {
         "desc": "Automatically crops faces from pictures",
-        "source": "Image file, or '-' to read image bytes from stdin.",
+        "source": """Image files or directories, or '-' to read image bytes
+                      from stdin.""",
         "output": """Output file, or output directory for a single input image.
-                      If omitted, cropped image bytes are written to stdout.""",
+                      Required as a directory for directories or multiple
+                      inputs. If omitted, cropped image bytes are written to
+                      stdout.""",
         "width": "Width of cropped files in px. Default=500",
         "height": "Height of cropped files in px. Default=500",
         "facePercent": "Percentage of face to image height",
         "no_resize": """Do not resize images to the specified width and height,
                       but instead use the original image's pixels.""",
         "verbose": "Write timings and basic processing details to stderr",
+        "no_preserve_metadata": """Do not copy EXIF, ICC profile, permissions and
+                      timestamps from input files to output files.""",
+        "jobs": """Number of worker processes for directories or multiple
+                      inputs. Default=1""",
+        "detect_max_side": """Detect faces on a copy of each image downscaled to
+                      at most this many pixels on its long side.""",
+        "resize_backend": """How crops are resized: 'pillow' (default),
+                      'cv2-area' or 'pillow-reduce'. The latter two are faster
+                      for large downscales.""",
+        "detect_tile_size": """Detect faces on images larger than this many
+                      pixels in overlapping tiles of this size, bounding
+                      detection memory on very large scans.""",
+        "detect_strategy": """'full' (default) detects faces on the whole image;
+                      'coarse-to-fine' detects on a small copy first and then
+                      only around the faces it found.""",
+        "detection_cache": """SQLite file caching face detections by image
+                      content, so re-cropping the same images at other sizes
+                      skips face detection.""",
+        "stream": """Keep running and crop many images over stdin/stdout:
+                      'frames' reads length-prefixed image bytes and writes
+                      length-prefixed crops; 'paths' reads NUL-delimited paths,
+                      writes crops to the --output directory and JSON status
+                      lines to stdout.""",
+        "metrics_json": """Write per-image stage timings and face counts to
+                      this file as JSON lines.""",
+        "all_faces": """Crop every detected face instead of only the largest,
+                      writing NAME_face_0.EXT, NAME_face_1.EXT, ... largest
+                      face first. Requires --output.""",
+        "min_face_size": """With --all-faces, skip faces narrower or shorter
+                      than this many pixels.""",
+        "min_score": """With --all-faces, skip faces detected with a
+                      confidence score below this, between 0 and 1.""",
     }
 
     parser = argparse.ArgumentParser(description=help_d["desc"])
     parser.add_argument(
         "source",
-        nargs="?",
+        nargs="*",
         type=input_path,
         help=help_d["source"],
     )
@@ -385,6 +939,11 @@ def parse_args(args):
         action="store_true",
         help=help_d["no_resize"],
     )
+    parser.add_argument(
+        "--no-preserve-metadata",
+        action="store_true",
+        help=help_d["no_preserve_metadata"],
+    )
     parser.add_argument(
         "-o",
         "--output",
@@ -398,6 +957,138 @@ def parse_args(args):
     parser.add_argument(
         "--facePercent", type=size, default=50, help=help_d["facePercent"]
     )
+    parser.add_argument("-j", "--jobs", type=jobs, default=1, help=help_d["jobs"])
+    parser.add_argument(
+        "--detect-max-side", type=size, default=None, help=help_d["detect_max_side"]
+    )
+    parser.add_argument(
+        "--resize-backend",
+        choices=RESIZE_BACKENDS,
+        default="pillow",
+        help=help_d["resize_backend"],
+    )
+    parser.add_argument(
+        "--detect-tile-size", type=size, default=None, help=help_d["detect_tile_size"]
+    )
+    parser.add_argument(
+        "--detect-strategy",
+        choices=DETECT_STRATEGIES,
+        default="full",
+        help=help_d["detect_strategy"],
+    )
+    parser.add_argument(
+        "--detection-cache", default=None, help=help_d["detection_cache"]
+    )
+    parser.add_argument("--stream", choices=STREAM_MODES, help=help_d["stream"])
+    parser.add_argument(
+        "--metrics-json", metavar="FILE", default=None, help=help_d["metrics_json"]
+    )
+    parser.add_argument("--all-faces", action="store_true", help=help_d["all_faces"])
+    parser.add_argument(
+        "--min-face-size", type=size, default=None, help=help_d["min_face_size"]
+    )
+    parser.add_argument("--min-score", type=score, default=None, help=help_d["min_score"])
+    args = parser.parse_args(args)
+    if not args.all_faces and (args.min_face_size or args.min_score is not None):
+        parser.error("--min-face-size and --min-score require --all-faces")
+    return args
+
+
+def parse_serve_args(args):
+    """Parses the arguments given to `autocrop serve`."""
+    help_d = {
+        "desc": """Serve face crops over HTTP. POST image bytes to /crop, with
+                      optional width, height, face_percent and format query
+                      parameters; GET /health for request and latency stats.""",
+        "host": "Address to listen on. Default=127.0.0.1",
+        "port": "TCP port to listen on, 0 for any free port. Default=8080",
+        "unix": "Listen on this Unix socket path instead of a TCP port.",
+        "width": "Default width of cropped images in px. Default=500",
+        "height": "Default height of cropped images in px. Default=500",
+        "facePercent": "Default percentage of face to image height",
+        "no_resize": """Do not resize crops to the requested width and height,
+                      but instead return the original image's pixels.""",
+        "detect_max_side": """Detect faces on a copy of each image downscaled to
+                      at most this many pixels on its long side.""",
+        "max_batch": "Most detector calls run in one micro-batch. Default=8",
+        "max_wait_ms": """Milliseconds a micro-batch waits for more concurrent
+                      requests. Default=2""",
+        "verbose": "Log every request to stderr",
+    }
+
+    parser = argparse.ArgumentParser(prog="autocrop serve", description=help_d["desc"])
+    parser.add_argument("--host", default="127.0.0.1", help=help_d["host"])
+    parser.add_argument("--port", type=port, default=8080, help=help_d["port"])
+    parser.add_argument("--unix", default=None, help=help_d["unix"])
+    parser.add_argument("-w", "--width", type=size, default=500, help=help_d["width"])
+    parser.add_argument("-H", "--height", type=size, default=500, help=help_d["height"])
+    parser.add_argument(
+        "--facePercent", type=size, default=50, help=help_d["facePercent"]
+    )
+    parser.add_argument(
+        "-n", "--no-resize", action="store_true", help=help_d["no_resize"]
+    )
+    parser.add_argument(
+        "--detect-max-side", type=size, default=None, help=help_d["detect_max_side"]
+    )
+    parser.add_argument("--max-batch", type=jobs, default=8, help=help_d["max_batch"])
+    parser.add_argument(
+        "--max-wait-ms", type=milliseconds, default=2.0, help=help_d["max_wait_ms"]
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help=help_d["verbose"]
+    )
+    return parser.parse_args(args)
+
+
+def parse_video_args(args):
+    """Parses the arguments given to `autocrop video`."""
+    help_d = {
+        "desc": """Crop a video, or a directory of frames, around the face. Faces
+                      are detected on every Nth frame and interpolated in
+                      between, and the crop window is smoothed over time.""",
+        "source": "Video file, or directory of images taken in name order.",
+        "output": """Output video (.mp4, .m4v, .mov, .mkv or .avi), or a
+                      directory receiving numbered PNG frames.""",
+        "width": "Width of cropped frames in px. Default=500",
+        "height": "Height of cropped frames in px. Default=500",
+        "facePercent": "Percentage of face to frame height",
+        "detect_max_side": """Detect faces on a copy of each keyframe downscaled
+                      to at most this many pixels on its long side.""",
+        "detect_every": """Detect faces on every this many frames, interpolating
+                      the face position in between. Default=5""",
+        "smoothing": """Weight of the previous crop window when smoothing its
+                      movement, from 0 (none) to below 1. Default=0.5""",
+        "fps": """Frame rate of the output video. Defaults to the input's,
+                      or 25 for frame directories.""",
+        "resize_backend": """How frames are resized: 'pillow' (default),
+                      'cv2-area' or 'pillow-reduce'.""",
+    }
+
+    parser = argparse.ArgumentParser(prog="autocrop video", description=help_d["desc"])
+    parser.add_argument("source", help=help_d["source"])
+    parser.add_argument("-o", "--output", required=True, help=help_d["output"])
+    parser.add_argument("-w", "--width", type=size, default=500, help=help_d["width"])
+    parser.add_argument("-H", "--height", type=size, default=500, help=help_d["height"])
+    parser.add_argument(
+        "--facePercent", type=size, default=50, help=help_d["facePercent"]
+    )
+    parser.add_argument(
+        "--detect-max-side", type=size, default=None, help=help_d["detect_max_side"]
+    )
+    parser.add_argument(
+        "--detect-every", type=jobs, default=5, help=help_d["detect_every"]
+    )
+    parser.add_argument(
+        "--smoothing", type=smoothing, default=0.5, help=help_d["smoothing"]
+    )
+    parser.add_argument("--fps", type=frame_rate, default=None, help=help_d["fps"])
+    parser.add_argument(
+        "--resize-backend",
+        choices=RESIZE_BACKENDS,
+        default="pillow",
+        help=help_d["resize_backend"],
+    )
     return parser.parse_args(args)
 
 
@@ -417,48 +1108,398 @@ def resolve_file_output(input_source, output_arg):
     return validate_output_extension(os.path.abspath(output_arg))
 
 
+def all_faces_options(args):
+    """Return `Cropper.crop_all` options for --all-faces, or None without it."""
+    if not args.all_faces:
+        return None
+    return {"min_face_size": args.min_face_size, "min_score": args.min_score}
+
+
 def run_single_file_mode(args, input_source, resize):
     """Run single-image file mode."""
+    if args.all_faces and args.output is None:
+        raise CliError("--all-faces requires --output")
     output_filename = resolve_file_output(input_source, args.output)
-    return crop_file_to_output(
-        input_source,
+    with metrics_output(args.metrics_json) as metrics_stream:
+        return crop_file_to_output(
+            input_source,
+            output_filename,
+            args.height,
+            args.width,
+            args.facePercent,
+            resize,
+            verbose=args.verbose,
+            cropper=make_cropper(**cropper_options(args, resize)),
+            preserve_metadata=not args.no_preserve_metadata,
+            metrics_stream=metrics_stream,
+            all_faces=all_faces_options(args),
+        )
+
+
+def cropper_options(args, resize):
+    """Return Cropper keyword arguments for the parsed CLI options."""
+    options = {
+        "width": args.width,
+        "height": args.height,
+        "face_percent": args.facePercent,
+        "resize": resize,
+        "detect_max_side": args.detect_max_side,
+        "resize_backend": args.resize_backend,
+        "detect_tile_size": args.detect_tile_size,
+        "detect_strategy": args.detect_strategy,
+    }
+    if args.detection_cache:
+        options["detection_cache"] = open_detection_cache(args.detection_cache)
+    if args.metrics_json:
+        options["metrics_callback"] = MetricsRecorder()
+    return options
+
+
+def open_detection_cache(path):
+    """Open the on-disk detection cache at path."""
+    import sqlite3
+
+    cache = _timing.timed_import(f"{__package__}.cache")
+    try:
+        return cache.DetectionCache(path)
+    except sqlite3.Error as exc:
+        raise CliError(f"Could not open detection cache {path}: {exc}") from None
+
+
+def iter_batch_inputs(sources, output_dir=None):
+    """
+    Yield (input_filename, relative_output_name, error) triples for batch
+    mode.
+
+    Directories are walked recursively, skipping `output_dir` when it lies
+    inside one. `error` is None, or a message when an earlier input is
+    already written to the same output name; such inputs must not be
+    cropped.
+    """
+    seen = {}
+    for input_filename, relative_name in _walk_batch_sources(sources, output_dir):
+        key = os.path.normcase(os.path.normpath(relative_name))
+        error = None
+        if key in seen:
+            error = (
+                f"Inputs {seen[key]} and {input_filename} would both be "
+                f"written to {relative_name}"
+            )
+        else:
+            seen[key] = input_filename
+        yield input_filename, relative_name, error
+
+
+def _walk_batch_sources(sources, output_dir):
+    skip = os.path.realpath(output_dir) if output_dir is not None else None
+    for source in sources:
+        if not os.path.isdir(source):
+            yield source, os.path.basename(source)
+            continue
+        for root, dirs, files in os.walk(source):
+            dirs[:] = sorted(
+                name for name in dirs if os.path.realpath(os.path.join(root, name)) != skip
+            )
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in INPUT_FILETYPES:
+                    input_filename = os.path.join(root, name)
+                    yield input_filename, os.path.relpath(input_filename, source)
+
+
+def resolve_batch_output_dir(output_arg):
+    """Resolve --output for modes that always write into a directory."""
+    if output_arg is None:
+        raise CliError(
+            "An output directory is required for directories, multiple inputs "
+            "and --stream paths"
+        )
+    if not os.path.isdir(output_arg) and os.path.splitext(output_arg)[1]:
+        raise CliError(f"Output must be a directory: {output_arg}")
+    output_dir = os.path.abspath(output_arg)
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+
+_worker_cropper = None
+
+
+def _init_batch_worker(options, single_threaded=False):
+    """Build the one Cropper a batch worker reuses for every image."""
+    global _worker_cropper
+    if single_threaded:
+        # Parallelism comes from the process pool; letting every worker also
+        # spin up one OpenCV thread per core oversubscribes the CPU.
+        import cv2
+
+        cv2.setNumThreads(1)
+    _worker_cropper = make_cropper(**options)
+
+
+def _crop_batch_item(task):
+    """
+    Crop one batch input, returning its status, captured diagnostics and
+    --metrics-json record. Inputs with an `iter_batch_inputs` error fail
+    without being cropped.
+    """
+    (
+        input_filename,
         output_filename,
-        args.height,
-        args.width,
-        args.facePercent,
-        resize,
-        verbose=args.verbose,
+        error,
+        verbose,
+        preserve_metadata,
+        record_metrics,
+        all_faces,
+    ) = task
+    messages = io.StringIO()
+    metrics = io.StringIO() if record_metrics else None
+    with contextlib.redirect_stderr(messages):
+        try:
+            if error is not None:
+                raise CliError(error)
+            validate_output_extension(output_filename)
+            os.makedirs(os.path.dirname(output_filename), exist_ok=True)
+            status = crop_file_to_output(
+                input_filename,
+                output_filename,
+                verbose=verbose,
+                cropper=_worker_cropper,
+                preserve_metadata=preserve_metadata,
+                metrics_stream=metrics,
+                all_faces=all_faces,
+            )
+        except Exception as exc:
+            print(f"Could not crop {input_filename}: {exc}", file=sys.stderr)
+            status = 1
+    metrics = metrics.getvalue() if metrics is not None else ""
+    return input_filename, output_filename, status, messages.getvalue(), metrics
+
+
+def report_batch_item(input_filename, output_filename, status, messages, metrics, metrics_stream):
+    """Write the per-file result of a batch item to stderr and its metrics."""
+    sys.stderr.write(messages)
+    if status == 0:
+        print(f"Cropped: {input_filename} -> {output_filename}", file=sys.stderr)
+    if metrics_stream is not None:
+        metrics_stream.write(metrics)
+
+
+def run_batch_mode(args, sources, resize):
+    """Crop every image in sources into the output directory."""
+    output_dir = resolve_batch_output_dir(args.output)
+    tasks = (
+        (
+            input_filename,
+            os.path.join(output_dir, relative_name),
+            error,
+            args.verbose,
+            not args.no_preserve_metadata,
+            args.metrics_json is not None,
+            all_faces_options(args),
+        )
+        for input_filename, relative_name, error in iter_batch_inputs(sources, output_dir)
     )
+    options = cropper_options(args, resize)
+    with metrics_output(args.metrics_json) as metrics_stream:
+        if args.jobs == 1:
+            _init_batch_worker(options)
+            results = map(_crop_batch_item, tasks)
+            return report_batch_results(results, metrics_stream)
 
+        from concurrent.futures import ProcessPoolExecutor
 
-def command_line_interface():
+        with ProcessPoolExecutor(
+            max_workers=args.jobs,
+            initializer=_init_batch_worker,
+            initargs=(options, True),
+        ) as executor:
+            results = map_bounded(
+                executor, _crop_batch_item, tasks, BATCH_TASKS_PER_JOB * args.jobs
+            )
+            return report_batch_results(results, metrics_stream)
+
+
+def map_bounded(executor, function, items, window):
     """
-    AUTOCROP
-    --------
-    Crops faces from image files or stdin.
+    Yield `function(item)` for every item, in order, computed on `executor`.
+
+    Unlike `Executor.map`, which submits every item up front, at most
+    `window` items are submitted and not yet yielded at any time, so items
+    are pulled lazily from large directory walks.
     """
-    args = parse_args(sys.argv[1:])
-    input_source = args.source
-    if input_source is None:
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def report_batch_results(results, metrics_stream=None):
+    """Report batch results as they arrive and return the exit status."""
+    cropped = failed = 0
+    for result in results:
+        report_batch_item(*result, metrics_stream)
+        if result[2] == 0:
+            cropped += 1
+        else:
+            failed += 1
+    print(f"Batch: {cropped} cropped, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def run_stream_mode(args, resize):
+    """Run long-lived streaming mode."""
+    if args.source:
+        raise CliError("Input files cannot be combined with --stream")
+    if args.all_faces:
+        raise CliError("--all-faces cannot be combined with --stream")
+    output_dir = None
+    if args.stream == "paths":
+        output_dir = resolve_batch_output_dir(args.output)
+    with metrics_output(args.metrics_json) as metrics_stream:
+        return crop_stream(
+            args.stream,
+            output_dir=output_dir,
+            cropper=make_cropper(**cropper_options(args, resize)),
+            preserve_metadata=not args.no_preserve_metadata,
+            metrics_stream=metrics_stream,
+        )
+
+
+def run_serve_mode(args):
+    """Run the crop server until interrupted."""
+    from .server import CropService, create_server
+
+    service = CropService(
+        width=args.width,
+        height=args.height,
+        face_percent=args.facePercent,
+        resize=not args.no_resize,
+        detect_max_side=args.detect_max_side,
+        max_batch=args.max_batch,
+        max_wait=args.max_wait_ms / 1000,
+    )
+    try:
+        server = create_server(
+            service, host=args.host, port=args.port, unix_socket=args.unix, verbose=args.verbose
+        )
+    except OSError as exc:
+        service.close()
+        raise CliError(f"Could not start server: {exc}") from None
+    service.warm_up()
+    print(f"Serving on {server.url}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+def run_video_mode(args):
+    """Crop a video or frame directory, reporting throughput to stderr."""
+    from .video import crop_video
+
+    if not os.path.exists(args.source):
+        raise CliError(f"Input does not exist: {args.source}")
+    cropper = make_cropper(
+        width=args.width,
+        height=args.height,
+        face_percent=args.facePercent,
+        detect_max_side=args.detect_max_side,
+        resize_backend=args.resize_backend,
+    )
+    try:
+        report = crop_video(
+            cropper,
+            args.source,
+            args.output,
+            detect_every=args.detect_every,
+            smoothing=args.smoothing,
+            fps=args.fps,
+        )
+    except OSError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    print(
+        f"Video: {report.frames} frames in {report.seconds:.2f}s ({report.fps:.1f} fps), "
+        f"{report.keyframes} keyframes, {report.keyframes_with_faces} with faces",
+        file=sys.stderr,
+    )
+    return 0 if report.frames else 1
+
+
+def resolve_sources(sources):
+    """Return input sources, reading from stdin when none are given."""
+    if not sources:
         if sys.stdin.isatty():
             raise SystemExit("autocrop: an input image or '-' is required")
-        input_source = "-"
+        return ["-"]
+    if "-" in sources and len(sources) > 1:
+        raise SystemExit("autocrop: '-' cannot be combined with other inputs")
+    return sources
 
-    resize = not args.no_resize
 
-    if input_source == "-":
-        status = crop_stdin_to_stdout(
+def run_mode(mode, *args):
+    """Run a CLI mode, reporting usage errors with exit status 2."""
+    try:
+        return mode(*args)
+    except CliError as exc:
+        print(exc, file=sys.stderr)
+        return 2
+
+
+def run_stdin_mode(args, resize):
+    """Crop image bytes from stdin to stdout."""
+    if args.all_faces:
+        raise CliError("--all-faces requires input files and --output")
+    with metrics_output(args.metrics_json) as metrics_stream:
+        return crop_stdin_to_stdout(
             fheight=args.height,
             fwidth=args.width,
             face_percent=args.facePercent,
             resize=resize,
             verbose=args.verbose,
+            cropper=make_cropper(**cropper_options(args, resize)),
+            metrics_stream=metrics_stream,
         )
-        sys.exit(status)
 
-    try:
-        status = run_single_file_mode(args, input_source, resize)
-    except CliError as exc:
-        print(exc, file=sys.stderr)
-        status = 2
-    sys.exit(status)
+
+def run_file_mode(args, sources, resize):
+    """Run batch mode for directories or several inputs, else single-file mode."""
+    if len(sources) > 1 or os.path.isdir(sources[0]):
+        return run_batch_mode(args, sources, resize)
+    return run_single_file_mode(args, sources[0], resize)
+
+
+def command_line_interface():
+    """
+    AUTOCROP
+    --------
+    Crops faces from image files, directories, stdin or an image stream, or
+    serves crops over HTTP with `autocrop serve`, or crops videos with
+    `autocrop video`.
+    """
+    if sys.argv[1:2] == ["serve"]:
+        sys.exit(run_mode(run_serve_mode, parse_serve_args(sys.argv[2:])))
+    if sys.argv[1:2] == ["video"]:
+        sys.exit(run_mode(run_video_mode, parse_video_args(sys.argv[2:])))
+
+    args = parse_args(sys.argv[1:])
+    resize = not args.no_resize
+    if args.stream:
+        sys.exit(run_mode(run_stream_mode, args, resize))
+
+    sources = resolve_sources(args.source)
+
+    if sources == ["-"]:
+        sys.exit(run_mode(run_stdin_mode, args, resize))
+
+    sys.exit(run_mode(run_file_mode, args, sources, resize))
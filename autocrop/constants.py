@@ -116,3 +116,11 @@ OUTPUT_FORMATS_BY_EXTENSION = {
 INPUT_FILETYPES = frozenset(IMAGE_FORMATS_BY_EXTENSION)
 OUTPUT_FILETYPES = frozenset(OUTPUT_FORMATS_BY_EXTENSION)
 OUTPUT_FORMATS = frozenset(OUTPUT_FORMATS_BY_EXTENSION.values())
+
+# Backends `Cropper(resize_backend=...)` accepts, see `autocrop.resize_image`.
+# Kept here so the CLI can list them without importing OpenCV.
+RESIZE_BACKENDS = ("pillow", "cv2-area", "pillow-reduce")
+
+# Strategies `Cropper(detect_strategy=...)` accepts: detection on the whole
+# image, or `autocrop.yunet.CoarseToFineDetector`.
+DETECT_STRATEGIES = ("full", "coarse-to-fine")
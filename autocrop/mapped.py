@@ -0,0 +1,92 @@
+"""
+Memory-mapped crop inputs.
+
+Uncompressed `.npy` arrays and binary PPM/PGM files already hold pixels in
+array layout, so `Cropper` maps them read-only instead of decoding them.
+Detection then reads a view of the mapping, and only the crop rectangle is
+copied out, so memory per image stays close to the output size.
+"""
+
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+# Extensions of files mapped with `np.load(mmap_mode="r")`.
+NPY_EXTENSIONS = frozenset({".npy"})
+
+# Extensions of Netpbm files mapped when they hold binary PGM or PPM data.
+NETPBM_EXTENSIONS = frozenset({".pgm", ".pnm", ".ppm"})
+
+# Binary Netpbm magic numbers and the channels per pixel of each.
+NETPBM_CHANNELS = {b"P5": 1, b"P6": 3}
+
+# Netpbm header: magic, width, height and maxval separated by whitespace and
+# comments, then exactly one whitespace character before the pixels.
+NETPBM_HEADER = re.compile(
+    rb"(P[56])(?:\s+|#[^\n]*\n)+(\d+)(?:\s+|#[^\n]*\n)+(\d+)(?:\s+|#[^\n]*\n)+(\d+)\s"
+)
+
+# Longest Netpbm header read, including comments.
+NETPBM_HEADER_BYTES = 4096
+
+# Image arrays mapped from a file.
+#
+# * `image`: read-only `np.memmap` of the pixels.
+# * `image_is_bgr`: True for `.npy` arrays, which are interpreted like array
+#   inputs, and False for RGB PPM files.
+# * `format`: Pillow format name of the file, None for `.npy` arrays.
+MappedImage = namedtuple("MappedImage", ["image", "image_is_bgr", "format"])
+
+
+def map_netpbm(path):
+    """
+    Return a read-only `np.memmap` of a binary PGM or PPM file, or None.
+
+    Only files with a maxval of 255 are mapped. Pillow rescales smaller
+    maxvals to the full 8-bit range, so those files, like 16-bit, ASCII and
+    bitmap variants, return None and are left to Pillow. Raises OSError, as
+    Pillow does, when the file is shorter than its header says.
+    """
+    with open(path, "rb") as f:
+        header = f.read(NETPBM_HEADER_BYTES)
+        file_size = os.fstat(f.fileno()).st_size
+    match = NETPBM_HEADER.match(header)
+    if match is None:
+        return None
+    magic, width, height, maxval = match.groups()
+    width, height, maxval = int(width), int(height), int(maxval)
+    if not (maxval == 255 and width and height):
+        return None
+    channels = NETPBM_CHANNELS[magic]
+    if match.end() + height * width * channels > file_size:
+        raise OSError(f"Truncated image file: {os.fspath(path)}")
+    shape = (height, width) if channels == 1 else (height, width, channels)
+    return np.memmap(path, dtype=np.uint8, mode="r", offset=match.end(), shape=shape)
+
+
+def map_file(path):
+    """
+    Map an `.npy` array or binary PGM/PPM file read-only.
+
+    Returns a `MappedImage`, or None when `path` is not a file that can be
+    mapped. Raises OSError for truncated or corrupt files, like Pillow does
+    for files it cannot decode.
+    """
+    extension = os.path.splitext(os.fspath(path))[1].lower()
+    if extension in NPY_EXTENSIONS:
+        try:
+            image = np.load(path, mmap_mode="r", allow_pickle=False)
+        except ValueError as exc:
+            # numpy checks the data length against the header, and refuses
+            # object arrays, with ValueError.
+            raise OSError(f"Could not read image array {os.fspath(path)}: {exc}") from exc
+        if image.ndim not in (2, 3):
+            raise ValueError(f"Expected a 2 or 3 dimensional image array in {path}")
+        return MappedImage(image, True, None)
+    if extension in NETPBM_EXTENSIONS:
+        image = map_netpbm(path)
+        if image is not None:
+            return MappedImage(image, False, "PPM")
+    return None
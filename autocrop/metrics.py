@@ -0,0 +1,99 @@
+"""
+Per-crop stage timings.
+
+`Cropper(metrics_callback=...)` records a `CropMetrics` for every image it
+crops and passes it to the callback once the crop is done, so applications
+can log or aggregate where time goes without timing `Cropper` internals
+themselves.
+"""
+
+import contextlib
+import os
+import time
+
+# Stages `Cropper` records, in the order an image goes through them.
+STAGES = ("decode", "color", "detect", "geometry", "resize", "encode")
+
+
+class CropMetrics:
+    """
+    Stage timings and face count of one crop.
+
+    Attributes
+    ----------
+    - `source` : {`str`, `None`}
+        * The input path, or None for encoded bytes and arrays.
+    - `timings` : `dict`
+        * Seconds spent per stage. Cropper records "decode", "color"
+          (channel conversions for detection and output), "detect",
+          "geometry", "resize" and, for `crop_many` with `encode`, "encode".
+          Stages an image did not go through are absent; callers may add
+          their own, such as the CLI's "read" and "write".
+    - `faces` : {`int`, `None`}
+        * Number of faces found, None until detection has run.
+    - `cache_hit` : `bool`
+        * Whether the faces came from the detection cache.
+    - `image_size` : {`tuple`, `None`}
+        * Full-resolution (width, height) of the input.
+    """
+
+    __slots__ = ("source", "timings", "faces", "cache_hit", "image_size")
+
+    def __init__(self, source=None):
+        self.source = source
+        self.timings = {}
+        self.faces = None
+        self.cache_hit = False
+        self.image_size = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Add the time spent in the `with` block to stage `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    @property
+    def total(self):
+        """Seconds spent over all recorded stages."""
+        return sum(self.timings.values())
+
+    def as_dict(self):
+        """Return the metrics as a JSON-serializable dict, timings in ms."""
+        return {
+            "source": self.source,
+            "image_size": None if self.image_size is None else list(self.image_size),
+            "faces": self.faces,
+            "cache_hit": self.cache_hit,
+            "timings_ms": {
+                name: round(self.timings[name] * 1000, 3) for name in self._stage_order()
+            },
+            "total_ms": round(self.total * 1000, 3),
+        }
+
+    def _stage_order(self):
+        """Recorded stage names, Cropper stages first in pipeline order."""
+        known = [name for name in STAGES if name in self.timings]
+        return known + [name for name in self.timings if name not in STAGES]
+
+    def __repr__(self):
+        return f"CropMetrics({self.as_dict()!r})"
+
+
+def source_label(path_or_array):
+    """Return the path of a crop input for `CropMetrics.source`, or None."""
+    if isinstance(path_or_array, (str, os.PathLike)):
+        return os.fspath(path_or_array)
+    return None
+
+
+def timed(metrics, name):
+    """Time stage `name` into metrics, or do nothing when metrics is None."""
+    if metrics is None:
+        return contextlib.nullcontext()
+    return metrics.stage(name)
@@ -0,0 +1,297 @@
+"""
+Pipelined batch cropping.
+
+`crop_many` runs decoding, face detection, cropping/resizing and optional
+encoding as separate stages connected by bounded queues. Decoding and
+resizing run on worker threads while OpenCV runs inference, and Pillow and
+OpenCV release the GIL while they work, so I/O, codecs and the detector
+overlap. Inputs are pulled lazily and results are streamed back, so the input
+iterable is never materialized.
+"""
+
+import queue
+import threading
+from collections import namedtuple
+
+from .autocrop import encode_image
+from .metrics import timed
+
+# Result of cropping one item of `crop_many`.
+#
+# * `index`: position of the item in the input iterable.
+# * `source`: the input item itself.
+# * `image`: cropped RGB/RGBA array, or None when no face was found or the
+#   item failed.
+# * `data`: encoded bytes of `image` when `encode` was requested, else None.
+# * `error`: the exception raised while processing the item, else None.
+# * `format`: Pillow format name of `data`, else None.
+# * `metrics`: the item's `CropMetrics` when the cropper has a metrics
+#   callback and the item did not fail, else None.
+CropResult = namedtuple(
+    "CropResult",
+    ["index", "source", "image", "data", "error", "format", "metrics"],
+    defaults=(None,),
+)
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+
+class _Job:
+    """Mutable per-item state carried between pipeline stages."""
+
+    __slots__ = (
+        "index",
+        "source",
+        "decoded",
+        "pos",
+        "image",
+        "data",
+        "error",
+        "format",
+        "metrics",
+    )
+
+    def __init__(self, index, source):
+        self.index = index
+        self.source = source
+        self.decoded = None
+        self.pos = None
+        self.image = None
+        self.data = None
+        self.error = None
+        self.format = None
+        self.metrics = None
+
+    def result(self):
+        return CropResult(
+            self.index,
+            self.source,
+            self.image,
+            self.data,
+            self.error,
+            self.format,
+            self.metrics,
+        )
+
+
+def _put(outbox, item, stop):
+    """Put item on a bounded queue unless the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            outbox.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _acquire(semaphore, stop):
+    """Acquire a semaphore unless the pipeline is stopped."""
+    while not stop.is_set():
+        if semaphore.acquire(timeout=_POLL_SECONDS):
+            return True
+    return False
+
+
+def _get(inbox, stop):
+    """Get the next item from a queue, or _DONE if the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            return inbox.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+class _Stage:
+    """A pool of threads applying one step to every job on an input queue."""
+
+    def __init__(self, name, step, workers, inbox, outbox, downstream_workers, stop):
+        self.step = step
+        self.inbox = inbox
+        self.outbox = outbox
+        self.downstream_workers = downstream_workers
+        self.stop = stop
+        self._running = workers
+        self._lock = threading.Lock()
+        self.threads = [
+            threading.Thread(target=self._run, name=f"autocrop-{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            job = _get(self.inbox, self.stop)
+            if job is _DONE:
+                break
+            if job.error is None:
+                try:
+                    self.step(job)
+                except Exception as exc:
+                    job.error = exc
+            if not _put(self.outbox, job, self.stop):
+                return
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last:
+            for _ in range(self.downstream_workers):
+                _put(self.outbox, _DONE, self.stop)
+
+
+def _decode_job(cropper, job):
+    job.decoded = cropper._load(job.source)
+
+
+def _detect_job(cropper, job):
+    job.pos = cropper._locate(job.decoded)
+    if job.pos is None:
+        # Keep only the metrics of images without faces.
+        job.decoded = job.decoded._replace(image=None)
+
+
+def _crop_job(cropper, job, encode):
+    if job.pos is not None:
+        job.image = cropper._extract(job.decoded, job.pos)
+        if encode:
+            job.format = encode
+            if callable(encode):
+                job.format = encode(job.decoded.format)
+            with timed(job.decoded.metrics, "encode"):
+                job.data = encode_image(job.image, job.format)
+    job.metrics = job.decoded.metrics
+    cropper._report(job.decoded)
+    job.decoded = None
+
+
+def run_job(cropper, index, source, encode=None):
+    """Run every stage for one item in the calling thread and return its `CropResult`."""
+    job = _Job(index, source)
+    try:
+        _decode_job(cropper, job)
+        _detect_job(cropper, job)
+        _crop_job(cropper, job, encode)
+    except Exception as exc:
+        job.error = exc
+    return job.result()
+
+
+class _Pipeline:
+    def __init__(self, cropper, workers, encode):
+        self.cropper = cropper
+        self.encode = encode
+        self.stop = threading.Event()
+        self.feed_error = None
+        size = max(2, 2 * workers)
+        to_decode, to_detect, to_crop = (queue.Queue(size) for _ in range(3))
+        self.results = queue.Queue(size)
+        # Items fed but not yet handed to the consumer. Bounding them stops
+        # the feeder running ahead of a slow item while later results wait
+        # for it in `_in_order`.
+        self.window = threading.Semaphore(4 * size)
+        self.to_decode = to_decode
+        self.workers = workers
+        self.stages = [
+            _Stage("decode", self._decode, workers, to_decode, to_detect, 1, self.stop),
+            _Stage("detect", self._detect, 1, to_detect, to_crop, workers, self.stop),
+            _Stage("crop", self._crop, workers, to_crop, self.results, 1, self.stop),
+        ]
+
+    def _decode(self, job):
+        _decode_job(self.cropper, job)
+
+    def _detect(self, job):
+        _detect_job(self.cropper, job)
+
+    def _crop(self, job):
+        _crop_job(self.cropper, job, self.encode)
+
+    def _feed(self, items):
+        try:
+            for index, item in enumerate(items):
+                if not _acquire(self.window, self.stop):
+                    return
+                if not _put(self.to_decode, _Job(index, item), self.stop):
+                    return
+        except Exception as exc:
+            self.feed_error = exc
+        for _ in range(self.workers):
+            _put(self.to_decode, _DONE, self.stop)
+
+    def start(self, items):
+        for stage in self.stages:
+            stage.start()
+        threading.Thread(
+            target=self._feed, args=(items,), name="autocrop-feed", daemon=True
+        ).start()
+
+    def jobs(self):
+        """Yield finished jobs in completion order."""
+        while True:
+            job = _get(self.results, self.stop)
+            if job is _DONE:
+                break
+            yield job
+        if self.feed_error is not None:
+            raise self.feed_error
+
+
+def _in_order(jobs):
+    """Reorder jobs by input index."""
+    pending = {}
+    next_index = 0
+    for job in jobs:
+        pending[job.index] = job
+        while next_index in pending:
+            yield pending.pop(next_index)
+            next_index += 1
+
+
+def crop_many(cropper, items, workers=4, ordered=True, encode=None):
+    """
+    Crop every item of `items` with `cropper`, streaming `CropResult`s back.
+
+    Parameters
+    ----------
+    - `cropper` : `Cropper`
+        * The configured cropper. Its detector is only ever called from one
+          pipeline thread.
+    - `items` : iterable of {`str`, `os.PathLike`, `bytes`, `np.ndarray`}
+        * Inputs as accepted by `Cropper.crop`. Pulled lazily, a bounded
+          number of items ahead of the consumer.
+    - `workers` : `int`, default=4
+        * Threads used for each of the decode and crop/encode stages.
+    - `ordered` : `bool`, default=True
+        * Yield results in input order. When False, results are yielded as
+          soon as they are ready.
+    - `encode` : {`str`, callable, `None`}, default=None
+        * Pillow format name, e.g. "JPEG" or "PNG". When set, each crop is
+          also encoded and the bytes are returned in `CropResult.data`. A
+          callable receives the Pillow format of the input (None for arrays)
+          and returns the format to encode with.
+
+    Yields
+    ------
+    - `CropResult` for every input item. Failures are reported through
+      `CropResult.error` instead of being raised. An exception raised by
+      the `items` iterable itself is re-raised once earlier results have been
+      yielded.
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    pipeline = _Pipeline(cropper, workers, encode)
+    pipeline.start(items)
+    try:
+        jobs = pipeline.jobs()
+        if ordered:
+            jobs = _in_order(jobs)
+        for job in jobs:
+            pipeline.window.release()
+            yield job.result()
+    finally:
+        pipeline.stop.set()
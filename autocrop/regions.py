@@ -0,0 +1,169 @@
+"""
+Reduced-resolution and region decoding of large image files.
+
+Detection only needs a small version of an image and the output only needs
+the pixels inside the crop rectangle. For formats that can skip the rest,
+these helpers tell Pillow to decode less before `load()`:
+
+* JPEG: libjpeg DCT scaling at 1/2, 1/4 or 1/8 size (`Image.draft`).
+* JPEG 2000: OpenJPEG resolution reduction by powers of two, as far as the
+  codestream's wavelet decomposition levels allow.
+* TIFF: smaller pages of pyramidal files, such as those written by libvips
+  with `pyramid=true`, and, for uncompressed strips and tiles, only the file
+  bytes covering a rectangle.
+
+They work on an open, not yet loaded `PIL.Image.Image` and change what its
+`load()` decodes, relying on the `tile` list and `_size` attributes Pillow's
+own plugins use for the same purpose.
+"""
+
+import math
+import struct
+
+from PIL import Image
+
+# Bytes of the codestream main header searched for the JPEG 2000 COD marker.
+JPEG2000_HEADER_BYTES = 65536
+
+# Largest relative aspect ratio difference between a TIFF page and the first
+# page for the page to count as a reduced-resolution level of it.
+PYRAMID_ASPECT_TOLERANCE = 0.01
+
+
+def reduce_decode(img, min_side):
+    """
+    Make `img` decode at the smallest cheap resolution with a long side of
+    at least `min_side`, when its format supports one.
+    """
+    width, height = img.size
+    if max(width, height) <= min_side:
+        return
+    if img.format == "JPEG2000":
+        reduce_jpeg2000(img, min_side)
+    elif img.format == "TIFF":
+        select_pyramid_page(img, min_side)
+    else:
+        scale = min_side / max(width, height)
+        img.draft(img.mode, (math.ceil(width * scale), math.ceil(height * scale)))
+
+
+def jpeg2000_levels(fp):
+    """Return the number of wavelet decomposition levels of a JPEG 2000 file, or 0."""
+    position = fp.tell()
+    try:
+        fp.seek(0)
+        header = fp.read(JPEG2000_HEADER_BYTES)
+    finally:
+        fp.seek(position)
+    # The main header starts with SOC and SIZ and lists marker segments,
+    # each with a 2-byte length, until the first tile-part (SOT).
+    index = header.find(b"\xff\x4f\xff\x51")
+    if index < 0:
+        return 0
+    index += 2
+    while index + 10 <= len(header):
+        marker, length = struct.unpack(">HH", header[index : index + 4])
+        if marker == 0xFF52:
+            # COD: Lcod, Scod, SGcod (4 bytes), then SPcod starting with the
+            # number of decomposition levels.
+            return header[index + 9]
+        if marker == 0xFF90:
+            break
+        index += 2 + length
+    return 0
+
+
+def reduce_jpeg2000(img, min_side):
+    """Set the OpenJPEG reduce factor of a JPEG 2000 `img` for `min_side`."""
+    long_side = max(img.size)
+    levels = jpeg2000_levels(img.fp)
+    factor = 0
+    while factor < levels and math.ceil(long_side / 2 ** (factor + 1)) >= min_side:
+        factor += 1
+    if factor:
+        img.reduce = factor
+
+
+def select_pyramid_page(img, min_side):
+    """
+    Seek a TIFF `img` to its smallest page that is a reduced-resolution
+    copy of the first page with a long side of at least `min_side`.
+    """
+    width, height = img.size
+    best, best_size = 0, width * height
+    for page in range(1, getattr(img, "n_frames", 1)):
+        img.seek(page)
+        page_width, page_height = img.size
+        aspect_error = abs(page_width * height / (page_height * width) - 1)
+        if (
+            aspect_error <= PYRAMID_ASPECT_TOLERANCE
+            and max(page_width, page_height) >= min_side
+            and page_width * page_height < best_size
+        ):
+            best, best_size = page, page_width * page_height
+    img.seek(best)
+
+
+def _bytes_per_pixel(img, rawmode):
+    """Return bytes per pixel of raw tiles in `rawmode`, or None if not whole bytes."""
+    if rawmode != img.mode or img.mode == "1":
+        return None
+    return len(Image.new(img.mode, (1, 1)).tobytes())
+
+
+def _raw_tile_args(img, tile):
+    """Return (rawmode, stride) of a top-down raw tile, or None for other tiles."""
+    codec, _, _, args = tile
+    if codec != "raw":
+        return None
+    if isinstance(args, str):
+        args = (args,)
+    if len(args) > 2 and args[2] != 1:
+        return None
+    return args[0], args[1] if len(args) > 1 else 0
+
+
+def _make_tile(tile, *fields):
+    return tile._make(fields) if hasattr(tile, "_make") else tuple(fields)
+
+
+def _window_tile(img, tile, box, bytes_per_pixel, stride):
+    """Return `tile` restricted to `box`, in box coordinates, or None if outside."""
+    left, top, right, bottom = box
+    tile_left, tile_top, tile_right, tile_bottom = tile[1]
+    x0, y0 = max(left, tile_left), max(top, tile_top)
+    x1, y1 = min(right, tile_right), min(bottom, tile_bottom)
+    if x0 >= x1 or y0 >= y1:
+        return None
+    stride = stride or (tile_right - tile_left) * bytes_per_pixel
+    offset = tile[2] + (y0 - tile_top) * stride + (x0 - tile_left) * bytes_per_pixel
+    return _make_tile(
+        tile, "raw", (x0 - left, y0 - top, x1 - left, y1 - top), offset, (img.mode, stride, 1)
+    )
+
+
+def decode_window(img, box):
+    """
+    Make an uncompressed `img` decode only the (left, top, right, bottom) `box`.
+
+    Each raw strip or tile overlapping the box is narrowed to its part
+    inside the box, so only the file rows covering it are read. Returns False
+    and leaves `img` unchanged when its tiles are not top-down raw pixel data.
+    """
+    windowed = []
+    for tile in img.tile:
+        raw = _raw_tile_args(img, tile)
+        bytes_per_pixel = raw and _bytes_per_pixel(img, raw[0])
+        if not bytes_per_pixel:
+            return False
+        tile = _window_tile(img, tile, box, bytes_per_pixel, raw[1])
+        if tile is not None:
+            windowed.append(tile)
+    if not windowed:
+        return False
+    img.tile = windowed
+    img._size = (box[2] - box[0], box[3] - box[1])
+    if hasattr(img, "_tile_size"):
+        # Pillow's TIFF plugin allocates its decode buffer at this size.
+        img._tile_size = img.size
+    return True
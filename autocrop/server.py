@@ -0,0 +1,408 @@
+"""
+Local HTTP server for cropping images.
+
+`autocrop serve` keeps warm `Cropper` objects in one long-lived process and
+answers `POST /crop` requests carrying encoded image bytes. Face detection for
+concurrent requests is funnelled through `BatchingDetector`, which coalesces
+calls arriving within a short window into micro-batches run back to back on a
+single thread, so request threads never contend for the detector.
+`GET /health` reports request counts and recent latency percentiles.
+"""
+
+import collections
+import http.server
+import json
+import math
+import os
+import queue
+import socketserver
+import stat
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from PIL import Image
+
+from .autocrop import Cropper, ImageReadError, encode_image
+from .constants import OUTPUT_FORMATS
+from .yunet import get_detector
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+MAX_CROPPERS = 32
+# Largest width or height a request may ask for. The crop is held in memory
+# as width * height * 3 bytes, so this keeps one request to about 300 MB.
+MAX_OUTPUT_SIDE = 10_000
+LATENCY_WINDOW = 1024
+
+
+class RequestError(Exception):
+    """Raised for requests the server answers with a 4xx status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def percentile(values, q):
+    """Return the nearest-rank q-th percentile of values, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class BatchingDetector:
+    """
+    Face detector that coalesces concurrent `detect` calls into micro-batches.
+
+    Calls block until their batch has run. A batch is closed when it holds
+    `max_batch` images or `max_wait` seconds after its first image arrived.
+    Detectors providing `detect_batch(images)` get the whole batch at once;
+    others are called once per image on the batching thread.
+    """
+
+    def __init__(self, detector, max_batch=8, max_wait=0.002):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.detector = detector
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.images = 0
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="autocrop-detect-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def detect(self, image):
+        future = Future()
+        self._requests.put((image, future))
+        return future.result()
+
+    def close(self):
+        """Stop the batching thread once queued calls have been answered."""
+        self._requests.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        batch = [self._requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while batch[-1] is not None and len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            if batch:
+                self._detect(batch)
+            if stop:
+                return
+
+    def _detect(self, batch):
+        self.batches += 1
+        self.images += len(batch)
+        detect_batch = getattr(self.detector, "detect_batch", None)
+        if detect_batch is None:
+            for image, future in batch:
+                try:
+                    future.set_result(self.detector.detect(image))
+                except Exception as exc:
+                    future.set_exception(exc)
+            return
+        try:
+            results = detect_batch([image for image, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        for (_, future), faces in zip(batch, results):
+            future.set_result(faces)
+
+
+class LatencyStats:
+    """Thread-safe request counters and a window of recent latencies."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=window)
+        self._statuses = collections.Counter()
+        self._started = time.monotonic()
+
+    def record(self, status, seconds):
+        with self._lock:
+            self._statuses[status] += 1
+            self._latencies.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            statuses = dict(self._statuses)
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        return {
+            "uptime_s": round(time.monotonic() - self._started, 3),
+            "requests": sum(statuses.values()),
+            "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            "latency_ms": {
+                "window": len(latencies),
+                "p50": ms(percentile(latencies, 50)),
+                "p99": ms(percentile(latencies, 99)),
+            },
+        }
+
+
+def _positive_int(query, name, default, maximum=None):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[-1])
+    except ValueError:
+        raise RequestError(400, f"{name} must be an integer") from None
+    if value < 1:
+        raise RequestError(400, f"{name} must be positive")
+    if maximum is not None and value > maximum:
+        raise RequestError(400, f"{name} must be at most {maximum}")
+    return value
+
+
+def _output_format(query, input_format):
+    """
+    Return the requested output format, or the input's when autocrop can
+    write it and PNG otherwise, like `cli.output_format`.
+    """
+    values = query.get("format")
+    if not values:
+        return input_format if input_format in OUTPUT_FORMATS else "PNG"
+    image_format = values[-1].upper()
+    if image_format == "JPG":
+        image_format = "JPEG"
+    if image_format not in OUTPUT_FORMATS:
+        raise RequestError(400, f"Unsupported output format: {values[-1]}")
+    return image_format
+
+
+class CropService:
+    """
+    Crops request bodies with warm `Cropper` objects sharing one detector.
+
+    Croppers are cached per (width, height, face_percent) in a small LRU, and
+    all of them detect through the same `BatchingDetector`.
+    """
+
+    def __init__(
+        self,
+        width=500,
+        height=500,
+        face_percent=50,
+        resize=True,
+        detect_max_side=None,
+        face_detector=None,
+        max_batch=8,
+        max_wait=0.002,
+        max_croppers=MAX_CROPPERS,
+    ):
+        self.defaults = {"width": width, "height": height, "face_percent": face_percent}
+        self.resize = resize
+        self.detect_max_side = detect_max_side
+        self.detector = BatchingDetector(
+            face_detector or get_detector(), max_batch=max_batch, max_wait=max_wait
+        )
+        self.max_croppers = max_croppers
+        self.stats = LatencyStats()
+        self._croppers = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """Run the detector once so the first request does not pay for it."""
+        self.detector.detector.detect(np.zeros((64, 64, 3), dtype=np.uint8))
+
+    def close(self):
+        self.detector.close()
+
+    def cropper(self, width, height, face_percent):
+        key = (width, height, face_percent)
+        with self._lock:
+            cropper = self._croppers.get(key)
+            if cropper is not None:
+                self._croppers.move_to_end(key)
+                return cropper
+        try:
+            cropper = Cropper(
+                width=width,
+                height=height,
+                face_percent=face_percent,
+                resize=self.resize,
+                detect_max_side=self.detect_max_side,
+                face_detector=self.detector,
+            )
+        except ValueError as exc:
+            raise RequestError(400, str(exc)) from None
+        with self._lock:
+            self._croppers[key] = cropper
+            while len(self._croppers) > self.max_croppers:
+                self._croppers.popitem(last=False)
+        return cropper
+
+    def crop(self, body, query):
+        """Return (image_format, encoded_bytes) for the cropped request body."""
+        params = {
+            name: _positive_int(
+                query, name, default, MAX_OUTPUT_SIDE if name != "face_percent" else None
+            )
+            for name, default in self.defaults.items()
+        }
+        cropper = self.cropper(**params)
+        try:
+            decoded = cropper._load(body)
+        except (OSError, ImageReadError, Image.DecompressionBombError) as exc:
+            raise RequestError(400, f"Could not read image: {exc}") from None
+        pos = cropper._locate(decoded)
+        if pos is None:
+            raise RequestError(422, "No face detected")
+        image_format = _output_format(query, decoded.format)
+        image = cropper._extract(decoded, pos)
+        return image_format, encode_image(image, image_format)
+
+    def health(self):
+        health = {"status": "ok"}
+        health.update(self.stats.snapshot())
+        health["detector"] = {
+            "batches": self.detector.batches,
+            "images": self.detector.images,
+            "max_batch": self.detector.max_batch,
+        }
+        return health
+
+
+class CropRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "autocrop"
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/health":
+            self._send_json(200, self.server.service.health())
+        else:
+            self._send_json(404, {"error": f"Not found: {path}"})
+
+    def do_POST(self):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        try:
+            # Read the body before anything can fail, so an unread body is
+            # never parsed as the next request on a keep-alive connection.
+            body = self._read_body()
+            if url.path != "/crop":
+                raise RequestError(404, f"Not found: {url.path}")
+            image_format, data = self.server.service.crop(body, parse_qs(url.query))
+            status = 200
+            self._send(200, Image.MIME.get(image_format, "application/octet-stream"), data)
+        except RequestError as exc:
+            status = exc.status
+            self._send_json(status, {"error": str(exc)})
+        except Exception as exc:
+            status = 500
+            self._send_json(status, {"error": f"{type(exc).__name__}: {exc}"})
+        self.server.service.stats.record(status, time.perf_counter() - started)
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self.close_connection = True
+            raise RequestError(411, "Content-Length is required") from None
+        if length > self.server.max_body_bytes:
+            self.close_connection = True
+            raise RequestError(413, "Request body is too large")
+        return self.rfile.read(length)
+
+    def _send(self, status, content_type, data):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, payload):
+        self._send(status, "application/json", json.dumps(payload).encode() + b"\n")
+
+    def address_string(self):
+        # Unix socket peers have no address.
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class CropHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, verbose=False, max_body_bytes=MAX_BODY_BYTES):
+        self.service = service
+        self.verbose = verbose
+        self.max_body_bytes = max_body_bytes
+        super().__init__(address, CropRequestHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+
+    class CropUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self, path, service, verbose=False, max_body_bytes=MAX_BODY_BYTES):
+            self.service = service
+            self.verbose = verbose
+            self.max_body_bytes = max_body_bytes
+            super().__init__(path, CropRequestHandler)
+
+        @property
+        def url(self):
+            return f"unix:{self.server_address}"
+
+        def server_close(self):
+            super().server_close()
+            if os.path.exists(self.server_address):
+                os.unlink(self.server_address)
+
+
+def _remove_stale_socket(path):
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(f"Refusing to replace non-socket file: {path}")
+    os.unlink(path)
+
+
+def create_server(service, host="127.0.0.1", port=8080, unix_socket=None, verbose=False):
+    """Bind an HTTP server for `service` on host:port or a Unix socket path."""
+    if unix_socket is None:
+        return CropHTTPServer((host, port), service, verbose=verbose)
+    if not hasattr(socketserver, "UnixStreamServer"):
+        raise OSError("Unix sockets are not supported on this platform")
+    _remove_stale_socket(unix_socket)
+    return CropUnixServer(unix_socket, service, verbose=verbose)
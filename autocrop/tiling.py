@@ -0,0 +1,157 @@
+"""
+Tiled face detection for very large images.
+
+Detecting on a gigapixel scan in one piece needs a full-size BGR copy of the
+image and a detector input as large as the image. `detect_tiled` instead
+walks overlapping square tiles, scales and color-converts one tile at a time,
+and merges the boxes found in every tile with those of one pass over the
+whole image shrunk to the tile size, which finds faces too large for any tile
+to see whole. Memory beyond the input image is proportional to the tile size.
+"""
+
+import cv2
+import numpy as np
+
+# Boxes overlapping a better box by more than this share of the smaller box's
+# area are dropped as duplicates or as faces cut by a tile border.
+TILE_MERGE_THRESHOLD = 0.5
+
+# Boxes within this many detection pixels of an inner tile edge count as cut
+# by it: detectors often place a partial face's box slightly inside the tile.
+TILE_EDGE_MARGIN = 8
+
+
+def tile_starts(length, window, step):
+    """
+    Return start offsets of windows covering `length` pixels.
+
+    Windows are `window` pixels long and `step` apart, and the last one is
+    aligned to the end, so every window has the same length when `length`
+    is at least `window`.
+    """
+    if length <= window:
+        return [0]
+    starts = list(range(0, length - window, step))
+    return starts + [length - window]
+
+
+def tile_windows(shape, tile_size, overlap, scale=1.0):
+    """
+    Yield (top, left, bottom, right) windows of an image of `shape`.
+
+    Windows are `tile_size` pixels square at detection `scale`, so
+    `tile_size / scale` pixels in the image, and overlap by `overlap`
+    detection pixels.
+    """
+    window = max(1, round(tile_size / scale))
+    step = max(1, round((tile_size - overlap) / scale))
+    height, width = shape[:2]
+    for top in tile_starts(height, window, step):
+        for left in tile_starts(width, window, step):
+            yield top, left, min(top + window, height), min(left + window, width)
+
+
+def border_flags(boxes, window, shape, margin=0):
+    """
+    Return which (x, y, w, h) boxes of a tile come within `margin` pixels of
+    one of its edges that lies inside the image, meaning the face may be cut
+    by the tile.
+    """
+    top, left, bottom, right = window
+    height, width = shape[:2]
+    x, y, w, h = (boxes[:, i] for i in range(4))
+    return (
+        ((x <= left + margin) & (left > 0))
+        | ((y <= top + margin) & (top > 0))
+        | ((x + w >= right - margin) & (right < width))
+        | ((y + h >= bottom - margin) & (bottom < height))
+    )
+
+
+def merge_boxes(boxes, scores, cut, threshold=TILE_MERGE_THRESHOLD, first=None):
+    """
+    Return the indices of boxes to keep after merging detections of tiles.
+
+    Boxes flagged in `first` rank first, then boxes not cut by an inner tile
+    edge, then by score (or by area when there are no scores). A box is
+    dropped when its intersection with a kept box covers more than
+    `threshold` of the smaller of the two, which removes both duplicate
+    detections from overlapping tiles and partial faces cut by a tile
+    border.
+    """
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    areas = boxes[:, 2] * boxes[:, 3]
+    rank = scores if scores is not None else areas
+    if first is None:
+        first = np.zeros(len(boxes), dtype=bool)
+    order = np.lexsort((-rank, cut, ~first))
+    keep = []
+    while len(order):
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        inter_w = np.clip(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None)
+        inter_h = np.clip(np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None)
+        smaller = np.minimum(areas[best], areas[rest])
+        overlap = inter_w * inter_h / np.maximum(smaller, 1)
+        order = rest[overlap <= threshold]
+    return np.array(keep, dtype=np.intp)
+
+
+def _tile_image(image, window, scale):
+    top, left, bottom, right = window
+    tile = image[top:bottom, left:right]
+    if scale == 1.0:
+        return tile
+    size = (max(1, round((right - left) * scale)), max(1, round((bottom - top) * scale)))
+    return cv2.resize(tile, size, interpolation=cv2.INTER_AREA)
+
+
+def _window_boxes(image, detect, window, scale):
+    """Detect faces in one window of `image` at `scale`, in `image` coordinates."""
+    boxes, scores = detect(_tile_image(image, window, scale))
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4) / scale
+    boxes[:, 0] += window[1]
+    boxes[:, 1] += window[0]
+    return boxes, scores
+
+
+def detect_tiled(image, detect, tile_size, overlap, scale=1.0):
+    """
+    Detect faces tile by tile over `image`, at detection `scale`.
+
+    `detect(tile)` is called with each tile view of `image`, downscaled by
+    `scale` when it is below 1, and returns (x, y, w, h) boxes in tile
+    coordinates and their scores, or None for scores. It is also called once
+    with the whole image shrunk to `tile_size` on its long side; boxes of
+    that pass larger than `overlap` at detection scale, which no tile is
+    guaranteed to see whole, are kept ahead of the tiles' boxes, including
+    those the tiles find on parts of the same face. Returns int32
+    boxes in `image` coordinates and their scores (None when `detect` gave
+    none), merged with `merge_boxes`.
+    """
+    height, width = image.shape[:2]
+    overview_scale = min(scale, tile_size / max(height, width))
+    boxes, scores = _window_boxes(image, detect, (0, 0, height, width), overview_scale)
+    # Smaller faces are seen whole by a tile, at a higher resolution.
+    large = boxes[:, 2:].max(axis=1, initial=0) * scale > overlap
+    all_boxes = [boxes[large]]
+    all_scores = [None if scores is None else np.asarray(scores)[large]]
+    all_cut = [np.zeros(len(all_boxes[0]), dtype=bool)]
+    for window in tile_windows(image.shape, tile_size, overlap, scale):
+        boxes, scores = _window_boxes(image, detect, window, scale)
+        all_boxes.append(boxes)
+        all_scores.append(scores)
+        all_cut.append(border_flags(boxes, window, image.shape, TILE_EDGE_MARGIN / scale))
+    boxes = np.concatenate(all_boxes)
+    if not len(boxes):
+        return np.empty((0, 4), dtype=np.int32), np.empty(0, dtype=np.float32)
+    # Windows without faces may report None for their scores.
+    all_scores = [scores for window_boxes, scores in zip(all_boxes, all_scores) if len(window_boxes)]
+    scores = None
+    if all(window_scores is not None for window_scores in all_scores):
+        scores = np.concatenate(all_scores).astype(np.float32)
+    first = np.arange(len(boxes)) < len(all_boxes[0])
+    keep = merge_boxes(boxes, scores, np.concatenate(all_cut), first=first)
+    boxes = np.round(boxes[keep]).astype(np.int32)
+    return boxes, None if scores is None else scores[keep]
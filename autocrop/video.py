@@ -0,0 +1,270 @@
+"""
+Face-centred cropping of videos and frame sequences.
+
+`crop_video` streams frames from a video file or a directory of images,
+runs face detection only on every `detect_every`-th frame (keyframes), and
+linearly interpolates the face box between keyframes. The boxes are then
+smoothed with an exponential moving average, so the crop window glides
+instead of jumping, and turned into crop windows with the same geometry as
+`Cropper.crop`. At most `detect_every` frames are held in memory at once.
+"""
+
+import os
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from .autocrop import resize_image
+from .constants import INPUT_FILETYPES
+
+# Output file extensions written with cv2.VideoWriter, and their codecs.
+VIDEO_CODECS = {
+    ".avi": "MJPG",
+    ".m4v": "mp4v",
+    ".mkv": "mp4v",
+    ".mov": "mp4v",
+    ".mp4": "mp4v",
+}
+
+# Frame rate of videos written from frame sequences without a known rate.
+DEFAULT_FPS = 25.0
+
+# Summary of one `crop_video` run.
+#
+# * `frames`: number of frames cropped and written.
+# * `keyframes`: frames face detection ran on.
+# * `keyframes_with_faces`: keyframes on which a face was found.
+# * `seconds`: wall time of the whole run.
+# * `fps`: frames processed per second of wall time.
+# * `source_fps`: frame rate of the input video, None for frame sequences.
+VideoReport = namedtuple(
+    "VideoReport",
+    ["frames", "keyframes", "keyframes_with_faces", "seconds", "fps", "source_fps"],
+)
+
+
+def _sequence_paths(directory):
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if os.path.splitext(name)[1].lower() in INPUT_FILETYPES
+    )
+
+
+def _sequence_frames(paths):
+    for path in paths:
+        frame = cv2.imread(path, cv2.IMREAD_COLOR)
+        if frame is None:
+            raise OSError(f"Could not read frame: {path}")
+        yield frame
+
+
+def _capture_frames(capture):
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            yield frame
+    finally:
+        capture.release()
+
+
+def open_frames(source):
+    """
+    Return an iterator of BGR frames from a video file or image directory,
+    and the frame rate of the video, or None for a directory.
+    """
+    if os.path.isdir(source):
+        return _sequence_frames(_sequence_paths(source)), None
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise OSError(f"Could not open video: {source}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or None
+    return _capture_frames(capture), fps
+
+
+class FrameWriter:
+    """
+    Writes BGR frames to a video file, or to numbered images in a directory.
+
+    Outputs with an extension in `VIDEO_CODECS` are written as videos, and
+    anything else is treated as a directory receiving `frame_000000.png`,
+    `frame_000001.png`, ...
+    """
+
+    def __init__(self, output, fps=DEFAULT_FPS, frame_extension=".png"):
+        self.output = output
+        self.fps = fps
+        self.frame_extension = frame_extension
+        self.frames = 0
+        self._writer = None
+        self._codec = VIDEO_CODECS.get(os.path.splitext(output)[1].lower())
+        if self._codec is None:
+            os.makedirs(output, exist_ok=True)
+
+    def write(self, frame):
+        if self._codec is None:
+            path = os.path.join(self.output, f"frame_{self.frames:06d}{self.frame_extension}")
+            if not cv2.imwrite(path, frame):
+                raise OSError(f"Could not write frame: {path}")
+        else:
+            if self._writer is None:
+                self._open(frame.shape[1], frame.shape[0])
+            self._writer.write(frame)
+        self.frames += 1
+
+    def _open(self, width, height):
+        fourcc = cv2.VideoWriter_fourcc(*self._codec)
+        self._writer = cv2.VideoWriter(self.output, fourcc, self.fps, (width, height))
+        if not self._writer.isOpened():
+            raise OSError(f"Could not write video: {self.output}")
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def largest_face(cropper, frame):
+    """Return the (x, y, w, h) float box of the largest face in a BGR frame, or None."""
+    faces, _ = cropper._detect_scored(frame, True)
+    faces = np.asarray(faces, dtype=np.float64).reshape(-1, 4)
+    faces = faces[(faces[:, 2] > 0) & (faces[:, 3] > 0)]
+    if not len(faces):
+        return None
+    return faces[np.argmax(faces[:, 2] * faces[:, 3])]
+
+
+def _interpolated(frames, start, end):
+    """Pair frames between two keyframes with boxes interpolated from start to end."""
+    if start is None or end is None:
+        box = end if start is None else start
+        return [(frame, box) for frame in frames]
+    steps = len(frames) + 1
+    return [
+        (frame, start + (end - start) * (i + 1) / steps) for i, frame in enumerate(frames)
+    ]
+
+
+def tracked_boxes(frames, detect, detect_every, counts):
+    """
+    Yield (frame, box) pairs, detecting on every `detect_every`-th frame.
+
+    Boxes between two keyframes are linearly interpolated, and boxes after
+    the last keyframe hold its box; a keyframe without a face holds the box
+    of the previous one. Boxes are None until the first face is found.
+    `counts` is updated with "keyframes" and "keyframes_with_faces".
+    """
+    pending = []
+    previous = None
+    for index, frame in enumerate(frames):
+        if index % detect_every:
+            pending.append(frame)
+            continue
+        box = detect(frame)
+        counts["keyframes"] += 1
+        if box is not None:
+            counts["keyframes_with_faces"] += 1
+        yield from _interpolated(pending, previous, box)
+        pending = []
+        if box is not None:
+            previous = box
+        yield frame, previous
+    yield from _interpolated(pending, previous, None)
+
+
+def smoothed_boxes(pairs, smoothing):
+    """
+    Smooth the boxes of (frame, box) pairs with an exponential moving average.
+
+    Each smoothed box keeps `smoothing` of the previous smoothed box and
+    takes the rest from the new box; 0 disables smoothing.
+    """
+    smoothed = None
+    for frame, box in pairs:
+        if box is not None:
+            smoothed = box if smoothed is None else smoothing * smoothed + (1 - smoothing) * box
+        yield frame, smoothed
+
+
+def _centre_box(frame):
+    """Stand-in face box in the middle of a frame, used before any face is found."""
+    height, width = frame.shape[:2]
+    side = min(height, width) / 3
+    return np.array([(width - side) / 2, (height - side) / 2, side, side])
+
+
+def crop_frame(cropper, frame, box):
+    """Crop and resize one BGR frame around a face box, keeping BGR order."""
+    if box is None:
+        box = _centre_box(frame)
+    top, bottom, left, right = cropper.crop_positions(
+        [np.round(box).astype(np.int64)], frame.shape[:2]
+    )[0]
+    return resize_image(
+        frame[top:bottom, left:right], (cropper.width, cropper.height), cropper.resize_backend
+    )
+
+
+def crop_video(cropper, source, output, detect_every=5, smoothing=0.5, fps=None):
+    """
+    Crop every frame of a video or frame sequence around the face.
+
+    Parameters
+    ----------
+    - `cropper` : `Cropper`
+        * Gives the output size, face percent, detector, `detect_max_side`
+          and resize backend. Must resize, since every output frame needs
+          the same size.
+    - `source` : `str`
+        * A video file readable by `cv2.VideoCapture`, or a directory of
+          images taken in name order.
+    - `output` : `str`
+        * A video file with an extension in `VIDEO_CODECS`, or a directory
+          receiving numbered PNG frames.
+    - `detect_every` : `int`, default=5
+        * Run face detection on every this many frames, interpolating the
+          face box in between. 1 detects on every frame.
+    - `smoothing` : `float`, default=0.5
+        * Exponential moving average weight of the previous crop window,
+          from 0 (no smoothing) to below 1.
+    - `fps` : {`float`, `None`}, default=None
+        * Frame rate of a video output. Defaults to the input's frame rate,
+          or 25 for frame sequences.
+
+    Returns
+    -------
+    - `VideoReport`
+    """
+    if not cropper.resize:
+        raise ValueError("Video cropping needs a Cropper with resize=True")
+    if detect_every < 1:
+        raise ValueError("detect_every must be at least 1")
+    if not 0 <= smoothing < 1:
+        raise ValueError("smoothing must be at least 0 and below 1")
+    started = time.perf_counter()
+    frames, source_fps = open_frames(source)
+    counts = {"keyframes": 0, "keyframes_with_faces": 0}
+    pairs = tracked_boxes(
+        frames, lambda frame: largest_face(cropper, frame), detect_every, counts
+    )
+    with FrameWriter(output, fps or source_fps or DEFAULT_FPS) as writer:
+        for frame, box in smoothed_boxes(pairs, smoothing):
+            writer.write(crop_frame(cropper, frame, box))
+    seconds = time.perf_counter() - started
+    return VideoReport(
+        frames=writer.frames,
+        fps=writer.frames / seconds if seconds else 0.0,
+        seconds=seconds,
+        source_fps=source_fps,
+        **counts,
+    )
@@ -1,14 +1,134 @@
+import math
 import os
+import threading
+from collections import OrderedDict
 from importlib.resources import files
 
 import cv2
 import numpy as np
 
 from .constants import YUNET_MODEL
+from .tiling import merge_boxes
+
+_EMPTY_BUFFER = np.empty(0, dtype=np.uint8)
+
+# YuNet pads its input to multiples of this many pixels.
+YUNET_ALIGNMENT = 32
+
+# YuNet's output heads, the strides each runs at, and its output blob names.
+YUNET_HEADS = ("cls", "obj", "bbox", "kps")
+YUNET_STRIDES = (8, 16, 32)
+YUNET_OUTPUTS = tuple(f"{head}_{stride}" for head in YUNET_HEADS for stride in YUNET_STRIDES)
+
+# Long side of the proxy the coarse pass of `CoarseToFineDetector` runs on.
+COARSE_MAX_SIDE = 480
+
+# Padding around a coarse face box, as a share of its size on every side,
+# that `CoarseToFineDetector` detects again at full resolution.
+ROI_PADDING = 0.5
+
+# Refinement regions longer than this are downscaled to it before detection.
+REFINE_MAX_SIDE = 1024
+
+# Smallest intersection over union of a refined box with its coarse box for
+# the refined box to replace it.
+REFINE_MATCH_IOU = 0.3
+
+# Canonical (width, height) detector input sizes for bucketed detection. YuNet
+# pads inputs to multiples of 32, so buckets are multiples of 32 as well.
+DEFAULT_INPUT_BUCKETS = (
+    (320, 240),
+    (240, 320),
+    (320, 320),
+    (640, 480),
+    (480, 640),
+    (640, 640),
+    (1280, 960),
+    (960, 1280),
+    (1280, 1280),
+)
+
+
+def choose_bucket(image_size, buckets):
+    """
+    Return the bucket to letterbox an image of (width, height) `image_size` into.
+
+    Prefers the smallest bucket the image fits in without scaling. When the
+    image is larger than every bucket, picks the one needing the least
+    downscaling.
+    """
+    width, height = image_size
+
+    def rank(bucket):
+        scale = min(1.0, bucket[0] / width, bucket[1] / height)
+        return (-scale, bucket[0] * bucket[1])
+
+    return min(buckets, key=rank)
+
+
+def letterbox(image, bucket):
+    """
+    Fit `image` into a (width, height) `bucket`, padding bottom and right.
+
+    Images larger than the bucket are downscaled first. Returns the
+    letterboxed image and the (x, y) factors mapping its coordinates back to
+    `image` coordinates.
+    """
+    img_height, img_width = image.shape[:2]
+    bucket_width, bucket_height = bucket
+    scale = min(1.0, bucket_width / img_width, bucket_height / img_height)
+    factors = (1.0, 1.0)
+    if scale < 1.0:
+        size = (max(1, round(img_width * scale)), max(1, round(img_height * scale)))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        factors = (img_width / size[0], img_height / size[1])
+    boxed = cv2.copyMakeBorder(
+        image,
+        0,
+        bucket_height - image.shape[0],
+        0,
+        bucket_width - image.shape[1],
+        cv2.BORDER_CONSTANT,
+        value=0,
+    )
+    return boxed, factors
+
+
+def default_model_path():
+    """Return the path of the YuNet model bundled with autocrop."""
+    return str(files("autocrop").joinpath(YUNET_MODEL))
+
+
+class _ThreadNetworks(threading.local):
+    """FaceDetectorYN networks of one thread, created on first use."""
+
+    def __init__(self):
+        self.detector = None
+        self.input_size = None
+        self.bucket_detectors = OrderedDict()
 
 
 class YuNetDetector:
-    """OpenCV YuNet face detector using FaceDetectorYN."""
+    """
+    OpenCV YuNet face detector using FaceDetectorYN.
+
+    When `model_bytes` is given, the network is built from that in-memory
+    buffer and `model_path` is only informative.
+
+    One instance can be shared between threads, including on free-threaded
+    Python builds: every thread lazily builds and configures networks of its
+    own, so concurrent `detect` calls never share OpenCV state and run in
+    parallel while OpenCV releases the GIL. Each thread that detects holds
+    its own copy of the network.
+
+    By default the network input size follows each image, which reconfigures
+    the network whenever consecutive images differ in size. With
+    `input_buckets` (`True` for `DEFAULT_INPUT_BUCKETS`, or a sequence of
+    (width, height) sizes) images are letterboxed into the closest bucket
+    instead, and one pre-configured network per bucket is kept in an LRU of
+    `max_bucket_detectors` entries per thread (one per bucket by default).
+    `stats()` reports how often that avoids reconfiguring a network.
+    """
 
     def __init__(
         self,
@@ -16,39 +136,587 @@ class YuNetDetector:
         score_threshold=0.6,
         nms_threshold=0.3,
         top_k=5000,
+        model_bytes=None,
+        input_buckets=None,
+        max_bucket_detectors=None,
     ):
         if model_path is None:
-            model_path = str(files("autocrop").joinpath(YUNET_MODEL))
+            model_path = default_model_path()
         self.model_path = model_path
+        self.model_bytes = model_bytes
         self.score_threshold = score_threshold
         self.nms_threshold = nms_threshold
         self.top_k = top_k
-        self._detector = None
-        self._input_size = None
+        if input_buckets is True:
+            input_buckets = DEFAULT_INPUT_BUCKETS
+        self.input_buckets = tuple(map(tuple, input_buckets or ()))
+        self.max_bucket_detectors = max_bucket_detectors or len(self.input_buckets)
+        self._networks = _ThreadNetworks()
+        self._stats = {
+            "detections": 0,
+            "reconfigurations": 0,
+            "bucket_hits": 0,
+            "bucket_misses": 0,
+        }
+        # Guards only the counters; detection itself runs unlocked.
+        self._lock = threading.Lock()
 
-    def detect(self, image):
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _create_detector(self, input_size):
         if not hasattr(cv2, "FaceDetectorYN_create"):
             raise RuntimeError("OpenCV FaceDetectorYN is not available")
-        if not os.path.exists(self.model_path):
-            raise FileNotFoundError(self.model_path)
-
-        img_height, img_width = image.shape[:2]
-        input_size = (img_width, img_height)
-        if self._detector is None:
-            self._detector = cv2.FaceDetectorYN_create(
-                self.model_path,
-                "",
+        if self.model_bytes is not None:
+            return cv2.FaceDetectorYN_create(
+                "onnx",
+                self.model_bytes,
+                _EMPTY_BUFFER,
                 input_size,
                 self.score_threshold,
                 self.nms_threshold,
                 self.top_k,
             )
-            self._input_size = input_size
-        elif input_size != self._input_size:
-            self._detector.setInputSize(input_size)
-            self._input_size = input_size
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(self.model_path)
+        return cv2.FaceDetectorYN_create(
+            self.model_path,
+            "",
+            input_size,
+            self.score_threshold,
+            self.nms_threshold,
+            self.top_k,
+        )
 
-        _, faces = self._detector.detect(image)
+    def _detect_native(self, image):
+        networks = self._networks
+        img_height, img_width = image.shape[:2]
+        input_size = (img_width, img_height)
+        if networks.detector is None:
+            networks.detector = self._create_detector(input_size)
+            networks.input_size = input_size
+            self._count("reconfigurations")
+        elif input_size != networks.input_size:
+            networks.detector.setInputSize(input_size)
+            networks.input_size = input_size
+            self._count("reconfigurations")
+        _, faces = networks.detector.detect(image)
+        return faces
+
+    def _bucket_detector(self, bucket):
+        bucket_detectors = self._networks.bucket_detectors
+        detector = bucket_detectors.get(bucket)
+        if detector is not None:
+            bucket_detectors.move_to_end(bucket)
+            self._count("bucket_hits")
+            return detector
+        self._count("bucket_misses")
+        self._count("reconfigurations")
+        detector = self._create_detector(bucket)
+        bucket_detectors[bucket] = detector
+        while len(bucket_detectors) > self.max_bucket_detectors:
+            bucket_detectors.popitem(last=False)
+        return detector
+
+    def _detect_bucketed(self, image):
+        img_height, img_width = image.shape[:2]
+        bucket = choose_bucket((img_width, img_height), self.input_buckets)
+        boxed, (scale_x, scale_y) = letterbox(image, bucket)
+        _, faces = self._bucket_detector(bucket).detect(boxed)
+        if faces is not None and (scale_x, scale_y) != (1.0, 1.0):
+            faces = faces.copy()
+            faces[:, 0:14:2] *= scale_x
+            faces[:, 1:14:2] *= scale_y
+        return faces
+
+    def detect(self, image):
+        return self.detect_scored(image)[0]
+
+    def detect_scored(self, image):
+        """Return int32 (x, y, w, h) face boxes and their float32 scores."""
+        self._count("detections")
+        if self.input_buckets:
+            faces = self._detect_bucketed(image)
+        else:
+            faces = self._detect_native(image)
         if faces is None:
-            return np.empty((0, 4), dtype=np.int32)
-        return faces[:, :4].astype(np.int32)
+            return np.empty((0, 4), dtype=np.int32), np.empty(0, dtype=np.float32)
+        return faces[:, :4].astype(np.int32), faces[:, -1].astype(np.float32)
+
+    def cache_settings(self):
+        """Return the settings that change detection results, for cache keys."""
+        return {
+            "detector": "yunet",
+            "model": os.path.abspath(self.model_path),
+            "score_threshold": self.score_threshold,
+            "nms_threshold": self.nms_threshold,
+            "top_k": self.top_k,
+            "input_buckets": self.input_buckets,
+        }
+
+    def stats(self):
+        """
+        Return detection counters.
+
+        `reconfigurations` counts networks created or resized for a new input
+        size, summed over threads. In bucketed mode, `bucket_hit_rate` is the
+        share of detections served by an already configured bucket network.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["bucket_hits"] + stats["bucket_misses"]
+        stats["bucket_hit_rate"] = stats["bucket_hits"] / lookups if lookups else 0.0
+        return stats
+
+
+def padded_size(width, height):
+    """Return the (width, height) YuNet pads an image to: multiples of 32."""
+    return (
+        (width + YUNET_ALIGNMENT - 1) // YUNET_ALIGNMENT * YUNET_ALIGNMENT,
+        (height + YUNET_ALIGNMENT - 1) // YUNET_ALIGNMENT * YUNET_ALIGNMENT,
+    )
+
+
+def anchor_grid(padded):
+    """
+    Return the (column, row, stride) of every YuNet output position for a
+    (width, height) `padded` input, in output order, as float32 columns.
+    """
+    width, height = padded
+    grids = []
+    for stride in YUNET_STRIDES:
+        rows, cols = np.divmod(np.arange((width // stride) * (height // stride)), width // stride)
+        grids.append(np.stack([cols, rows, np.full_like(rows, stride)], axis=1))
+    return np.concatenate(grids).astype(np.float32)
+
+
+def decode_faces(cls, obj, bbox, kps, grid, score_threshold):
+    """
+    Decode one image's YuNet head outputs into FaceDetectorYN face rows.
+
+    `cls` and `obj` hold one score per output position, `bbox` four box
+    offsets and `kps` ten landmark offsets, all concatenated over strides in
+    `anchor_grid` order. Returns float32 rows of x, y, w, h, five landmark
+    (x, y) pairs and the score, for positions scoring above
+    `score_threshold`.
+    """
+    scores = np.sqrt(np.clip(cls[:, 0], 0, 1) * np.clip(obj[:, 0], 0, 1))
+    keep = scores > score_threshold
+    grid, bbox, kps, scores = grid[keep], bbox[keep], kps[keep], scores[keep]
+    cols, rows, strides = grid[:, :1], grid[:, 1:2], grid[:, 2:]
+    size = np.exp(bbox[:, 2:4]) * strides
+    corner = (np.concatenate([cols, rows], axis=1) + bbox[:, :2]) * strides - size / 2
+    landmarks = (kps.reshape(-1, 5, 2) + np.stack([cols, rows], axis=2)) * strides[:, None]
+    return np.concatenate(
+        [corner, size, landmarks.reshape(-1, 10), scores[:, None]], axis=1
+    ).astype(np.float32)
+
+
+def nms_faces(faces, nms_threshold, top_k):
+    """
+    Return the face rows kept by greedy non-maximum suppression.
+
+    Matches `cv2.dnn.NMSBoxes` as FaceDetectorYN calls it: boxes are
+    truncated to integers for the overlap test, at most `top_k` of the best
+    scoring faces are considered, and a face is dropped when its
+    intersection over union with a kept face exceeds `nms_threshold`.
+    """
+    order = np.argsort(-faces[:, 14], kind="stable")[:top_k]
+    boxes = faces[order, :4].astype(np.int64)
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    areas = boxes[:, 2] * boxes[:, 3]
+    candidates = np.arange(len(order))
+    keep = []
+    while len(candidates):
+        best, rest = candidates[0], candidates[1:]
+        keep.append(best)
+        inter_w = np.clip(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None)
+        inter_h = np.clip(np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None)
+        inter = inter_w * inter_h
+        union = areas[best] + areas[rest] - inter
+        overlap = np.where(union > 0, inter / np.maximum(union, 1), 0.0)
+        candidates = rest[overlap <= nms_threshold]
+    return faces[order[keep]]
+
+
+class _ThreadNets(threading.local):
+    """`cv2.dnn` networks of one thread, created on first use."""
+
+    def __init__(self):
+        self.net = None
+
+
+class YuNetBatchDetector:
+    """
+    YuNet face detector running the ONNX model with `cv2.dnn`, in batches.
+
+    FaceDetectorYN runs one image per call, so small images pay its per-call
+    overhead for every image. `detect_batch` instead pads all images of the
+    same padded size into one input blob, runs the network once per size,
+    and decodes the outputs and applies non-maximum suppression with NumPy,
+    the same way FaceDetectorYN does. Results match `YuNetDetector` with the
+    same settings.
+
+    `detect` and `detect_scored` take a single image, so the detector also
+    works wherever a `YuNetDetector` does. Like it, one instance can be
+    shared between threads: every thread builds a network of its own.
+    """
+
+    def __init__(
+        self,
+        model_path=None,
+        score_threshold=0.6,
+        nms_threshold=0.3,
+        top_k=5000,
+        model_bytes=None,
+    ):
+        if model_path is None:
+            model_path = default_model_path()
+        self.model_path = model_path
+        self.model_bytes = model_bytes
+        self.score_threshold = score_threshold
+        self.nms_threshold = nms_threshold
+        self.top_k = top_k
+        self._nets = _ThreadNets()
+        self._grids = {}
+
+    def _net(self):
+        net = self._nets.net
+        if net is None:
+            if self.model_bytes is not None:
+                net = cv2.dnn.readNetFromONNX(self.model_bytes)
+            elif not os.path.exists(self.model_path):
+                raise FileNotFoundError(self.model_path)
+            else:
+                net = cv2.dnn.readNetFromONNX(self.model_path)
+            self._nets.net = net
+        return net
+
+    def _grid(self, padded):
+        grid = self._grids.get(padded)
+        if grid is None:
+            grid = self._grids[padded] = anchor_grid(padded)
+        return grid
+
+    def _run(self, images, padded):
+        """Return FaceDetectorYN face rows for images sharing one padded size."""
+        width, height = padded
+        batch = np.zeros((len(images), height, width, 3), dtype=np.uint8)
+        for slot, image in zip(batch, images):
+            slot[: image.shape[0], : image.shape[1]] = image
+        net = self._net()
+        net.setInput(cv2.dnn.blobFromImages(list(batch)))
+        outputs = dict(zip(YUNET_OUTPUTS, net.forward(YUNET_OUTPUTS)))
+        grid = self._grid(padded)
+        # Outputs are (1, images * positions, values) per head and stride,
+        # image after image, so split each before concatenating the strides.
+        heads = [
+            [np.split(outputs[f"{head}_{stride}"][0], len(images)) for stride in YUNET_STRIDES]
+            for head in YUNET_HEADS
+        ]
+        faces = []
+        for index in range(len(images)):
+            cls, obj, bbox, kps = (
+                np.concatenate([blocks[index] for blocks in head]) for head in heads
+            )
+            found = decode_faces(cls, obj, bbox, kps, grid, self.score_threshold)
+            faces.append(nms_faces(found, self.nms_threshold, self.top_k))
+        return faces
+
+    def detect_faces_batch(self, images):
+        """Return FaceDetectorYN-style float32 face rows for every BGR image."""
+        groups = {}
+        for index, image in enumerate(images):
+            groups.setdefault(padded_size(image.shape[1], image.shape[0]), []).append(index)
+        faces = [None] * len(images)
+        for padded, indices in groups.items():
+            found = self._run([images[index] for index in indices], padded)
+            for index, rows in zip(indices, found):
+                faces[index] = rows
+        return faces
+
+    def detect_batch_scored(self, images):
+        """Return int32 (x, y, w, h) face boxes and float32 scores of every image."""
+        return [
+            (faces[:, :4].astype(np.int32), faces[:, -1].astype(np.float32))
+            for faces in self.detect_faces_batch(images)
+        ]
+
+    def detect_batch(self, images):
+        """Return int32 (x, y, w, h) face boxes of every BGR image."""
+        return [boxes for boxes, _ in self.detect_batch_scored(images)]
+
+    def detect_scored(self, image):
+        return self.detect_batch_scored([image])[0]
+
+    def detect(self, image):
+        return self.detect_scored(image)[0]
+
+    def cache_settings(self):
+        """Return the settings that change detection results, for cache keys."""
+        return {
+            "detector": "yunet-dnn",
+            "model": os.path.abspath(self.model_path),
+            "score_threshold": self.score_threshold,
+            "nms_threshold": self.nms_threshold,
+            "top_k": self.top_k,
+        }
+
+
+def detect_scored(detector, image):
+    """
+    Return face boxes and scores from `detector`.
+
+    Scores are None for detectors that only provide `detect(image)`.
+    """
+    if hasattr(detector, "detect_scored"):
+        return detector.detect_scored(image)
+    return detector.detect(image), None
+
+
+def detection_proxy(image, max_side):
+    """
+    Return `image` downscaled so its long side is at most `max_side`.
+
+    Also returns the (x, y) scale factors that map proxy coordinates back to
+    `image` coordinates. Images already within bounds are returned unchanged.
+    Memory-mapped images are subsampled by an integer step instead, which
+    only reads the file rows the proxy keeps.
+    """
+    img_height, img_width = image.shape[:2]
+    if max_side is None or max(img_height, img_width) <= max_side:
+        return image, (1.0, 1.0)
+    if isinstance(image, np.memmap):
+        step = math.ceil(max(img_height, img_width) / max_side)
+        proxy = np.ascontiguousarray(image[::step, ::step])
+        return proxy, (img_width / proxy.shape[1], img_height / proxy.shape[0])
+    scale = max_side / max(img_height, img_width)
+    proxy_width = max(1, round(img_width * scale))
+    proxy_height = max(1, round(img_height * scale))
+    proxy = cv2.resize(
+        image, (proxy_width, proxy_height), interpolation=cv2.INTER_AREA
+    )
+    return proxy, (img_width / proxy_width, img_height / proxy_height)
+
+
+def refinement_window(box, shape, padding=ROI_PADDING):
+    """
+    Return the (top, left, bottom, right) region around an (x, y, w, h)
+    `box`, padded by `padding` times the box size on every side and clipped
+    to an image of `shape`.
+    """
+    x, y, w, h = box
+    img_height, img_width = shape[:2]
+    return (
+        max(0, math.floor(y - h * padding)),
+        max(0, math.floor(x - w * padding)),
+        min(img_height, math.ceil(y + h * (1 + padding))),
+        min(img_width, math.ceil(x + w * (1 + padding))),
+    )
+
+
+def box_ious(box, boxes):
+    """Return the intersection over union of an (x, y, w, h) box with each of `boxes`."""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[0] + box[2], boxes[:, 0] + boxes[:, 2])
+    y2 = np.minimum(box[1] + box[3], boxes[:, 1] + boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = box[2] * box[3] + boxes[:, 2] * boxes[:, 3] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+class CoarseToFineDetector:
+    """
+    Two-stage face detection: a cheap low-resolution pass, then refinement
+    at native resolution around each candidate only.
+
+    The wrapped `detector` first runs on a copy of the image downscaled to a
+    long side of `coarse_max_side`. Images without a candidate face return
+    right away, so face-less inputs cost only that pass. Every candidate's
+    box, padded by `roi_padding` times its size on each side, is then
+    detected again at full resolution (downscaled only when the region is
+    longer than `refine_max_side`), and the best matching box found there
+    replaces the coarse box. Candidates the refinement pass does not confirm
+    keep their coarse box.
+
+    Images whose long side is at most `coarse_max_side` are detected in one
+    pass. Faces too small to be found at the coarse resolution are missed.
+    """
+
+    def __init__(
+        self,
+        detector,
+        coarse_max_side=COARSE_MAX_SIDE,
+        roi_padding=ROI_PADDING,
+        refine_max_side=REFINE_MAX_SIDE,
+    ):
+        self.detector = detector
+        self.coarse_max_side = coarse_max_side
+        self.roi_padding = roi_padding
+        self.refine_max_side = refine_max_side
+        self._stats = {"detections": 0, "early_exits": 0, "regions": 0, "refined": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def detect(self, image):
+        return self.detect_scored(image)[0]
+
+    def detect_scored(self, image):
+        """Return int32 (x, y, w, h) face boxes and their scores, or None for scores."""
+        self._count("detections")
+        if max(image.shape[:2]) <= self.coarse_max_side:
+            return detect_scored(self.detector, image)
+        proxy, (scale_x, scale_y) = detection_proxy(image, self.coarse_max_side)
+        boxes, scores = detect_scored(self.detector, proxy)
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if not len(boxes):
+            self._count("early_exits")
+            return np.empty((0, 4), dtype=np.int32), scores
+        boxes *= (scale_x, scale_y, scale_x, scale_y)
+        scores = None if scores is None else np.array(scores, dtype=np.float32)
+        for index in range(len(boxes)):
+            refined = self._refine(image, boxes[index])
+            if refined is not None:
+                boxes[index] = refined[0]
+                if scores is not None and refined[1] is not None:
+                    scores[index] = refined[1]
+        keep = merge_boxes(boxes, scores, np.zeros(len(boxes), dtype=bool))
+        boxes = np.round(boxes[keep]).astype(np.int32)
+        return boxes, None if scores is None else scores[keep]
+
+    def _refine(self, image, box):
+        """
+        Detect again around a full-resolution `box`, and return the best
+        matching (box, score) found, or None.
+        """
+        top, left, bottom, right = refinement_window(box, image.shape, self.roi_padding)
+        region, (scale_x, scale_y) = detection_proxy(
+            image[top:bottom, left:right], self.refine_max_side
+        )
+        self._count("regions")
+        found, scores = detect_scored(self.detector, region)
+        found = np.asarray(found, dtype=np.float64).reshape(-1, 4)
+        if not len(found):
+            return None
+        found = found * (scale_x, scale_y, scale_x, scale_y) + (left, top, 0, 0)
+        ious = box_ious(box, found)
+        best = int(np.argmax(ious))
+        if ious[best] < REFINE_MATCH_IOU:
+            return None
+        self._count("refined")
+        return found[best], None if scores is None else scores[best]
+
+    def cache_settings(self):
+        """Return the settings that change detection results, for cache keys."""
+        if not hasattr(self.detector, "cache_settings"):
+            raise ValueError(
+                f"{type(self.detector).__qualname__} must implement cache_settings() "
+                "to be used with a detection cache"
+            )
+        return {
+            "detector": "coarse-to-fine",
+            "coarse_max_side": self.coarse_max_side,
+            "roi_padding": self.roi_padding,
+            "refine_max_side": self.refine_max_side,
+            "inner": self.detector.cache_settings(),
+        }
+
+    def stats(self):
+        """
+        Return detection counters.
+
+        `early_exits` counts images on which the coarse pass found no face,
+        `regions` the refinement regions detected, and `refined` the
+        candidates whose box the refinement pass replaced.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+
+class DetectorRegistry:
+    """
+    Thread-safe cache of YuNet model bytes and warm detectors.
+
+    Model files are read once per path and detectors are shared per model
+    path, thresholds, top_k and input buckets, so building many `Cropper`
+    objects does not reload the network each time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._model_bytes = {}
+        self._detectors = {}
+
+    def _load_model_bytes(self, model_path):
+        model_bytes = self._model_bytes.get(model_path)
+        if model_bytes is None:
+            with open(model_path, "rb") as model_file:
+                model_bytes = np.frombuffer(model_file.read(), dtype=np.uint8)
+            self._model_bytes[model_path] = model_bytes
+        return model_bytes
+
+    def get(
+        self,
+        model_path=None,
+        score_threshold=0.6,
+        nms_threshold=0.3,
+        top_k=5000,
+        input_buckets=None,
+    ):
+        """Return the shared detector for the given model and settings."""
+        model_path = os.path.abspath(model_path or default_model_path())
+        if input_buckets is True:
+            input_buckets = DEFAULT_INPUT_BUCKETS
+        input_buckets = tuple(map(tuple, input_buckets or ()))
+        key = (
+            model_path,
+            float(score_threshold),
+            float(nms_threshold),
+            int(top_k),
+            input_buckets,
+        )
+        with self._lock:
+            detector = self._detectors.get(key)
+            if detector is None:
+                detector = YuNetDetector(
+                    model_path=model_path,
+                    score_threshold=score_threshold,
+                    nms_threshold=nms_threshold,
+                    top_k=top_k,
+                    model_bytes=self._load_model_bytes(model_path),
+                    input_buckets=input_buckets,
+                )
+                self._detectors[key] = detector
+        return detector
+
+    def clear(self):
+        """Forget every cached model and detector."""
+        with self._lock:
+            self._model_bytes.clear()
+            self._detectors.clear()
+
+
+detector_registry = DetectorRegistry()
+
+
+def get_detector(
+    model_path=None,
+    score_threshold=0.6,
+    nms_threshold=0.3,
+    top_k=5000,
+    input_buckets=None,
+):
+    """Return a warm detector from the process-wide registry."""
+    return detector_registry.get(
+        model_path=model_path,
+        score_threshold=score_threshold,
+        nms_threshold=nms_threshold,
+        top_k=top_k,
+        input_buckets=input_buckets,
+    )
@@ -0,0 +1,69 @@
+"""
+Compare per-image YuNet detection with batched cv2.dnn detection on thumbnails.
+
+Builds `--count` thumbnails of each `--sizes` side from tests/data/obama.jpg,
+shifted a pixel apart, and times `YuNetDetector.detect` on each one against
+`YuNetBatchDetector.detect_batch` over batches of `--batch` images. Both
+detectors must find the same boxes.
+
+Usage: python benchmarks/bench_batch.py [--sizes 48,96,160] [--count 64]
+           [--batch 16] [--repeat N]
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from autocrop.yunet import YuNetBatchDetector, YuNetDetector
+
+
+def thumbnails(side, count):
+    face = cv2.resize(cv2.imread("tests/data/obama.jpg"), (side, side))
+    return [np.roll(face, shift, axis=1) for shift in range(count)]
+
+
+def seconds_per_image(run, images, repeat):
+    run(images[:1])
+    started = time.perf_counter()
+    for _ in range(repeat):
+        run(images)
+    return (time.perf_counter() - started) / (repeat * len(images))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", default="48,96,160")
+    parser.add_argument("--count", type=int, default=64)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    single = YuNetDetector()
+    batched = YuNetBatchDetector()
+
+    def per_image(images):
+        return [single.detect(image) for image in images]
+
+    def in_batches(images):
+        return [
+            boxes
+            for start in range(0, len(images), args.batch)
+            for boxes in batched.detect_batch(images[start : start + args.batch])
+        ]
+
+    print(f"{'side':>6}{'per-image ms':>14}{'batched ms':>12}{'speedup':>9}")
+    for side in (int(size) for size in args.sizes.split(",") if size):
+        images = thumbnails(side, args.count)
+        for expected, boxes in zip(per_image(images), in_batches(images)):
+            np.testing.assert_array_equal(boxes, expected)
+        one = seconds_per_image(per_image, images, args.repeat)
+        many = seconds_per_image(in_batches, images, args.repeat)
+        print(f"{side:>6}{one * 1000:>14.3f}{many * 1000:>12.3f}{one / many:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
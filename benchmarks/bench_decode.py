@@ -0,0 +1,79 @@
+"""
+Compare full-resolution and reduced-resolution JPEG decoding for cropping.
+
+Each mode runs in its own child process so peak RSS is measured per mode.
+
+Usage: python benchmarks/bench_decode.py [--scale N] [--count N]
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+MODES = {
+    # Full decode, full-resolution detection.
+    "full": {},
+    # Full decode, detection on a downscaled proxy.
+    "proxy": {"detect_max_side": 640, "decode": "full"},
+    # Reduced-resolution decode for detection and, when possible, the crop.
+    "reduced": {"detect_max_side": 640},
+}
+
+
+def make_batch(directory, scale, count):
+    paths = []
+    with Image.open("tests/data/obama.jpg") as img:
+        large = img.resize((img.width * scale, img.height * scale))
+    for i in range(count):
+        path = os.path.join(directory, f"portrait-{i}.jpg")
+        large.save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def run_mode(mode, paths):
+    from autocrop import Cropper
+    from autocrop.autocrop import open_file
+
+    options = dict(MODES[mode])
+    full_decode = options.pop("decode", None) == "full"
+    cropper = Cropper(**options)
+    started = time.perf_counter()
+    for path in paths:
+        if full_decode:
+            cropper.crop(open_file(path)[:, :, ::-1])
+        else:
+            cropper.crop(path)
+    elapsed = time.perf_counter() - started
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{mode:8s} {elapsed / len(paths) * 1000:8.1f} ms/image  peak RSS {peak_kib / 1024:7.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", type=int, default=8, help="Upscale factor for obama.jpg")
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--mode", choices=sorted(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.paths)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_batch(directory, args.scale, args.count)
+        with Image.open(paths[0]) as img:
+            print(f"{len(paths)} JPEGs of {img.width}x{img.height}")
+        for mode in MODES:
+            subprocess.run([sys.executable, __file__, "--mode", mode, *paths], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Compare per-image detector setup cost with and without the detector registry.
+
+Usage: python benchmarks/bench_detector_setup.py [--repeat N]
+"""
+
+import argparse
+import glob
+import time
+
+import cv2
+
+from autocrop.yunet import YuNetDetector, get_detector
+
+
+def load_images():
+    paths = sorted(p for p in glob.glob("tests/data/*") if not p.endswith(".md"))
+    images = [cv2.imread(path) for path in paths]
+    return [image for image in images if image is not None]
+
+
+def time_per_image(images, repeat, detector_for_image):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for image in images:
+            detector_for_image().detect(image)
+    return (time.perf_counter() - started) / (repeat * len(images))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    images = load_images()
+    get_detector().detect(images[0])
+
+    fresh = time_per_image(images, args.repeat, YuNetDetector)
+    shared = time_per_image(images, args.repeat, get_detector)
+    print(f"images: {len(images)} x {args.repeat}")
+    print(f"new YuNetDetector per image: {fresh * 1000:.2f} ms/image")
+    print(f"registry detector:           {shared * 1000:.2f} ms/image")
+    print(f"setup cost removed:          {(fresh - shared) * 1000:.2f} ms/image")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Compare per-box crop geometry cost of the scalar and vectorized paths.
+
+Usage: python benchmarks/bench_geometry.py [--boxes N]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from autocrop.autocrop import Cropper
+
+
+class NoFaceDetector:
+    def detect(self, image):
+        return np.empty((0, 4), dtype=np.int32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--boxes", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    image_sizes = np.stack([rng.integers(100, 4000, args.boxes)] * 2, axis=1)
+    boxes = np.stack(
+        [
+            rng.integers(0, image_sizes[:, 1]),
+            rng.integers(0, image_sizes[:, 0]),
+            rng.integers(1, image_sizes[:, 1] // 2 + 2),
+            rng.integers(1, image_sizes[:, 0] // 2 + 2),
+        ],
+        axis=1,
+    )
+    cropper = Cropper(face_detector=NoFaceDetector())
+
+    started = time.perf_counter()
+    for box, (imgh, imgw) in zip(boxes, image_sizes):
+        cropper._crop_positions(imgh, imgw, *box)
+    scalar = time.perf_counter() - started
+
+    started = time.perf_counter()
+    cropper.crop_positions(boxes, image_sizes)
+    vectorized = time.perf_counter() - started
+
+    print(f"boxes: {args.boxes}")
+    print(f"scalar _crop_positions: {args.boxes / scalar:,.0f} boxes/s")
+    print(f"vectorized crop_positions: {args.boxes / vectorized:,.0f} boxes/s")
+    print(f"speedup: {scalar / vectorized:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
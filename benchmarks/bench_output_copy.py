@@ -0,0 +1,53 @@
+"""
+Compare time and allocations of no-resize crops for each output mode.
+
+Usage: python benchmarks/bench_output_copy.py [--repeat N] [--side PX]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from autocrop.autocrop import Cropper
+
+
+class CenterFaceDetector:
+    def detect(self, image):
+        height, width = image.shape[:2]
+        return np.array([[width // 3, height // 3, width // 3, height // 3]])
+
+
+def measure(cropper, image, repeat):
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        cropper.crop(image)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / repeat, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--side", type=int, default=4000)
+    args = parser.parse_args()
+
+    image = np.random.default_rng(0).integers(0, 255, (args.side, args.side, 3), dtype=np.uint8)
+    modes = {
+        "rgb (default)": {},
+        "input order, copy": {"channel_order": "input"},
+        "input order, view": {"channel_order": "input", "copy": False},
+    }
+    print(f"image: {args.side}x{args.side} BGR, {args.repeat} crops per mode")
+    for name, kwargs in modes.items():
+        cropper = Cropper(resize=False, face_detector=CenterFaceDetector(), **kwargs)
+        seconds, peak = measure(cropper, image, args.repeat)
+        print(f"{name:<20} {seconds * 1000:8.2f} ms/crop  peak traced {peak / 1e6:8.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Count file system calls made while cropping files to output files.
+
+Compares the current single-pass writer, with and without metadata
+preservation, to the previous copy-then-overwrite writer. Calls are counted
+with a `sys.addaudithook` hook on the audit events Python raises for them
+(`open` covers builtin and `os.open` but not `os.fdopen`, `os.rename`
+covers `os.replace`).
+Face detection is stubbed out so only I/O is measured.
+
+Usage: python benchmarks/bench_output_syscalls.py [--files N]
+"""
+
+import argparse
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+from PIL import Image
+
+from autocrop.autocrop import Cropper, image_for_format
+from autocrop.cli import crop_file_to_output, image_save_kwargs
+
+EVENTS = ("open", "os.chmod", "os.utime", "os.rename", "os.remove", "shutil.copyfile", "shutil.copystat")
+
+counts = Counter()
+counting = False
+
+
+def audit(event, args):
+    # Wrapping an existing descriptor (os.fdopen) also raises "open".
+    if event == "open" and isinstance(args[0], int):
+        return
+    if counting and event in EVENTS:
+        counts[event] += 1
+
+
+class CenterFaceDetector:
+    def detect(self, image):
+        height, width = image.shape[:2]
+        return np.array([[width // 3, height // 3, width // 3, height // 3]])
+
+
+def legacy_crop_file_to_output(input_filename, output_filename, cropper):
+    """The previous writer: header read, decode, copy, re-open for EXIF, overwrite, copystat."""
+    with Image.open(input_filename) as img_orig:
+        image_format = img_orig.format
+    image = cropper.crop(input_filename)
+    source_stat = os.stat(input_filename)
+    shutil.copy(input_filename, output_filename)
+    with Image.open(input_filename) as img_orig:
+        save_kwargs = image_save_kwargs(img_orig)
+    image_for_format(image, image_format).save(output_filename, format=image_format, **save_kwargs)
+    shutil.copystat(input_filename, output_filename)
+    os.chmod(output_filename, stat.S_IMODE(source_stat.st_mode))
+    os.utime(output_filename, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+    return 0
+
+
+def run(name, inputs, output_dir, crop):
+    global counting
+    counts.clear()
+    os.makedirs(output_dir)
+    counting = True
+    started = time.perf_counter()
+    for input_filename in inputs:
+        crop(input_filename, os.path.join(output_dir, os.path.basename(input_filename)))
+    elapsed = time.perf_counter() - started
+    counting = False
+    per_file = ", ".join(f"{event} {counts[event] / len(inputs):g}" for event in EVENTS if counts[event])
+    print(f"{name:<22} {elapsed / len(inputs) * 1000:6.2f} ms/file  per file: {per_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=200)
+    args = parser.parse_args()
+
+    sys.addaudithook(audit)
+    cropper = Cropper(width=100, height=100, face_detector=CenterFaceDetector())
+    with tempfile.TemporaryDirectory() as root:
+        inputs = []
+        for i in range(args.files):
+            path = os.path.join(root, f"input-{i}.jpg")
+            shutil.copyfile("tests/data/obama.jpg", path)
+            inputs.append(path)
+
+        run("legacy copy+overwrite", inputs, os.path.join(root, "legacy"),
+            lambda i, o: legacy_crop_file_to_output(i, o, cropper))
+        run("single pass", inputs, os.path.join(root, "preserve"),
+            lambda i, o: crop_file_to_output(i, o, cropper=cropper))
+        run("--no-preserve-metadata", inputs, os.path.join(root, "fast"),
+            lambda i, o: crop_file_to_output(i, o, cropper=cropper, preserve_metadata=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compare resize backends for speed and difference from the "pillow" backend.
+
+Crops every test image around its face, then resizes the crop with each
+backend. Difference is reported as mean absolute error (0-255) and SSIM
+against the "pillow" output. --upscale enlarges each crop first, to emulate
+reducing a 4000 px crop from a camera original to the output size.
+
+Usage: python benchmarks/bench_resize.py [--size PX] [--repeat N] [--upscale F]
+"""
+
+import argparse
+import glob
+import time
+
+import cv2
+import numpy as np
+
+from autocrop.autocrop import RESIZE_BACKENDS, Cropper, resize_image
+
+
+def ssim(a, b):
+    """Mean structural similarity of two uint8 images, on luma."""
+    a = cv2.cvtColor(a, cv2.COLOR_RGB2GRAY).astype(np.float64)
+    b = cv2.cvtColor(b, cv2.COLOR_RGB2GRAY).astype(np.float64)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    def blur(x):
+        return cv2.GaussianBlur(x, (11, 11), 1.5)
+
+    mu_a, mu_b = blur(a), blur(b)
+    var_a = blur(a * a) - mu_a**2
+    var_b = blur(b * b) - mu_b**2
+    cov = blur(a * b) - mu_a * mu_b
+    ssim_map = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / (
+        (mu_a**2 + mu_b**2 + c1) * (var_a + var_b + c2)
+    )
+    return ssim_map.mean()
+
+
+def face_crops(upscale):
+    cropper = Cropper(resize=False)
+    for path in sorted(glob.glob("tests/data/*")):
+        if path.endswith(".md"):
+            continue
+        crop = cropper.crop(path)
+        if crop is None or crop.ndim != 3 or crop.shape[2] != 3:
+            continue
+        if upscale != 1:
+            crop = cv2.resize(crop, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_CUBIC)
+        yield path, crop
+
+
+def time_backend(crop, size, backend, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        resized = resize_image(crop, size, backend)
+    return (time.perf_counter() - started) / repeat, resized
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--upscale", type=float, default=1.0)
+    args = parser.parse_args()
+
+    size = (args.size, args.size)
+    totals = {backend: 0.0 for backend in RESIZE_BACKENDS}
+    print(f"{'image':<28}{'crop':>11}  " + "".join(f"{b:>34}" for b in RESIZE_BACKENDS))
+    for path, crop in face_crops(args.upscale):
+        row = f"{path[11:]:<28}{crop.shape[1]:>5}x{crop.shape[0]:<5}  "
+        reference = None
+        for backend in RESIZE_BACKENDS:
+            seconds, resized = time_backend(crop, size, backend, args.repeat)
+            totals[backend] += seconds
+            if reference is None:
+                reference = resized
+            mae = np.abs(resized.astype(np.int16) - reference).mean()
+            row += f"{seconds * 1000:9.2f} ms  mae {mae:5.2f}  ssim {ssim(resized, reference):.4f}"
+        print(row)
+    print("total ms: " + ", ".join(f"{b} {t * 1000:.1f}" for b, t in totals.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Time each stage of a crop over tests/data and large synthetic canvases.
+
+Images go through `Cropper.crop_many`, encoded to the format the CLI would
+write, and the stage timings are those of the `CropMetrics` its
+`metrics_callback` receives: decode, color (channel conversions), detect,
+geometry, resize and encode. Synthetic canvases
+upscale tests/data/obama.jpg to 4K up to 50 MP JPEGs, all of which yield a
+crop. Each case runs with every worker count.
+
+Results are printed as a table and optionally written as JSON with --output.
+With --baseline, each stage median is compared to the same case in a
+previous JSON result, and the exit status is 1 when one got slower by more
+than --threshold (and by more than --min-delta-ms, to ignore noise):
+
+    python benchmarks/bench_stages.py --output baseline.json
+    # ...change the code...
+    python benchmarks/bench_stages.py --baseline baseline.json
+
+Baselines are machine specific: record one on the base revision, on the
+machine the branch is measured on. Revisions without `metrics_callback`
+cannot run this script.
+
+Usage: python benchmarks/bench_stages.py [--sizes 4k,12mp,24mp,50mp] [--workers 1,4]
+           [--repeat N] [--detect-max-side N] [--output FILE] [--baseline FILE]
+           [--threshold FRACTION] [--min-delta-ms MS]
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import PIL
+from PIL import Image
+
+from autocrop.autocrop import Cropper
+from autocrop.cli import output_format
+from autocrop.metrics import STAGES
+
+# Synthetic canvas sizes as (width, height). At 6000x4000 the stretched face
+# is not found, so the 24 MP canvas is a portrait one, like obama.jpg.
+CANVASES = {
+    "4k": (3840, 2160),
+    "12mp": (4000, 3000),
+    "24mp": (4000, 6000),
+    "50mp": (8660, 5774),
+}
+
+
+def corpus_paths():
+    return sorted(p for p in glob.glob("tests/data/*") if not p.endswith(".md"))
+
+
+def make_canvas(directory, name):
+    """Write obama.jpg upscaled to one of CANVASES and return its path."""
+    path = os.path.join(directory, f"{name}.jpg")
+    with Image.open("tests/data/obama.jpg") as img:
+        img.convert("RGB").resize(CANVASES[name], Image.BICUBIC).save(path, quality=90)
+    return path
+
+
+def run_case(cropper, recorded, paths, workers, repeat):
+    """Return per-stage medians and throughput for paths over `workers` threads."""
+    items = paths * repeat
+    recorded.clear()
+    started = time.perf_counter()
+    results = list(cropper.crop_many(items, workers=workers, encode=output_format))
+    elapsed = time.perf_counter() - started
+    for result in results:
+        if result.error is not None:
+            raise result.error
+    stages = {}
+    for stage in STAGES:
+        seconds = [metrics.timings[stage] for metrics in recorded if stage in metrics.timings]
+        if seconds:
+            stages[stage] = {
+                "median_ms": round(statistics.median(seconds) * 1000, 3),
+                "max_ms": round(max(seconds) * 1000, 3),
+                "count": len(seconds),
+            }
+    return {
+        "images": len(items),
+        "workers": workers,
+        "wall_s": round(elapsed, 3),
+        "images_per_s": round(len(items) / elapsed, 2),
+        "stages": stages,
+    }
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+    }
+
+
+def print_result(name, megapixels, result):
+    cells = "".join(
+        f"{result['stages'][stage]['median_ms']:>10.1f}" if stage in result["stages"] else f"{'-':>10}"
+        for stage in STAGES
+    )
+    print(
+        f"{name:<10}{megapixels:>7.1f}{result['workers']:>8}{cells}"
+        f"{result['images_per_s']:>10.2f}"
+    )
+
+
+def case_key(case):
+    return case["name"], case["workers"]
+
+
+def regressions(cases, baseline, threshold, min_delta_ms):
+    """Yield messages for stages slower than their baseline medians."""
+    previous = {case_key(case): case for case in baseline["cases"]}
+    for case in cases:
+        old = previous.get(case_key(case))
+        if old is None:
+            continue
+        for stage, timing in case["stages"].items():
+            if stage not in old["stages"]:
+                continue
+            before = old["stages"][stage]["median_ms"]
+            after = timing["median_ms"]
+            if after > before * (1 + threshold) and after - before > min_delta_ms:
+                yield (
+                    f"{case['name']} workers={case['workers']} {stage}: "
+                    f"{before:.1f} ms -> {after:.1f} ms (+{(after / before - 1) * 100:.0f}%)"
+                )
+
+
+def parse_list(text):
+    return [item for item in text.split(",") if item]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", type=parse_list, default=list(CANVASES))
+    parser.add_argument("--workers", type=parse_list, default=["1", "4"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--detect-max-side", type=int, default=None)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args()
+    unknown = set(args.sizes) - set(CANVASES)
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(sorted(unknown))}")
+    args.workers = [int(workers) for workers in args.workers]
+    return args
+
+
+def run_cases(args, directory):
+    recorded = []
+    cropper = Cropper(
+        detect_max_side=args.detect_max_side, metrics_callback=recorded.append
+    )
+    cropper.crop("tests/data/obama.jpg")
+    inputs = [("corpus", corpus_paths())]
+    inputs += [(name, [make_canvas(directory, name)]) for name in args.sizes]
+    print(f"{'case':<10}{'MP':>7}{'workers':>8}" + "".join(f"{s:>10}" for s in STAGES) + f"{'img/s':>10}")
+    cases = []
+    for name, paths in inputs:
+        megapixels = statistics.mean(_megapixels(path) for path in paths)
+        for workers in args.workers:
+            result = run_case(cropper, recorded, paths, workers, args.repeat)
+            print_result(name, megapixels, result)
+            cases.append({"name": name, "megapixels": round(megapixels, 2), **result})
+    return cases
+
+
+def _megapixels(path):
+    with Image.open(path) as img:
+        return img.width * img.height / 1e6
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        cases = run_cases(args, directory)
+    report = {
+        "environment": environment(),
+        "detect_max_side": args.detect_max_side,
+        "cases": cases,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        slower = list(regressions(cases, baseline, args.threshold, args.min_delta_ms))
+        for message in slower:
+            print(f"REGRESSION {message}")
+        print(f"{len(slower)} stage regressions over {args.threshold:.0%} vs {args.baseline}")
+        sys.exit(1 if slower else 0)
+
+
+if __name__ == "__main__":
+    main()
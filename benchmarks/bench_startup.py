@@ -0,0 +1,80 @@
+"""
+Measure autocrop startup time with `python -X importtime`.
+
+Runs `import autocrop` and `autocrop --version` in fresh interpreters, reports
+the median wall time and the slowest imported modules, and fails when startup
+exceeds --max-ms or imports OpenCV, NumPy or Pillow.
+
+Usage: python benchmarks/bench_startup.py [--repeat N] [--max-ms MS] [--top N]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ("cv2", "numpy", "PIL")
+
+COMMANDS = {
+    "import autocrop": "import autocrop",
+    "autocrop --version": (
+        "import sys; sys.argv = ['autocrop', '--version']; "
+        "import autocrop; autocrop.command_line_interface()"
+    ),
+}
+
+
+def run(code):
+    """Return (wall seconds, stderr) of one fresh interpreter running code."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(f"{code!r} failed:\n{result.stderr}")
+    return elapsed, result.stderr
+
+
+def parse_importtime(stderr):
+    """Return {module: cumulative microseconds} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for label, code in COMMANDS.items():
+        runs = [run(code) for _ in range(args.repeat)]
+        median = statistics.median(elapsed for elapsed, _ in runs) * 1000
+        modules = parse_importtime(runs[-1][1])
+        heavy = [name for name in HEAVY_MODULES if name in modules]
+        print(f"{label}: {median:.1f} ms median of {args.repeat}, {len(modules)} modules")
+        top = sorted(modules.items(), key=lambda item: item[1], reverse=True)
+        for name, cumulative in top[: args.top]:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+        if heavy:
+            print(f"  FAIL: imports {', '.join(heavy)}")
+            failed = True
+        if args.max_ms is not None and median > args.max_ms:
+            print(f"  FAIL: slower than {args.max_ms:.1f} ms")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Measure how YuNet detection throughput scales with threads sharing one detector.
+
+Every thread count runs the same number of detections over tests/data images
+on one shared `YuNetDetector`, once with calls serialized by a lock, as a
+single shared network required, and once unlocked with the per-thread
+networks the detector now keeps. OpenCV also parallelizes inside one call;
+pass `--cv2-threads 1` to see scaling from Python threads alone.
+
+Usage: python benchmarks/bench_threads.py [--threads 1,2,4,8] [--repeat N]
+           [--cv2-threads N]
+"""
+
+import argparse
+import glob
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from autocrop.yunet import YuNetDetector
+
+
+def load_images():
+    paths = sorted(p for p in glob.glob("tests/data/*") if not p.endswith(".md"))
+    images = [cv2.imread(path) for path in paths]
+    return [image for image in images if image is not None]
+
+
+def throughput(detect, work, threads):
+    """Return detections per second of `detect` over `work` on `threads` threads."""
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        # Build each thread's networks before timing.
+        list(executor.map(detect, work[: threads * 4]))
+        started = time.perf_counter()
+        list(executor.map(detect, work))
+    return len(work) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--threads", default="1,2,4,8")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cv2-threads", type=int, default=None)
+    args = parser.parse_args()
+    if args.cv2_threads is not None:
+        cv2.setNumThreads(args.cv2_threads)
+
+    images = load_images()
+    work = images * args.repeat
+    lock = threading.Lock()
+    detector = YuNetDetector()
+
+    def locked(image):
+        with lock:
+            return detector.detect(image)
+
+    print(f"images: {len(images)} x {args.repeat}, OpenCV threads: {cv2.getNumThreads()}")
+    print(f"{'threads':>8}{'locked img/s':>14}{'per-thread img/s':>18}{'speedup':>9}")
+    baseline = None
+    for threads in (int(n) for n in args.threads.split(",") if n):
+        serialized = throughput(locked, work, threads)
+        parallel = throughput(detector.detect, work, threads)
+        baseline = baseline or parallel
+        print(f"{threads:>8}{serialized:>14.1f}{parallel:>18.1f}{parallel / baseline:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
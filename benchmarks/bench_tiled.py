@@ -0,0 +1,85 @@
+"""
+Compare peak memory and time of whole-image and tiled face detection.
+
+Each case runs in a fresh subprocess that builds a synthetic RGB canvas of
+the given size with tests/data/obama.jpg pasted in, as a decoded file input
+would be, and then detects faces with `Cropper._detect_scored`. Reported
+"detect RSS" is how much the process's peak resident set size grew during
+detection, on top of the canvas itself. Cases that fail, typically killed
+for running out of memory, are reported as failed.
+
+Usage: python benchmarks/bench_tiled.py [--megapixels 24,50,100] [--tile-size 1024]
+           [--detect-max-side N]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+CHILD = """
+import json, resource, sys, time
+import cv2, numpy as np
+from autocrop.autocrop import Cropper
+
+megapixels, tile_size, max_side = json.loads(sys.argv[1])
+width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+height = int(megapixels * 1e6 / width)
+face = cv2.cvtColor(cv2.imread("tests/data/obama.jpg"), cv2.COLOR_BGR2RGB)
+canvas = np.full((height, width, 3), 90, dtype=np.uint8)
+canvas[height // 3:height // 3 + face.shape[0], width // 2:width // 2 + face.shape[1]] = face
+cropper = Cropper(detect_tile_size=tile_size, detect_max_side=max_side)
+cropper._detect_scored(face, image_is_bgr=False)
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+started = time.perf_counter()
+faces, _ = cropper._detect_scored(canvas, image_is_bgr=False)
+seconds = time.perf_counter() - started
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    "canvas_mb": canvas.nbytes / 2**20,
+    "detect_rss_mb": (after - before) / 1024,
+    "seconds": seconds,
+    "faces": len(faces),
+}))
+"""
+
+
+def run(megapixels, tile_size, max_side):
+    """Return the child's measurements, or None when it failed, e.g. out of memory."""
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, json.dumps([megapixels, tile_size, max_side])],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        return None
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--megapixels", default="24,50,100")
+    parser.add_argument("--tile-size", type=int, default=1024)
+    parser.add_argument("--detect-max-side", type=int, default=None)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(f"{'MP':>6}{'mode':>12}{'canvas MB':>12}{'detect RSS MB':>15}{'s':>8}{'faces':>7}")
+    for megapixels in (float(mp) for mp in args.megapixels.split(",") if mp):
+        for mode, tile_size in (("whole", None), (f"tile {args.tile_size}", args.tile_size)):
+            result = run(megapixels, tile_size, args.detect_max_side)
+            if result is None:
+                print(f"{megapixels:>6.0f}{mode:>12}  failed (out of memory?)")
+                continue
+            print(
+                f"{megapixels:>6.0f}{mode:>12}{result['canvas_mb']:>12.0f}"
+                f"{result['detect_rss_mb']:>15.0f}{result['seconds']:>8.2f}{result['faces']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Send concurrent crop requests to `autocrop serve` and report latency percentiles.
+
+With --start-server an in-process server is started on a free localhost port,
+so the benchmark runs fully offline without a separate terminal.
+
+Usage: python benchmarks/load_generator.py [--url URL | --unix PATH | --start-server]
+           [--image PATH] [--requests N] [--concurrency N] [--query QUERY]
+"""
+
+import argparse
+import http.client
+import socket
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from autocrop.server import CropService, create_server, percentile
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def connection_factory(args):
+    if args.unix:
+        return lambda: UnixHTTPConnection(args.unix, timeout=60)
+    url = urlsplit(args.url)
+    return lambda: http.client.HTTPConnection(url.hostname, url.port, timeout=60)
+
+
+def run_client(new_connection, path, body, count):
+    """Send `count` requests on one keep-alive connection."""
+    connection = new_connection()
+    results = []
+    try:
+        for _ in range(count):
+            started = time.perf_counter()
+            connection.request("POST", path, body=body)
+            response = connection.getresponse()
+            response.read()
+            results.append((response.status, time.perf_counter() - started))
+    finally:
+        connection.close()
+    return results
+
+
+def start_server():
+    service = CropService()
+    service.warm_up()
+    server = create_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--unix", default=None)
+    parser.add_argument("--start-server", action="store_true")
+    parser.add_argument("--image", default="tests/data/obama.jpg")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--query", default="")
+    args = parser.parse_args()
+
+    server = service = None
+    if args.start_server:
+        server, service = start_server()
+        args.url, args.unix = server.url, None
+
+    with open(args.image, "rb") as f:
+        body = f.read()
+    path = "/crop" + (f"?{args.query}" if args.query else "")
+    new_connection = connection_factory(args)
+    counts = [
+        args.requests // args.concurrency + (i < args.requests % args.concurrency)
+        for i in range(args.concurrency)
+    ]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [
+            executor.submit(run_client, new_connection, path, body, count) for count in counts
+        ]
+        results = [result for future in futures for result in future.result()]
+    elapsed = time.perf_counter() - started
+
+    latencies = [seconds for _, seconds in results]
+    statuses = Counter(status for status, _ in results)
+    print(f"requests: {len(results)} over {args.concurrency} connections")
+    print(f"statuses: {dict(sorted(statuses.items()))}")
+    print(f"throughput: {len(results) / elapsed:.1f} req/s")
+    print(f"p50: {percentile(latencies, 50) * 1000:.2f} ms")
+    print(f"p99: {percentile(latencies, 99) * 1000:.2f} ms")
+    if server is not None:
+        print(f"detector batches: {service.detector.batches} for {service.detector.images} images")
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Detectors, images and measurements shared by the test modules"""
+
+import io
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from autocrop.autocrop import Cropper
+
+
+class TopLeftFaceDetector:
+    """Finds a `size` pixel face in the top-left corner of every non-black image."""
+
+    def __init__(self, size=4, delay=0.0):
+        self.size = size
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.most_active = 0
+        self.calls = 0
+
+    def detect(self, image):
+        with self.lock:
+            self.active += 1
+            self.calls += 1
+            self.most_active = max(self.most_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        if not image.any():
+            return np.empty((0, 4), dtype=np.int32)
+        return np.array([[0, 0, self.size, self.size]])
+
+    def cache_settings(self):
+        return {"detector": "top-left", "size": self.size}
+
+
+class CentreFaceDetector:
+    """Finds a face covering the middle tenth of every image."""
+
+    def __init__(self):
+        self.images = []
+
+    def detect(self, image):
+        self.images.append(image)
+        height, width = image.shape[:2]
+        return np.array([[width * 9 // 20, height * 9 // 20, width // 10, height // 10]])
+
+
+def mock_cropper(delay=0.0, **kwargs):
+    return Cropper(
+        width=4,
+        height=4,
+        face_percent=100,
+        face_detector=TopLeftFaceDetector(delay=delay),
+        **kwargs,
+    )
+
+
+def gray(value):
+    return np.full((8, 8, 3), value, dtype=np.uint8)
+
+
+def encoded(color, image_format="PNG"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), color).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def traced_peak(callback):
+    tracemalloc.start()
+    try:
+        result = callback()
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,138 @@
+"""Tests for the asyncio cropping API"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from autocrop.pipeline import CropResult
+
+from .helpers import gray, mock_cropper
+
+
+async def collect(results):
+    return [result async for result in results]
+
+
+def test_acrop_matches_crop(tmp_path):
+    image_path = tmp_path / "face.png"
+    Image.fromarray(gray(200)).save(image_path)
+    cropper = mock_cropper()
+
+    async def main():
+        return await cropper.acrop(gray(10)), await cropper.acrop(str(image_path))
+
+    from_array, from_path = asyncio.run(main())
+    np.testing.assert_array_equal(from_array, cropper.crop(gray(10)))
+    np.testing.assert_array_equal(from_path, cropper.crop(str(image_path)))
+
+
+def test_acrop_raises_like_crop():
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(mock_cropper().acrop("missing.png"))
+
+
+def test_acrop_does_not_block_event_loop():
+    cropper = mock_cropper(delay=0.2)
+    ticks = []
+
+    async def tick():
+        while True:
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+
+    async def main():
+        ticker = asyncio.create_task(tick())
+        await cropper.acrop(gray(10))
+        ticker.cancel()
+
+    asyncio.run(main())
+    assert len(ticks) > 5
+    assert max(np.diff(ticks)) < 0.1
+
+
+def test_acrop_many_streams_results_in_input_order(tmp_path):
+    image_path = tmp_path / "face.png"
+    Image.fromarray(gray(200)).save(image_path)
+    items = [gray(10), str(image_path), gray(0), "missing.png", gray(30)]
+
+    results = asyncio.run(collect(mock_cropper().acrop_many(items, concurrency=3)))
+
+    assert [result.index for result in results] == [0, 1, 2, 3, 4]
+    assert all(isinstance(result, CropResult) for result in results)
+    np.testing.assert_array_equal(results[0].image, gray(10)[:4, :4])
+    np.testing.assert_array_equal(results[1].image, gray(200)[:4, :4])
+    assert results[2].image is None and results[2].error is None
+    assert isinstance(results[3].error, FileNotFoundError)
+    assert results[4].error is None
+
+
+def test_acrop_many_unordered_accepts_async_iterables():
+    async def items():
+        for value in range(1, 20):
+            await asyncio.sleep(0)
+            yield gray(value)
+
+    cropper = mock_cropper()
+    results = asyncio.run(collect(cropper.acrop_many(items(), ordered=False)))
+    assert sorted(result.index for result in results) == list(range(19))
+    for result in results:
+        assert result.image[0, 0, 0] == result.index + 1
+
+
+def test_acrop_many_bounds_concurrency():
+    cropper = mock_cropper(delay=0.02)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = asyncio.run(
+            collect(
+                cropper.acrop_many(
+                    (gray(1) for _ in range(12)), concurrency=2, executor=executor
+                )
+            )
+        )
+    assert len(results) == 12
+    assert cropper.face_detector.most_active == 2
+
+
+def test_acrop_many_pulls_items_lazily():
+    pulled = []
+
+    def items():
+        for value in range(1, 100):
+            pulled.append(value)
+            yield gray(value)
+
+    async def main():
+        results = mock_cropper().acrop_many(items(), concurrency=3)
+        first = await results.__anext__()
+        await results.aclose()
+        return first
+
+    assert asyncio.run(main()).index == 0
+    assert len(pulled) <= 4
+
+
+def test_acrop_many_cancellation_drops_pending_items():
+    cropper = mock_cropper(delay=0.05)
+
+    async def main():
+        task = asyncio.create_task(
+            collect(cropper.acrop_many([gray(1)] * 50, concurrency=4))
+        )
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    # Items that had started finish on their worker threads.
+    time.sleep(0.2)
+    assert cropper.face_detector.calls < 10
+
+
+def test_acrop_many_rejects_bad_concurrency():
+    with pytest.raises(ValueError):
+        asyncio.run(collect(mock_cropper().acrop_many([gray(1)], concurrency=0)))
@@ -1,15 +1,35 @@
 """Tests for autocrop"""
 
 from glob import glob
+import io
 import shutil
+import threading
 
 import pytest  # noqa: F401
 import cv2
 import numpy as np
 from PIL import Image, ImageOps
 
-from autocrop.autocrop import Cropper, open_file
-from autocrop.yunet import YuNetDetector
+from autocrop.autocrop import (
+    Cropper,
+    crop_positions,
+    decode_file,
+    decode_region,
+    detection_proxy,
+    open_file,
+    open_file_reduced,
+    resize_image,
+    safe_zooms,
+)
+from autocrop.yunet import (
+    CoarseToFineDetector,
+    DetectorRegistry,
+    YuNetBatchDetector,
+    YuNetDetector,
+    default_model_path,
+    get_detector,
+    nms_faces,
+)
 
 
 @pytest.fixture()
@@ -28,6 +48,26 @@ def integration():
         shutil.rmtree(path, ignore_errors=True)
 
 
+@pytest.fixture()
+def decoded(monkeypatch):
+    """Record the decoded height, at its decode level, of every file decode."""
+    heights = []
+
+    def spy_decode_file(input_file, min_side=None):
+        image, full_shape, image_format = decode_file(input_file, min_side)
+        heights.append(image.shape[0])
+        return image, full_shape, image_format
+
+    def spy_decode_region(input_file, min_side, box):
+        image, level_shape, origin = decode_region(input_file, min_side, box)
+        heights.append(level_shape[0])
+        return image, level_shape, origin
+
+    monkeypatch.setattr("autocrop.autocrop.decode_file", spy_decode_file)
+    monkeypatch.setattr("autocrop.autocrop.decode_region", spy_decode_region)
+    return heights
+
+
 def test_crop_noise_returns_none():
     loc = "tests/data/noise.png"
     noise = cv2.imread(loc)
@@ -110,6 +150,114 @@ def test_cropper_accepts_detector_object():
     np.testing.assert_array_equal(c.crop(source), expected)
 
 
+class CornerDetector:
+    """Finds a 4x4 face in the top-left corner."""
+
+    def detect(self, image):
+        return np.array([[0, 0, 4, 4]])
+
+
+def corner_cropper(**kwargs):
+    return Cropper(
+        width=4, height=4, face_percent=100, resize=False, face_detector=CornerDetector(), **kwargs
+    )
+
+
+def bgr_noise(channels=3, dtype=np.uint8):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, (8, 8, channels)).astype(dtype)
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16, np.float32, np.int32])
+@pytest.mark.parametrize("channels", [3, 4])
+def test_crop_does_not_modify_input_array(channels, dtype):
+    source = bgr_noise(channels, dtype)
+    original = source.copy()
+
+    cropped = corner_cropper().crop(source)
+
+    np.testing.assert_array_equal(source, original)
+    order = [2, 1, 0, 3][:channels]
+    np.testing.assert_array_equal(cropped, original[:4, :4, order])
+    assert not np.shares_memory(cropped, source)
+
+
+def test_crop_can_return_a_view_in_input_channel_order():
+    source = bgr_noise()
+    cropped = corner_cropper(channel_order="input", copy=False).crop(source)
+    assert np.shares_memory(cropped, source)
+    np.testing.assert_array_equal(cropped, source[:4, :4])
+
+    copied = corner_cropper(channel_order="input").crop(source)
+    assert not np.shares_memory(copied, source)
+    np.testing.assert_array_equal(copied, source[:4, :4])
+
+
+def test_crop_bgr_channel_order_for_files(tmp_path):
+    path = tmp_path / "face.png"
+    rgb = bgr_noise()
+    Image.fromarray(rgb).save(path)
+
+    np.testing.assert_array_equal(corner_cropper().crop(str(path)), rgb[:4, :4])
+    np.testing.assert_array_equal(
+        corner_cropper(channel_order="bgr").crop(str(path)), rgb[:4, :4, ::-1]
+    )
+    np.testing.assert_array_equal(
+        corner_cropper(channel_order="input").crop(str(path)), rgb[:4, :4]
+    )
+
+
+def test_resized_crop_honours_channel_order():
+    source = np.zeros((8, 8, 3), dtype=np.uint8)
+    source[:, :, 0] = 255  # blue in BGR
+    kwargs = {"width": 2, "height": 2, "face_percent": 100, "face_detector": CornerDetector()}
+    assert Cropper(**kwargs).crop(source)[0, 0].tolist() == [0, 0, 255]
+    assert Cropper(channel_order="bgr", **kwargs).crop(source)[0, 0].tolist() == [255, 0, 0]
+    np.testing.assert_array_equal(source[:, :, 0], 255)
+
+
+@pytest.mark.parametrize("backend", ["cv2-area", "pillow-reduce"])
+@pytest.mark.parametrize("size", [100, 500])
+def test_resize_backends_stay_close_to_pillow(backend, size):
+    image = open_file("tests/data/obama.jpg")
+    reference = resize_image(image, (size, size), "pillow")
+    resized = resize_image(image, (size, size), backend)
+    assert resized.shape == reference.shape
+    assert resized.dtype == np.uint8
+    assert np.abs(resized.astype(np.int16) - reference).mean() < 2
+
+
+def test_pillow_reduce_matches_pillow_for_small_factors():
+    image = bgr_noise()
+    np.testing.assert_array_equal(
+        resize_image(image, (6, 6), "pillow-reduce"), resize_image(image, (6, 6), "pillow")
+    )
+
+
+def test_cv2_area_falls_back_to_pillow_for_other_dtypes():
+    image = np.full((8, 8), 7, dtype=np.int32)
+    assert resize_image(image, (4, 4), "cv2-area").tolist() == [[7] * 4] * 4
+
+
+@pytest.mark.parametrize("backend", ["pillow", "cv2-area", "pillow-reduce"])
+def test_cropper_resize_backend(backend):
+    source = bgr_noise(4)
+    cropped = Cropper(
+        width=2, height=3, face_percent=100, face_detector=CornerDetector(), resize_backend=backend
+    ).crop(source)
+    assert cropped.shape == (3, 2, 4)
+
+
+def test_invalid_resize_backend():
+    with pytest.raises(ValueError, match="resize_backend"):
+        Cropper(resize_backend="nearest", face_detector=CornerDetector())
+
+
+def test_invalid_channel_order():
+    with pytest.raises(ValueError, match="channel_order"):
+        Cropper(channel_order="grb", face_detector=CornerDetector())
+
+
 def test_cropper_normalizes_grayscale_for_detection(tmp_path):
     class MockDetector:
         def detect(self, image):
@@ -191,6 +339,79 @@ def test_cropper_uses_largest_detected_face():
     np.testing.assert_array_equal(c.crop(source), expected)
 
 
+class GroupDetector:
+    """Finds three scored faces of different sizes and counts its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def detect_scored(self, image):
+        self.calls += 1
+        boxes = np.array([[40, 0, 8, 8], [0, 0, 16, 16], [20, 20, 12, 12]], dtype=np.int32)
+        return boxes, np.array([0.7, 0.95, 0.9], dtype=np.float32)
+
+    def detect(self, image):
+        return self.detect_scored(image)[0]
+
+
+def group_cropper(**kwargs):
+    return Cropper(width=4, height=4, face_percent=50, face_detector=GroupDetector(), **kwargs)
+
+
+def test_crop_all_crops_every_face_largest_first():
+    c = group_cropper(resize=False)
+    source = bgr_noise()
+    source = np.pad(source, ((0, 56), (0, 56), (0, 0)))
+
+    crops = c.crop_all(source)
+
+    assert c.face_detector.calls == 1
+    assert len(crops) == 3
+    positions = c.crop_positions(
+        [[0, 0, 16, 16], [20, 20, 12, 12], [40, 0, 8, 8]], source.shape[:2]
+    )
+    for crop, (top, bottom, left, right) in zip(crops, positions):
+        np.testing.assert_array_equal(crop, source[top:bottom, left:right, ::-1])
+    np.testing.assert_array_equal(crops[0], c.crop(source))
+
+
+def test_crop_all_resizes_and_filters_faces():
+    c = group_cropper()
+    source = np.zeros((64, 64, 3), dtype=np.uint8)
+
+    assert [crop.shape for crop in c.crop_all(source)] == [(4, 4, 3)] * 3
+    assert len(c.crop_all(source, min_face_size=12)) == 2
+    assert len(c.crop_all(source, min_score=0.8)) == 2
+    assert len(c.crop_all(source, min_face_size=12, min_score=0.92)) == 1
+    assert c.crop_all(source, min_face_size=100) == []
+
+
+def test_crop_all_min_score_needs_scores():
+    c = corner_cropper()
+    with pytest.raises(ValueError):
+        c.crop_all(bgr_noise(), min_score=0.5)
+    assert len(c.crop_all(bgr_noise())) == 1
+
+
+def test_crop_all_decodes_a_reduced_file_once(tmp_path, decoded):
+    class LargeGroupDetector:
+        def detect(self, image):
+            scale = image.shape[0] / 3200
+            return (np.array([[400, 400, 800, 800], [2000, 2000, 100, 100]]) * scale).astype(int)
+
+    image_path = tmp_path / "large.jpg"
+    Image.new("RGB", (3200, 3200), "white").save(image_path)
+    c = Cropper(face_detector=LargeGroupDetector(), detect_max_side=400)
+
+    crops = c.crop_all(str(image_path))
+
+    assert [crop.shape for crop in crops] == [(500, 500, 3)] * 2
+    # One reduced decode for detection, then one decode large enough for the
+    # small face's crop, which needs the most pixels.
+    assert len(decoded) == 2
+    assert decoded[1] > decoded[0]
+
+
 def test_cropper_returns_none_for_invalid_crop_geometry():
     class MockDetector:
         def detect(self, image):
@@ -250,6 +471,89 @@ def test_yunet_detector_returns_empty_when_no_faces(monkeypatch):
     assert faces.shape == (0, 4)
 
 
+def test_yunet_detector_builds_from_model_bytes(monkeypatch):
+    created = []
+
+    class MockFaceDetectorYN:
+        def setInputSize(self, input_size):
+            created.append(("resize", input_size))
+
+        def detect(self, image):
+            return None, None
+
+    def mock_create(framework, model, config, input_size, *args):
+        created.append((framework, bytes(model), input_size))
+        return MockFaceDetectorYN()
+
+    monkeypatch.setattr(cv2, "FaceDetectorYN_create", mock_create, raising=False)
+    exists_calls = []
+    monkeypatch.setattr("os.path.exists", lambda path: exists_calls.append(path))
+
+    detector = YuNetDetector(model_bytes=np.frombuffer(b"onnx", dtype=np.uint8))
+    detector.detect(np.zeros((20, 10, 3), dtype=np.uint8))
+    detector.detect(np.zeros((20, 10, 3), dtype=np.uint8))
+    detector.detect(np.zeros((30, 10, 3), dtype=np.uint8))
+
+    assert created == [("onnx", b"onnx", (10, 20)), ("resize", (10, 30))]
+    assert exists_calls == []
+
+
+def test_detector_registry_shares_detectors_per_settings(tmp_path):
+    model_path = tmp_path / "model.onnx"
+    model_path.write_bytes(b"model")
+    registry = DetectorRegistry()
+
+    first = registry.get(str(model_path))
+    assert registry.get(str(model_path)) is first
+    assert registry.get(str(model_path), score_threshold=0.9) is not first
+    assert registry.get(str(model_path), top_k=10) is not first
+    assert bytes(first.model_bytes) == b"model"
+    assert registry.get(str(model_path), nms_threshold=0.5).model_bytes is first.model_bytes
+
+
+def test_detector_registry_is_thread_safe(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    model_path = tmp_path / "model.onnx"
+    model_path.write_bytes(b"model")
+    registry = DetectorRegistry()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        detectors = list(executor.map(lambda _: registry.get(str(model_path)), range(64)))
+
+    assert all(detector is detectors[0] for detector in detectors)
+
+
+def test_croppers_share_registry_detector():
+    assert Cropper().face_detector is Cropper(width=200).face_detector
+    assert Cropper().face_detector is get_detector()
+    assert Cropper(yunet_score_threshold=0.8).face_detector is not get_detector()
+
+
+def test_crop_accepts_encoded_image_bytes():
+    class MockDetector:
+        def detect(self, image):
+            return np.array([[0, 0, 2, 2]])
+
+    source = np.array(
+        [
+            [[255, 0, 0], [0, 0, 255]],
+            [[0, 255, 0], [255, 255, 0]],
+        ],
+        dtype=np.uint8,
+    )
+    buffer = io.BytesIO()
+    Image.fromarray(source).save(buffer, format="PNG")
+    c = Cropper(
+        width=2,
+        height=2,
+        face_percent=100,
+        resize=False,
+        face_detector=MockDetector(),
+    )
+    np.testing.assert_array_equal(c.crop(buffer.getvalue()), source)
+
+
 def test_open_file_invalid_filetype_returns_error():
     c = Cropper()
     with pytest.raises(FileNotFoundError) as e:
@@ -295,6 +599,43 @@ def test_crop_positions_stay_inside_image_bounds(values):
     assert 0 <= h1 < h2 <= imgw
 
 
+def random_boxes(rng, n):
+    """Face boxes anywhere around and across the edges of random images."""
+    imgh = rng.integers(1, 4000, n)
+    imgw = rng.integers(1, 4000, n)
+    x = rng.integers(-100, imgw + 100)
+    y = rng.integers(-100, imgh + 100)
+    w = rng.integers(1, np.maximum(2, imgw))
+    h = rng.integers(1, np.maximum(2, imgh))
+    return np.stack([x, y, w, h], axis=1).astype(np.int32), np.stack([imgh, imgw], axis=1)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize(
+    "width, height, face_percent",
+    [(500, 500, 50), (200, 600, 1), (640, 360, 100), (333, 101, 73)],
+)
+def test_vectorized_crop_positions_match_scalar_geometry(seed, width, height, face_percent):
+    rng = np.random.default_rng(seed)
+    boxes, image_sizes = random_boxes(rng, 250)
+    c = Cropper(width=width, height=height, face_percent=face_percent)
+
+    zooms = safe_zooms(boxes, image_sizes, face_percent)
+    positions = c.crop_positions(boxes, image_sizes)
+
+    for box, (imgh, imgw), zoom, pos in zip(boxes, image_sizes, zooms, positions):
+        assert c._determine_safe_zoom(int(imgh), int(imgw), *box) == zoom
+        assert c._crop_positions(int(imgh), int(imgw), *box) == pos.tolist()
+
+
+def test_vectorized_crop_positions_broadcast_one_image_size():
+    boxes = [[50, 50, 100, 100], [400, 0, 100, 100]]
+    positions = crop_positions(boxes, (500, 500))
+    c = Cropper()
+    assert positions.tolist() == [c._crop_positions(500, 500, *box) for box in boxes]
+    assert crop_positions(np.empty((0, 4)), (500, 500)).shape == (0, 4)
+
+
 @pytest.mark.slow
 @pytest.mark.parametrize(
     "height, width",
@@ -351,3 +692,458 @@ def test_transparent_png(integration):
 
     # Make sure the first pixel is transparent
     assert img[0, 0, 3] == 0
+
+
+def crop_window(cropper, image):
+    faces = cropper._detect(image, image_is_bgr=False)
+    x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+    return cropper._crop_positions(image.shape[0], image.shape[1], x, y, w, h)
+
+
+def window_iou(a, b):
+    v1, v2 = max(a[0], b[0]), min(a[1], b[1])
+    h1, h2 = max(a[2], b[2]), min(a[3], b[3])
+    intersection = max(0, v2 - v1) * max(0, h2 - h1)
+    area_a = (a[1] - a[0]) * (a[3] - a[2])
+    area_b = (b[1] - b[0]) * (b[3] - b[2])
+    return intersection / (area_a + area_b - intersection)
+
+
+def test_detection_proxy_maps_boxes_back_to_full_resolution():
+    class MockDetector:
+        def detect(self, image):
+            self.shape = image.shape
+            return np.array([[10, 20, 30, 40]])
+
+    detector = MockDetector()
+    c = Cropper(face_detector=detector, detect_max_side=100)
+    faces = c._detect(np.zeros((400, 200, 3), dtype=np.uint8), image_is_bgr=True)
+
+    assert detector.shape == (100, 50, 3)
+    np.testing.assert_array_equal(faces, [[40, 80, 120, 160]])
+
+
+def test_detection_proxy_leaves_small_images_alone():
+    image = np.zeros((40, 20, 3), dtype=np.uint8)
+    proxy, scale = detection_proxy(image, 100)
+    assert proxy is image
+    assert scale == (1.0, 1.0)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize(
+    "image_name",
+    [
+        "duncan.jpg",
+        "expo_67.png",
+        "kwong.png",
+        "macbeth.jpg",
+        "obama.jpg",
+        "remba-gardner.gif",
+        "smith.jpg",
+        "vezina.jpg",
+    ],
+)
+def test_detection_proxy_keeps_crops_stable(image_name):
+    image = open_file(f"tests/data/{image_name}")
+    full = crop_window(Cropper(), image)
+    proxy = crop_window(Cropper(detect_max_side=320), image)
+    assert window_iou(full, proxy) > 0.8
+
+
+def test_open_file_reduced_uses_jpeg_dct_scaling(tmp_path):
+    image_path = tmp_path / "large.jpg"
+    Image.new("RGB", (800, 400), "white").save(image_path)
+
+    image, full_shape = open_file_reduced(str(image_path), 100)
+
+    assert image.shape == (50, 100, 3)
+    assert full_shape == (400, 800)
+
+
+def test_open_file_reduced_reports_oriented_full_size(tmp_path):
+    image_path = tmp_path / "oriented.jpg"
+    exif = Image.Exif()
+    exif[274] = 6
+    Image.new("RGB", (800, 400), "white").save(image_path, exif=exif)
+
+    image, full_shape = open_file_reduced(str(image_path), 100)
+
+    assert image.shape == (100, 50, 3)
+    assert full_shape == (800, 400)
+
+
+def test_open_file_reduced_decodes_other_formats_at_full_size(tmp_path):
+    image_path = tmp_path / "large.png"
+    Image.new("RGB", (800, 400), "white").save(image_path)
+
+    image, full_shape = open_file_reduced(str(image_path), 100)
+
+    assert image.shape == (400, 800, 3)
+    assert full_shape == (400, 800)
+
+
+@pytest.mark.parametrize(
+    "face, decoded_sides",
+    [
+        # Crop window of 1600 px: a 1/2 scale decode still has >= 500 px.
+        ([1200, 1200, 800, 800], [400, 1600]),
+        # Crop window of 400 px: the output needs full-resolution pixels.
+        ([1400, 1400, 200, 200], [400, 3200]),
+    ],
+)
+def test_reduced_decode_only_decodes_pixels_the_output_needs(
+    tmp_path, decoded, face, decoded_sides
+):
+    class MockDetector:
+        def detect(self, image):
+            # Boxes are reported in detection-image coordinates.
+            return np.array([face]) * image.shape[0] // 3200
+
+    image_path = tmp_path / "large.jpg"
+    Image.new("RGB", (3200, 3200), "white").save(image_path)
+    c = Cropper(face_detector=MockDetector(), detect_max_side=400)
+
+    assert c.crop(str(image_path)).shape == (500, 500, 3)
+    assert decoded == decoded_sides
+
+
+@pytest.mark.slow
+def test_reduced_decode_matches_full_decode_crop(tmp_path):
+    image_path = tmp_path / "large.jpg"
+    with Image.open("tests/data/obama.jpg") as img:
+        img.resize((img.width * 6, img.height * 6)).save(image_path, quality=95)
+    full = open_file(str(image_path))
+
+    c = Cropper(detect_max_side=640)
+    expected = c.crop(np.ascontiguousarray(full[:, :, ::-1]))
+    result = c.crop(str(image_path))
+
+    assert result.shape == expected.shape
+    assert np.abs(result.astype(int) - expected).mean() < 8
+
+
+class CountingFaceDetectorYN:
+    def __init__(self, input_size, calls):
+        self.input_size = input_size
+        self.calls = calls
+        calls.append(("create", input_size))
+
+    def setInputSize(self, input_size):
+        self.calls.append(("resize", input_size))
+        self.input_size = input_size
+
+    def detect(self, image):
+        assert image.shape[1::-1] == self.input_size
+        return None, np.array([[8.0, 16.0, 32.0, 64.0] + [0.0] * 10 + [0.9]])
+
+
+@pytest.fixture()
+def counting_yunet(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        cv2,
+        "FaceDetectorYN_create",
+        lambda model, config, input_size, *args: CountingFaceDetectorYN(input_size, calls),
+        raising=False,
+    )
+    return calls
+
+
+def test_yunet_native_mode_counts_reconfigurations(counting_yunet):
+    detector = YuNetDetector()
+    for shape in [(20, 10), (30, 10), (30, 10), (20, 10)]:
+        detector.detect(np.zeros(shape + (3,), dtype=np.uint8))
+
+    assert [call[0] for call in counting_yunet] == ["create", "resize", "resize"]
+    stats = detector.stats()
+    assert stats["detections"] == 4
+    assert stats["reconfigurations"] == 3
+
+
+def test_yunet_bucketed_mode_keeps_one_network_per_bucket(counting_yunet):
+    detector = YuNetDetector(input_buckets=[(64, 64), (128, 96)])
+    for shape in [(20, 10), (60, 50), (90, 120), (30, 40), (96, 128)]:
+        faces = detector.detect(np.zeros(shape + (3,), dtype=np.uint8))
+        np.testing.assert_array_equal(faces, [[8, 16, 32, 64]])
+
+    assert counting_yunet == [("create", (64, 64)), ("create", (128, 96))]
+    stats = detector.stats()
+    assert stats["reconfigurations"] == 2
+    assert stats["bucket_misses"] == 2
+    assert stats["bucket_hits"] == 3
+    assert stats["bucket_hit_rate"] == pytest.approx(0.6)
+
+
+def test_yunet_bucketed_mode_unletterboxes_downscaled_images(counting_yunet):
+    detector = YuNetDetector(input_buckets=[(64, 64)])
+    faces = detector.detect(np.zeros((256, 128, 3), dtype=np.uint8))
+
+    # The image is halved twice over to fit the bucket, so boxes scale by 4.
+    np.testing.assert_array_equal(faces, [[32, 64, 128, 256]])
+
+
+def test_yunet_bucket_lru_evicts_least_recently_used(counting_yunet):
+    detector = YuNetDetector(
+        input_buckets=[(32, 32), (64, 64), (96, 96)], max_bucket_detectors=2
+    )
+    for side in [30, 60, 30, 90, 60]:
+        detector.detect(np.zeros((side, side, 3), dtype=np.uint8))
+
+    assert [call[1][0] for call in counting_yunet] == [32, 64, 96, 64]
+    assert detector.stats()["bucket_hits"] == 1
+
+
+@pytest.mark.slow
+def test_yunet_bucketed_mode_matches_native_detection():
+    native = YuNetDetector()
+    bucketed = YuNetDetector(input_buckets=True)
+    for image_name in ["obama.jpg", "kwong.png", "vezina.jpg", "noise.png"]:
+        image = cv2.imread(f"tests/data/{image_name}")
+        np.testing.assert_array_equal(bucketed.detect(image), native.detect(image))
+
+
+def test_yunet_threads_use_networks_of_their_own(counting_yunet):
+    detector = YuNetDetector()
+    barrier = threading.Barrier(4)
+
+    def detect(side):
+        barrier.wait()
+        for _ in range(3):
+            detector.detect(np.zeros((side, side, 3), dtype=np.uint8))
+
+    threads = [threading.Thread(target=detect, args=(side,)) for side in (10, 20, 30, 40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Each thread builds one network at its own size and never resizes it.
+    assert sorted(counting_yunet) == [("create", (side, side)) for side in (10, 20, 30, 40)]
+    assert detector.stats()["detections"] == 12
+    assert detector.stats()["reconfigurations"] == 4
+
+
+@pytest.mark.slow
+def test_yunet_shared_between_threads_matches_sequential_detection():
+    from concurrent.futures import ThreadPoolExecutor
+
+    images = [
+        cv2.imread(f"tests/data/{name}")
+        for name in ["obama.jpg", "kwong.png", "vezina.jpg", "noise.png"]
+    ]
+    # Differently sized images interleaved across threads, so a shared
+    # network would be reconfigured under another thread's detection.
+    work = [images[i % len(images)] for i in range(64)]
+    expected = [YuNetDetector().detect(image) for image in images]
+
+    detector = YuNetDetector()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(detector.detect, work))
+
+    for i, faces in enumerate(results):
+        np.testing.assert_array_equal(faces, expected[i % len(images)])
+    assert detector.stats()["detections"] == 64
+
+
+class BatchDetector:
+    """Finds a face in the top-left corner of every non-black image, in batches."""
+
+    def __init__(self):
+        self.batches = []
+
+    def detect(self, image):
+        return self.detect_batch([image])[0]
+
+    def detect_batch(self, images):
+        self.batches.append(len(images))
+        return [
+            np.array([[0, 0, 4, 4]]) if image.any() else np.empty((0, 4), dtype=np.int32)
+            for image in images
+        ]
+
+    def cache_settings(self):
+        return {"detector": "batch"}
+
+
+def test_crop_batch_detects_4d_arrays_in_one_call():
+    detector = BatchDetector()
+    c = Cropper(width=4, height=4, face_percent=100, face_detector=detector)
+    images = np.zeros((5, 8, 8, 3), dtype=np.uint8)
+    images[[0, 2, 3]] = np.arange(1, 4, dtype=np.uint8)[:, None, None, None]
+
+    results = c.crop_batch(images)
+
+    assert detector.batches == [5]
+    assert [result is None for result in results] == [False, True, False, False, True]
+    for index in (0, 2, 3):
+        np.testing.assert_array_equal(results[index], c.crop(images[index]))
+
+
+def test_crop_batch_calls_detectors_without_detect_batch_per_image():
+    class MockDetector:
+        def detect(self, image):
+            return np.array([[0, 0, 4, 4]]) if image.any() else np.empty((0, 4))
+
+    c = Cropper(width=4, height=4, face_percent=100, face_detector=MockDetector())
+    images = [np.full((8, 8, 3), 50, dtype=np.uint8), np.zeros((6, 6, 3), dtype=np.uint8)]
+
+    results = c.crop_batch(images)
+
+    np.testing.assert_array_equal(results[0], c.crop(images[0]))
+    np.testing.assert_array_equal(results[1], c.crop(images[1]))
+
+
+def test_crop_batch_skips_cached_images():
+    from autocrop.cache import DetectionCache
+
+    detector = BatchDetector()
+    c = Cropper(
+        width=4,
+        height=4,
+        face_percent=100,
+        face_detector=detector,
+        detection_cache=DetectionCache(),
+    )
+    images = np.full((3, 8, 8, 3), 9, dtype=np.uint8)
+    images[1] += 1
+    c.crop_batch(images[:1])
+    c.crop_batch(images)
+
+    # Images 0 and 2 are equal and cached by the first call.
+    assert detector.batches == [1, 1]
+
+
+def test_nms_faces_matches_opencv_nms_boxes():
+    rng = np.random.default_rng(0)
+    faces = np.zeros((300, 15), dtype=np.float32)
+    faces[:, :2] = rng.uniform(0, 200, (300, 2))
+    faces[:, 2:4] = rng.uniform(10, 60, (300, 2))
+    faces[:, 14] = rng.uniform(0.6, 1.0, 300)
+
+    expected = cv2.dnn.NMSBoxes(
+        [tuple(int(v) for v in face[:4]) for face in faces], faces[:, 14].tolist(), 0.6, 0.3, 1.0, 50
+    )
+
+    np.testing.assert_array_equal(nms_faces(faces, 0.3, 50), faces[np.asarray(expected)])
+
+
+@pytest.mark.slow
+def test_yunet_batch_detector_matches_face_detector_yn():
+    images = [
+        cv2.imread(path) for path in sorted(glob("tests/data/*")) if not path.endswith(".md")
+    ]
+    images = [image for image in images if image is not None]
+    batched = YuNetBatchDetector().detect_faces_batch(images)
+
+    for image, faces in zip(images, batched):
+        detector = cv2.FaceDetectorYN_create(
+            default_model_path(), "", image.shape[1::-1], 0.6, 0.3, 5000
+        )
+        _, expected = detector.detect(image)
+        expected = np.empty((0, 15), dtype=np.float32) if expected is None else expected
+        np.testing.assert_allclose(faces, expected, rtol=1e-5, atol=1e-3)
+
+
+@pytest.mark.slow
+def test_yunet_batch_detector_crops_like_yunet_detector():
+    names = ["obama.jpg", "kwong.png", "vezina.jpg", "noise.png"]
+    images = [cv2.resize(cv2.imread(f"tests/data/{name}"), (320, 400)) for name in names]
+    c = Cropper(face_detector=YuNetBatchDetector())
+
+    results = c.crop_batch(np.stack(images))
+
+    for image, result in zip(images, results):
+        expected = Cropper().crop(image)
+        if expected is None:
+            assert result is None
+        else:
+            np.testing.assert_array_equal(result, expected)
+
+
+class SquareFaceDetector:
+    """Finds the bright square of an image, recording every input shape."""
+
+    def __init__(self):
+        self.shapes = []
+
+    def detect_scored(self, image):
+        self.shapes.append(image.shape[:2])
+        ys, xs = np.nonzero(image[:, :, 0] > 128)
+        if not len(xs):
+            return np.empty((0, 4), dtype=np.int32), np.empty(0, dtype=np.float32)
+        box = [xs.min(), ys.min(), xs.max() - xs.min() + 1, ys.max() - ys.min() + 1]
+        return np.array([box], dtype=np.int32), np.array([0.9], dtype=np.float32)
+
+
+def test_coarse_to_fine_exits_after_coarse_pass_without_faces():
+    inner = SquareFaceDetector()
+    detector = CoarseToFineDetector(inner, coarse_max_side=100)
+
+    faces, scores = detector.detect_scored(np.zeros((1000, 800, 3), dtype=np.uint8))
+
+    assert faces.shape == (0, 4)
+    assert inner.shapes == [(100, 80)]
+    assert detector.stats()["early_exits"] == 1
+
+
+def test_coarse_to_fine_refines_candidates_at_full_resolution():
+    image = np.zeros((1000, 800, 3), dtype=np.uint8)
+    image[403:497, 211:333] = 255
+    inner = SquareFaceDetector()
+    detector = CoarseToFineDetector(inner, coarse_max_side=100, roi_padding=0.5)
+
+    faces, scores = detector.detect_scored(image)
+
+    np.testing.assert_array_equal(faces, [[211, 403, 122, 94]])
+    np.testing.assert_allclose(scores, [0.9])
+    # One coarse pass, then one region of about twice the face's size.
+    assert inner.shapes[0] == (100, 80)
+    assert len(inner.shapes) == 2
+    assert 180 <= inner.shapes[1][0] <= 200 and 230 <= inner.shapes[1][1] <= 250
+    assert detector.stats() == {"detections": 1, "early_exits": 0, "regions": 1, "refined": 1}
+
+
+def test_coarse_to_fine_detects_small_images_in_one_pass():
+    inner = SquareFaceDetector()
+    detector = CoarseToFineDetector(inner, coarse_max_side=100)
+    image = np.zeros((90, 60, 3), dtype=np.uint8)
+    image[10:30, 20:40] = 255
+
+    faces, _ = detector.detect_scored(image)
+
+    np.testing.assert_array_equal(faces, [[20, 10, 20, 20]])
+    assert inner.shapes == [(90, 60)]
+
+
+def test_cropper_detect_strategy_wraps_detector():
+    inner = SquareFaceDetector()
+    c = Cropper(face_detector=inner, detect_strategy="coarse-to-fine")
+    assert isinstance(c.face_detector, CoarseToFineDetector)
+    assert c.face_detector.detector is inner
+    assert Cropper(face_detector=inner).face_detector is inner
+    with pytest.raises(ValueError):
+        Cropper(face_detector=inner, detect_strategy="fast")
+
+
+@pytest.mark.slow
+def test_coarse_to_fine_matches_full_detection_on_large_images():
+    full = YuNetDetector()
+    detector = CoarseToFineDetector(YuNetDetector())
+    for name in ["obama.jpg", "vezina.jpg", "smith.jpg"]:
+        image = cv2.imread(f"tests/data/{name}")
+        expected = full.detect(image).astype(float) * 2
+        large = cv2.resize(image, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+
+        faces = detector.detect(large)
+
+        assert len(faces) == len(expected) == 1
+        x1, y1 = np.maximum(faces[0, :2], expected[0, :2])
+        x2, y2 = np.minimum(faces[0, :2] + faces[0, 2:], expected[0, :2] + expected[0, 2:])
+        inter = max(0, x2 - x1) * max(0, y2 - y1)
+        union = faces[0, 2] * faces[0, 3] + expected[0, 2] * expected[0, 3] - inter
+        assert inter / union > 0.8
+
+    noise = cv2.resize(cv2.imread("tests/data/noise.png"), (2000, 2000))
+    assert detector.detect(noise).shape == (0, 4)
+    assert detector.stats()["early_exits"] == 1
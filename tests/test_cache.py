@@ -0,0 +1,216 @@
+"""Tests for the detection cache"""
+
+import pickle
+import sqlite3
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from autocrop import command_line_interface
+from autocrop.autocrop import Cropper
+from autocrop.cache import DetectionCache, content_key
+
+
+class CountingDetector:
+    """Finds one scored face in the top-left corner and counts its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def detect_scored(self, image):
+        self.calls += 1
+        return np.array([[0, 0, 8, 8]], dtype=np.int32), np.array([0.9], dtype=np.float32)
+
+    def detect(self, image):
+        return self.detect_scored(image)[0]
+
+    def cache_settings(self):
+        return {"detector": "counting"}
+
+
+def boxes(value):
+    return np.array([[value, 0, 4, 4]], dtype=np.int32)
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / "face.png"
+    Image.fromarray(np.full((16, 16, 3), 200, dtype=np.uint8)).save(path)
+    return str(path)
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = DetectionCache(max_entries=2)
+    cache.put("a", boxes(1))
+    cache.put("b", boxes(2))
+    cache.get("a")
+    cache.put("c", boxes(3))
+
+    assert cache.get("b") is None
+    np.testing.assert_array_equal(cache.get("a")[0], boxes(1))
+    np.testing.assert_array_equal(cache.get("c")[0], boxes(3))
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["memory_entries"] == 2
+    assert (stats["memory_hits"], stats["misses"]) == (3, 1)
+    assert stats["hit_rate"] == 0.75
+
+
+def test_disk_cache_persists_between_instances(tmp_path):
+    path = tmp_path / "detections.sqlite"
+    cache = DetectionCache(path)
+    cache.put("key", boxes(5), [0.5])
+    cache.close()
+
+    reopened = DetectionCache(path)
+    faces, scores = reopened.get("key")
+    np.testing.assert_array_equal(faces, boxes(5))
+    np.testing.assert_allclose(scores, [0.5])
+    reopened.get("key")
+    stats = reopened.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+    reopened.close()
+
+
+def test_disk_cache_evicts_oldest_entries(tmp_path):
+    cache = DetectionCache(tmp_path / "detections.sqlite", max_entries=1, max_disk_entries=2)
+    for i, key in enumerate("abc"):
+        cache.put(key, boxes(i))
+
+    stats = cache.stats()
+    assert stats["disk_entries"] == 2
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    cache.close()
+
+
+def test_disk_cache_counts_entries_only_when_the_limit_may_be_passed(tmp_path):
+    cache = DetectionCache(tmp_path / "detections.sqlite", max_entries=1, max_disk_entries=20)
+    statements = []
+    cache._db.set_trace_callback(statements.append)
+    for i in range(21):
+        cache.put(str(i), boxes(i))
+
+    assert sum("COUNT(*)" in statement for statement in statements) == 1
+    # Passing the limit evicts the oldest tenth as well as the excess.
+    assert cache.stats()["disk_entries"] == 18
+    assert cache.get("2") is None
+    assert cache.get("3") is not None
+    cache.close()
+
+
+def test_disk_cache_writes_access_times_in_batches(tmp_path):
+    path = tmp_path / "detections.sqlite"
+    cache = DetectionCache(path)
+    cache.put("key", boxes(1))
+    cache.close()
+
+    def accessed():
+        with sqlite3.connect(path) as db:
+            return db.execute("SELECT accessed FROM detections").fetchone()[0]
+
+    stored = accessed()
+    reopened = DetectionCache(path)
+    assert reopened.get("key") is not None
+    assert accessed() == stored
+    reopened.close()
+    assert accessed() > stored
+
+
+def test_cache_entries_without_scores_and_empty_boxes():
+    cache = DetectionCache()
+    cache.put("none", np.empty((0, 4), dtype=np.int32))
+    faces, scores = cache.get("none")
+    assert faces.shape == (0, 4)
+    assert scores is None
+
+
+def test_disk_cache_can_be_pickled_for_worker_processes(tmp_path):
+    path = tmp_path / "detections.sqlite"
+    cache = DetectionCache(path, max_entries=7)
+    cache.put("key", boxes(1))
+
+    copy = pickle.loads(pickle.dumps(cache))
+    assert copy.max_entries == 7
+    assert copy.stats()["memory_entries"] == 0
+    np.testing.assert_array_equal(copy.get("key")[0], boxes(1))
+    cache.close()
+    copy.close()
+
+
+def test_content_key_depends_on_content_and_settings():
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    assert content_key(image, {"a": 1}) == content_key(image.copy(), {"a": 1})
+    assert content_key(image, {"a": 1}) != content_key(image, {"a": 2})
+    assert content_key(image, {"a": 1}) != content_key(image.reshape(8, 2, 3), {"a": 1})
+    assert content_key(b"abc", {}) != content_key(b"abd", {})
+
+
+def test_cropper_recrops_at_new_sizes_without_detecting(image_path):
+    detector = CountingDetector()
+    cache = DetectionCache()
+    results = [
+        Cropper(
+            width=size, height=size, face_percent=100, face_detector=detector, detection_cache=cache
+        ).crop(image_path)
+        for size in (4, 6, 8)
+    ]
+
+    assert detector.calls == 1
+    assert [result.shape[:2] for result in results] == [(4, 4), (6, 6), (8, 8)]
+    uncached = Cropper(width=6, height=6, face_percent=100, face_detector=CountingDetector())
+    np.testing.assert_array_equal(results[1], uncached.crop(image_path))
+    assert cache.stats()["memory_hits"] == 2
+
+
+def test_cropper_cache_keys_cover_detection_settings(image_path):
+    detector = CountingDetector()
+    cache = DetectionCache()
+    Cropper(face_detector=detector, detection_cache=cache).crop(image_path)
+    Cropper(face_detector=detector, detection_cache=cache, detect_max_side=8).crop(image_path)
+    assert detector.calls == 2
+
+
+def test_cropper_requires_cache_settings_of_cached_custom_detectors():
+    class UnkeyedDetector:
+        def detect(self, image):
+            return np.empty((0, 4), dtype=np.int32)
+
+    for strategy in ("full", "coarse-to-fine"):
+        with pytest.raises(ValueError, match="cache_settings"):
+            Cropper(
+                face_detector=UnkeyedDetector(),
+                detection_cache=DetectionCache(),
+                detect_strategy=strategy,
+            )
+    Cropper(face_detector=UnkeyedDetector())
+
+
+def test_cropper_caches_array_inputs():
+    detector = CountingDetector()
+    cropper = Cropper(width=4, height=4, face_percent=100, face_detector=detector, detection_cache=DetectionCache())
+    image = np.full((16, 16, 3), 100, dtype=np.uint8)
+    cropper.crop(image)
+    cropper.crop(image.copy())
+    cropper.crop(image + 1)
+    assert detector.calls == 2
+
+
+def test_cli_detection_cache_option(monkeypatch, tmp_path):
+    created = {}
+
+    def fake_crop_file_to_output(*args, **kwargs):
+        created["cache"] = kwargs["cropper"].detection_cache
+        return 0
+
+    monkeypatch.setattr("autocrop.cli.crop_file_to_output", fake_crop_file_to_output)
+    path = tmp_path / "detections.sqlite"
+    sys.argv = ["autocrop", "tests/data/obama.jpg", "-o", str(tmp_path / "out.jpg"), "--detection-cache", str(path)]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 0
+    assert created["cache"].path == str(path)
+    assert path.exists()
+    created["cache"].close()
@@ -1,11 +1,16 @@
 """Tests for cli"""
 import io
+import json
 import os
 import re
+import shutil
+import struct
+import subprocess
 import sys
 
 import pytest
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
 from PIL import Image
 
@@ -14,13 +19,20 @@ from autocrop.cli import (
     command_line_interface,
     crop_file_to_output,
     crop_stdin_to_stdout,
+    crop_stream,
+    face_output_filename,
+    map_bounded,
     output,
     output_format,
+    read_nul_delimited,
+    read_source,
     resolve_file_output,
     size,
     validate_output_extension,
 )
 
+from .helpers import TopLeftFaceDetector, encoded
+
 SOURCE_ATIME_NS = 946684800123456000
 SOURCE_MTIME_NS = 978307200654321000
 EXIF_MAKE_TAG = 271
@@ -138,6 +150,111 @@ def test_output_preserves_exif_when_overwriting(tmp_path):
         assert result.size == (2, 2)
 
 
+def test_output_replaces_destination_atomically(tmp_path):
+    source = tmp_path / "source.jpg"
+    destination = tmp_path / "destination.jpg"
+    exif_image(source)
+    destination.write_bytes(b"previous")
+
+    output(str(source), str(destination), np.full((2, 2, 3), 255, dtype=np.uint8))
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["destination.jpg", "source.jpg"]
+    with Image.open(destination) as result:
+        assert result.size == (2, 2)
+
+
+def test_output_failure_keeps_destination_and_removes_temporary_file(tmp_path):
+    source = tmp_path / "source.jpg"
+    destination = tmp_path / "destination.jpg"
+    exif_image(source)
+    destination.write_bytes(b"previous")
+
+    with pytest.raises(OSError):
+        output(str(source), str(destination), np.zeros((2, 2), dtype=np.float64))
+
+    assert destination.read_bytes() == b"previous"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["destination.jpg", "source.jpg"]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permissions")
+def test_output_preserves_source_permissions(tmp_path):
+    source = tmp_path / "source.jpg"
+    destination = tmp_path / "destination.jpg"
+    exif_image(source)
+    os.chmod(source, 0o640)
+
+    output(str(source), str(destination), np.full((2, 2, 3), 255, dtype=np.uint8))
+
+    assert os.stat(destination).st_mode & 0o777 == 0o640
+
+
+def test_output_without_metadata_skips_exif_and_timestamps(tmp_path):
+    source = tmp_path / "source.jpg"
+    destination = tmp_path / "destination.jpg"
+    exif_image(source)
+    set_source_timestamps(source)
+
+    output(
+        str(source),
+        str(destination),
+        np.full((2, 2, 3), 255, dtype=np.uint8),
+        preserve_metadata=False,
+    )
+
+    assert os.stat(destination).st_mtime_ns != SOURCE_MTIME_NS
+    with Image.open(destination) as result:
+        assert EXIF_MAKE_TAG not in result.getexif()
+
+
+def test_crop_file_to_output_reads_input_metadata_once(monkeypatch, tmp_path):
+    source = tmp_path / "source.jpg"
+    destination = tmp_path / "destination.jpg"
+    exif_image(source)
+    set_source_timestamps(source)
+    read = mock.Mock(wraps=read_source)
+    monkeypatch.setattr("autocrop.cli.read_source", read)
+    cropper = Cropper(width=2, height=2, face_percent=100, face_detector=CornerFaceDetector())
+    status = crop_file_to_output(str(source), str(destination), cropper=cropper)
+
+    assert status == 0
+    read.assert_called_once()
+    assert_timestamps_match_source(destination)
+    assert_exif_matches_source(source, destination)
+
+
+def test_crop_file_to_output_passes_the_path_to_the_cropper(monkeypatch, tmp_path):
+    source = tmp_path / "source.jpg"
+    exif_image(source)
+    inputs = []
+
+    def crop(self, path_or_array):
+        inputs.append(path_or_array)
+        return np.full((2, 2, 3), 255, dtype=np.uint8)
+
+    monkeypatch.setattr(Cropper, "crop", crop)
+    status = crop_file_to_output(str(source), str(tmp_path / "out.jpg"))
+
+    # Cropper opens the file itself, so it can decode only what the crop needs.
+    assert status == 0
+    assert inputs == [str(source)]
+
+
+@mock.patch("autocrop.cli.crop_file_to_output")
+def test_cli_no_preserve_metadata(mock_crop):
+    mock_crop.return_value = 0
+    sys.argv = ["autocrop", "tests/data/obama.jpg", "--no-preserve-metadata"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 0
+    _, kwargs = mock_crop.call_args
+    assert kwargs["preserve_metadata"] is False
+
+
+class CornerFaceDetector:
+    def detect(self, image):
+        return np.array([[0, 0, 2, 2]])
+
+
 def test_output_removes_exif_orientation(tmp_path):
     source = tmp_path / "source.jpg"
     destination = tmp_path / "destination.jpg"
@@ -221,6 +338,125 @@ def test_cli_short_version_exits(capsys):
     assert captured.err == ""
 
 
+def loaded_image_libraries(code):
+    """Return the image libraries a fresh interpreter has imported after code."""
+    check = (
+        "import sys\n"
+        "try:\n"
+        f"    exec({code!r})\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print(sorted(m for m in ('cv2', 'numpy', 'PIL') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", check], capture_output=True, text=True, check=True
+    )
+    return result.stdout.splitlines()[-1]
+
+
+def test_import_does_not_load_image_libraries():
+    assert loaded_image_libraries("import autocrop") == "[]"
+
+
+@pytest.mark.parametrize(
+    "argv", [["-V"], ["--help"], ["serve", "--help"], ["video", "--help"]]
+)
+def test_cli_parses_arguments_before_loading_image_libraries(argv):
+    code = (
+        f"import sys; sys.argv = ['autocrop'] + {argv!r}; "
+        "import autocrop; autocrop.command_line_interface()"
+    )
+    assert loaded_image_libraries(code) == "[]"
+
+
+@pytest.mark.parametrize("mode", ["serve", "video"])
+def test_cli_first_argument_selects_mode(mode, capsys):
+    sys.argv = ["autocrop", mode, "--help"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 0
+    assert capsys.readouterr().out.startswith(f"usage: autocrop {mode} ")
+
+
+@pytest.mark.parametrize("mode", ["serve", "video"])
+def test_cli_crops_directory_named_like_a_mode(mode, tmp_path, monkeypatch, capsys):
+    (tmp_path / mode).mkdir()
+    shutil.copy("tests/data/obama.jpg", tmp_path / mode / "obama.jpg")
+    monkeypatch.chdir(tmp_path)
+    sys.argv = ["autocrop", os.path.join(".", mode), "-o", "cropped"]
+
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+
+    assert e.value.code == 0
+    assert "Batch: 1 cropped, 0 failed" in capsys.readouterr().err
+    with Image.open(tmp_path / "cropped" / "obama.jpg") as result:
+        assert result.size == (500, 500)
+
+
+def test_package_attributes_load_lazily():
+    import autocrop
+    import autocrop.autocrop
+
+    assert autocrop.Cropper is autocrop.autocrop.Cropper
+    assert autocrop.command_line_interface is command_line_interface
+    assert {"Cropper", "command_line_interface"} <= set(dir(autocrop))
+    with pytest.raises(AttributeError):
+        autocrop.not_an_attribute
+
+
+def group_photo(path):
+    with Image.open("tests/data/smith.jpg") as left, Image.open("tests/data/obama.jpg") as right:
+        group = Image.new("RGB", (left.width + right.width, max(left.height, right.height)))
+        group.paste(left, (0, 0))
+        group.paste(right, (left.width, 0))
+    group.save(path)
+
+
+def test_face_output_filename():
+    assert face_output_filename("out/group.jpg", 0) == "out/group_face_0.jpg"
+    assert face_output_filename("group.tar.png", 12) == "group.tar_face_12.png"
+
+
+def test_cli_all_faces_writes_every_face(tmp_path):
+    source = tmp_path / "group.jpg"
+    group_photo(source)
+    sys.argv = ["autocrop", str(source), "-o", str(tmp_path / "faces"), "--all-faces", "-w", "64", "-H", "64"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 0
+    assert sorted(os.listdir(tmp_path / "faces")) == ["group_face_0.jpg", "group_face_1.jpg"]
+    with Image.open(tmp_path / "faces" / "group_face_1.jpg") as face:
+        assert face.size == (64, 64)
+
+
+def test_cli_all_faces_min_face_size(tmp_path):
+    source = tmp_path / "group.jpg"
+    group_photo(source)
+    output_path = tmp_path / "out.png"
+    sys.argv = ["autocrop", str(source), "-o", str(output_path), "--all-faces", "--min-face-size", "150"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 0
+    assert sorted(os.listdir(tmp_path)) == ["group.jpg", "out_face_0.png"]
+
+
+def test_cli_all_faces_requires_output(capsys):
+    sys.argv = ["autocrop", "tests/data/obama.jpg", "--all-faces"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 2
+    assert "--all-faces requires --output" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("flags", [["--min-score", "0.5"], ["--min-face-size", "10"]])
+def test_cli_face_filters_require_all_faces(flags):
+    sys.argv = ["autocrop", "tests/data/obama.jpg", "-o", "out.jpg", *flags]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 2
+
+
 @pytest.mark.parametrize("flag", ["--verbose", "-v"])
 @mock.patch("autocrop.cli.crop_file_to_output")
 def test_cli_verbose_is_passed_to_file_mode(mock_crop, flag):
@@ -476,3 +712,340 @@ def test_crop_stdin_to_stdout_writes_invalid_input_to_stderr(capsys):
     assert stdout.getvalue() == b""
     assert captured.out == ""
     assert "Could not read image from stdin" in captured.err
+
+
+def batch_sources(tmp_path):
+    source_dir = tmp_path / "portraits"
+    (source_dir / "nested").mkdir(parents=True)
+    Image.new("RGB", (40, 40), "white").save(source_dir / "a.jpg")
+    Image.new("RGB", (40, 40), "white").save(source_dir / "nested" / "b.png")
+    (source_dir / "notes.txt").write_text("not an image")
+    return source_dir
+
+
+def test_cli_batch_mode_crops_directory_into_output_dir(monkeypatch, tmp_path, capsys):
+    source_dir = batch_sources(tmp_path)
+    output_dir = tmp_path / "cropped"
+    monkeypatch.setattr(
+        Cropper, "crop", lambda *args: np.array(Image.new("RGB", (20, 20), "white"))
+    )
+    sys.argv = ["autocrop", str(source_dir), "-o", str(output_dir)]
+
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+
+    captured = capsys.readouterr()
+    assert e.value.code == 0
+    for name in ["a.jpg", os.path.join("nested", "b.png")]:
+        with Image.open(output_dir / name) as result:
+            assert result.size == (20, 20)
+        assert f"-> {output_dir / name}" in captured.err
+    assert "Batch: 2 cropped, 0 failed" in captured.err
+    assert captured.out == ""
+
+
+def test_cli_batch_mode_reports_failures_per_file(monkeypatch, tmp_path, capsys):
+    output_dir = tmp_path / "cropped"
+    monkeypatch.setattr(Cropper, "crop", lambda *args: None)
+    sys.argv = [
+        "autocrop",
+        "tests/data/obama.jpg",
+        "tests/data/noise.png",
+        "-o",
+        str(output_dir),
+    ]
+
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+
+    captured = capsys.readouterr()
+    assert e.value.code == 1
+    assert "No face detected:" in captured.err
+    assert "obama.jpg" in captured.err
+    assert "noise.png" in captured.err
+    assert "Batch: 0 cropped, 2 failed" in captured.err
+
+
+def test_cli_batch_mode_skips_output_dir_inside_source(monkeypatch, tmp_path, capsys):
+    source_dir = batch_sources(tmp_path)
+    output_dir = source_dir / "cropped"
+    output_dir.mkdir()
+    Image.new("RGB", (20, 20)).save(output_dir / "old.jpg")
+    monkeypatch.setattr(
+        Cropper, "crop", lambda *args: np.array(Image.new("RGB", (20, 20), "white"))
+    )
+    sys.argv = ["autocrop", str(source_dir), "-o", str(output_dir)]
+
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+
+    assert e.value.code == 0
+    assert "Batch: 2 cropped, 0 failed" in capsys.readouterr().err
+    assert not (output_dir / "cropped").exists()
+
+
+@pytest.mark.parametrize("jobs", ["1", pytest.param("2", marks=pytest.mark.slow)])
+def test_cli_batch_mode_fails_duplicate_output_names(tmp_path, capsys, jobs):
+    for name in "ab":
+        (tmp_path / name).mkdir()
+        shutil.copy("tests/data/obama.jpg", tmp_path / name / "x.jpg")
+    output_dir = tmp_path / "merged"
+    sys.argv = [
+        "autocrop",
+        str(tmp_path / "a" / "x.jpg"),
+        str(tmp_path / "b" / "x.jpg"),
+        "-o",
+        str(output_dir),
+        "--jobs",
+        jobs,
+    ]
+
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+
+    captured = capsys.readouterr()
+    assert e.value.code == 1
+    assert (
+        f"Could not crop {tmp_path / 'b' / 'x.jpg'}: Inputs "
+        f"{tmp_path / 'a' / 'x.jpg'} and {tmp_path / 'b' / 'x.jpg'} "
+        "would both be written to x.jpg"
+    ) in captured.err
+    assert "Batch: 1 cropped, 1 failed" in captured.err
+    with Image.open(output_dir / "x.jpg") as result:
+        assert result.size == (500, 500)
+
+
+def test_map_bounded_submits_a_window_of_items_at_a_time():
+    pulled = []
+
+    def items():
+        for item in range(10):
+            pulled.append(item)
+            yield item
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = map_bounded(executor, lambda item: item * 2, items(), 3)
+        assert next(results) == 0
+        assert pulled == [0, 1, 2]
+        assert list(results) == [item * 2 for item in range(1, 10)]
+
+
+def test_cli_batch_mode_requires_output_directory(capsys):
+    sys.argv = ["autocrop", "tests/data/obama.jpg", "tests/data/noise.png"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 2
+    assert "output directory is required" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("value", ["0", "-2", "many"])
+def test_cli_jobs_must_be_positive(value):
+    sys.argv = ["autocrop", "tests/data/obama.jpg", "--jobs", value]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 2
+
+
+@pytest.mark.slow
+def test_cli_batch_mode_with_worker_processes(tmp_path, capsys):
+    output_dir = tmp_path / "cropped"
+    sys.argv = [
+        "autocrop",
+        "tests/data/obama.jpg",
+        "tests/data/noise.png",
+        "-o",
+        str(output_dir),
+        "--jobs",
+        "2",
+    ]
+
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+
+    captured = capsys.readouterr()
+    assert e.value.code == 1
+    with Image.open(output_dir / "obama.jpg") as result:
+        assert result.size == (500, 500)
+    assert not (output_dir / "noise.png").exists()
+    assert "Batch: 1 cropped, 1 failed" in captured.err
+
+
+@mock.patch("autocrop.cli.crop_file_to_output")
+def test_cli_detect_max_side_configures_cropper(mock_crop):
+    mock_crop.return_value = 0
+    sys.argv = ["autocrop", "tests/data/obama.jpg", "--detect-max-side", "320"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 0
+    _, kwargs = mock_crop.call_args
+    assert kwargs["cropper"].detect_max_side == 320
+
+
+@mock.patch("autocrop.cli.crop_file_to_output")
+def test_cli_resize_backend_configures_cropper(mock_crop):
+    mock_crop.return_value = 0
+    sys.argv = ["autocrop", "tests/data/obama.jpg", "--resize-backend", "cv2-area"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 0
+    _, kwargs = mock_crop.call_args
+    assert kwargs["cropper"].resize_backend == "cv2-area"
+
+
+def stream_cropper():
+    return Cropper(width=8, height=8, face_percent=100, face_detector=TopLeftFaceDetector(size=8))
+
+
+def frame(data):
+    return struct.pack(">I", len(data)) + data
+
+
+def read_frames_from(data):
+    stream = io.BytesIO(data)
+    frames = []
+    while header := stream.read(4):
+        frames.append(stream.read(struct.unpack(">I", header)[0]))
+    return frames
+
+
+def test_crop_stream_frames_answers_every_frame(capsys):
+    stdin = io.BytesIO(
+        frame(encoded("white", "JPEG")) + frame(encoded("black")) + frame(b"garbage")
+    )
+    stdout = io.BytesIO()
+
+    status = crop_stream("frames", stdin=stdin, stdout=stdout, cropper=stream_cropper())
+
+    assert status == 0
+    frames = read_frames_from(stdout.getvalue())
+    assert len(frames) == 3
+    with Image.open(io.BytesIO(frames[0])) as result:
+        assert result.format == "JPEG"
+        assert result.size == (8, 8)
+    assert frames[1] == b"" and frames[2] == b""
+    statuses = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert [s["status"] for s in statuses] == ["ok", "no_face", "error"]
+    assert statuses[0]["format"] == "JPEG"
+    assert statuses[0]["bytes"] == len(frames[0])
+
+
+def test_crop_stream_frames_reports_truncated_input(capsys):
+    stdin = io.BytesIO(frame(encoded("white"))[:-3])
+    status = crop_stream("frames", stdin=stdin, stdout=io.BytesIO(), cropper=stream_cropper())
+    assert status == 1
+    assert "Truncated frame" in capsys.readouterr().err
+
+
+def test_crop_stream_paths_writes_crops_and_json_status(tmp_path):
+    face = tmp_path / "face.png"
+    face.write_bytes(encoded("white"))
+    no_face = tmp_path / "dark.png"
+    no_face.write_bytes(encoded("black"))
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    stdin = io.BytesIO(b"\0".join(os.fsencode(p) for p in [face, no_face, "missing.png"]))
+    stdout = io.StringIO()
+
+    status = crop_stream(
+        "paths", stdin=stdin, stdout=stdout, output_dir=str(output_dir), cropper=stream_cropper()
+    )
+
+    assert status == 0
+    statuses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [s["status"] for s in statuses] == ["ok", "no_face", "error"]
+    assert statuses[0]["input"] == str(face)
+    assert statuses[0]["output"] == str(output_dir / "face.png")
+    with Image.open(output_dir / "face.png") as result:
+        assert result.size == (8, 8)
+
+
+def test_crop_stream_paths_reports_clashing_output_names(tmp_path):
+    inputs = []
+    for directory, color in [("a", "white"), ("b", "gray")]:
+        (tmp_path / directory).mkdir()
+        inputs.append(tmp_path / directory / "x.png")
+        inputs[-1].write_bytes(encoded(color))
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    stdin = io.BytesIO(b"\0".join(os.fsencode(p) for p in inputs))
+    stdout = io.StringIO()
+
+    status = crop_stream(
+        "paths", stdin=stdin, stdout=stdout, output_dir=str(output_dir), cropper=stream_cropper()
+    )
+
+    assert status == 0
+    statuses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [s["status"] for s in statuses] == ["ok", "error"]
+    assert "would both be written to x.png" in statuses[1]["error"]
+    assert "output" not in statuses[1]
+    with Image.open(output_dir / "x.png") as result:
+        assert result.getpixel((0, 0)) == (255, 255, 255)
+
+
+def test_read_nul_delimited_yields_paths_as_they_arrive():
+    class ChunkedStream:
+        def __init__(self, chunks):
+            self.chunks = list(chunks)
+
+        def read1(self, size):
+            return self.chunks.pop(0) if self.chunks else b""
+
+        read = read1
+
+    stream = ChunkedStream([b"a.jpg\0b", b".png\0", b"c.gif"])
+    assert list(read_nul_delimited(stream)) == ["a.jpg", "b.png", "c.gif"]
+
+
+@mock.patch("autocrop.cli.crop_stream")
+def test_cli_stream_mode_uses_one_cropper(mock_stream):
+    mock_stream.return_value = 0
+    sys.argv = ["autocrop", "--stream", "frames", "-w", "200"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 0
+    args, kwargs = mock_stream.call_args
+    assert args == ("frames",)
+    assert kwargs["cropper"].width == 200
+
+
+def test_cli_stream_paths_requires_output_directory(capsys):
+    sys.argv = ["autocrop", "--stream", "paths"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 2
+    assert "output directory is required" in capsys.readouterr().err
+
+
+def test_cli_stream_rejects_input_files(capsys):
+    sys.argv = ["autocrop", "--stream", "frames", "tests/data/obama.jpg"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 2
+    assert "--stream" in capsys.readouterr().err
+
+
+@mock.patch("autocrop.cli.crop_file_to_output")
+def test_cli_detect_tile_size_configures_cropper(mock_crop):
+    mock_crop.return_value = 0
+    sys.argv = ["autocrop", "tests/data/obama.jpg", "--detect-tile-size", "1024"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 0
+    _, kwargs = mock_crop.call_args
+    assert kwargs["cropper"].detect_tile_size == 1024
+    assert kwargs["cropper"].detect_tile_overlap == 256
+
+
+@mock.patch("autocrop.cli.crop_file_to_output")
+def test_cli_detect_strategy_configures_cropper(mock_crop):
+    from autocrop.yunet import CoarseToFineDetector
+
+    mock_crop.return_value = 0
+    sys.argv = ["autocrop", "tests/data/obama.jpg", "--detect-strategy", "coarse-to-fine"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 0
+    _, kwargs = mock_crop.call_args
+    assert kwargs["cropper"].detect_strategy == "coarse-to-fine"
+    assert isinstance(kwargs["cropper"].face_detector, CoarseToFineDetector)
@@ -0,0 +1,145 @@
+"""Tests for memory-mapped .npy and PPM/PGM inputs"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from autocrop.autocrop import Cropper
+from autocrop.mapped import map_file, map_netpbm
+
+from .helpers import CentreFaceDetector, traced_peak
+
+
+def noise(height, width, channels=3, seed=0):
+    shape = (height, width, channels) if channels else (height, width)
+    return np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+
+
+def cropper(**kwargs):
+    return Cropper(width=64, height=64, face_detector=CentreFaceDetector(), **kwargs)
+
+
+def test_map_netpbm_reads_header_with_comments(tmp_path):
+    path = tmp_path / "frame.ppm"
+    pixels = noise(5, 7)
+    path.write_bytes(b"P6\n# written by a camera\n7 5\n255\n" + pixels.tobytes())
+
+    mapped = map_netpbm(path)
+
+    assert isinstance(mapped, np.memmap)
+    assert not mapped.flags.writeable
+    np.testing.assert_array_equal(mapped, pixels)
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        b"P3\n2 2\n255\n",
+        b"P4\n2 2\n",
+        b"P6\n2 2\n65535\n",
+        b"P6\n2 2\n15\n",
+        b"not an image",
+    ],
+)
+def test_map_netpbm_leaves_other_variants_to_pillow(tmp_path, header):
+    path = tmp_path / "frame.ppm"
+    path.write_bytes(header + bytes(32))
+    assert map_netpbm(path) is None
+
+
+def test_map_file_rejects_non_image_arrays(tmp_path):
+    path = tmp_path / "vector.npy"
+    np.save(path, np.zeros(10))
+    with pytest.raises(ValueError):
+        map_file(path)
+
+
+def test_low_maxval_netpbm_crop_matches_pillow_decode(tmp_path):
+    path = tmp_path / "frame.pgm"
+    path.write_bytes(b"P5\n200 200\n15\n" + (noise(200, 200, channels=0) >> 4).tobytes())
+
+    with Image.open(path) as img:
+        expected = cropper().crop(np.array(img))
+    np.testing.assert_array_equal(cropper().crop(str(path)), expected)
+
+
+@pytest.mark.parametrize(
+    "name, data",
+    [
+        ("frame.ppm", b"P6\n200 200\n255\n" + bytes(1000)),
+        ("image.npy", b"\x93NUMPY garbage"),
+    ],
+    ids=["ppm", "npy"],
+)
+def test_truncated_or_corrupt_mapped_files_raise_oserror(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    with pytest.raises(OSError):
+        cropper().crop(str(path))
+
+
+def test_truncated_npy_raises_oserror(tmp_path):
+    path = tmp_path / "image.npy"
+    np.save(path, noise(200, 200))
+    with open(path, "r+b") as f:
+        f.truncate(1000)
+    with pytest.raises(OSError):
+        map_file(path)
+
+
+def test_npy_crop_matches_array_crop(tmp_path):
+    path = tmp_path / "frame.npy"
+    image = noise(300, 400)
+    np.save(path, image)
+
+    np.testing.assert_array_equal(cropper().crop(path), cropper().crop(image))
+
+
+@pytest.mark.parametrize("name, channels", [("frame.ppm", 3), ("frame.pgm", None)])
+def test_netpbm_crop_matches_pillow_decode(tmp_path, name, channels):
+    path = tmp_path / name
+    Image.fromarray(noise(300, 400, channels)).save(path)
+
+    mapped = cropper().crop(str(path))
+    decoded = cropper().crop(path.read_bytes())
+
+    np.testing.assert_array_equal(mapped, decoded)
+
+
+def test_mapped_crop_never_writes_to_the_file(tmp_path):
+    path = tmp_path / "frame.npy"
+    image = noise(100, 100)
+    np.save(path, image)
+
+    cropper(resize=False, channel_order="rgb").crop(path)
+
+    np.testing.assert_array_equal(np.load(path), image)
+
+
+def test_mapped_detection_uses_strided_view(tmp_path):
+    path = tmp_path / "frame.npy"
+    np.save(path, noise(1000, 800))
+    c = cropper(detect_max_side=100)
+
+    c.crop(path)
+
+    (detected,) = c.face_detector.images
+    assert detected.shape == (100, 80, 3)
+
+
+def test_mapped_crop_memory_is_close_to_output_size(tmp_path):
+    path = tmp_path / "frame.npy"
+    image = noise(3000, 4000)
+    np.save(path, image)
+    ppm_path = tmp_path / "frame.ppm"
+    Image.fromarray(image).save(ppm_path)
+
+    (crop, npy_peak) = traced_peak(lambda: cropper(detect_max_side=400).crop(path))
+    (_, ppm_peak) = traced_peak(lambda: cropper(detect_max_side=400).crop(str(ppm_path)))
+    (_, loaded_peak) = traced_peak(lambda: cropper(detect_max_side=400).crop(np.load(path)))
+
+    assert crop.shape == (64, 64, 3)
+    assert loaded_peak >= image.nbytes
+    # The detection proxy is 400 x 300 pixels, the crop rectangle 800 x 800.
+    assert npy_peak < image.nbytes / 10
+    assert ppm_peak < image.nbytes / 10
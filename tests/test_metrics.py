@@ -0,0 +1,153 @@
+"""Tests for per-crop metrics"""
+
+import json
+import os
+import pickle
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from autocrop import command_line_interface
+from autocrop.autocrop import Cropper
+from autocrop.cache import DetectionCache
+from autocrop.cli import MetricsRecorder
+from autocrop.metrics import CropMetrics
+
+from .helpers import TopLeftFaceDetector
+
+
+def recording_cropper(**kwargs):
+    recorded = []
+    cropper = Cropper(
+        width=4,
+        height=4,
+        face_percent=100,
+        face_detector=TopLeftFaceDetector(),
+        metrics_callback=recorded.append,
+        **kwargs,
+    )
+    return cropper, recorded
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / "face.png"
+    Image.fromarray(np.full((16, 12, 3), 200, dtype=np.uint8)).save(path)
+    return str(path)
+
+
+def test_crop_reports_stage_timings_and_faces(image_path):
+    cropper, recorded = recording_cropper()
+    cropper.crop(image_path)
+
+    (metrics,) = recorded
+    assert metrics.source == image_path
+    assert metrics.image_size == (12, 16)
+    assert metrics.faces == 1
+    assert metrics.cache_hit is False
+    assert set(metrics.timings) == {"decode", "color", "detect", "geometry", "resize"}
+    assert all(seconds >= 0 for seconds in metrics.timings.values())
+    assert metrics.total == pytest.approx(sum(metrics.timings.values()))
+
+
+def test_crop_without_face_reports_metrics():
+    cropper, recorded = recording_cropper()
+    assert cropper.crop(np.zeros((8, 8, 3), dtype=np.uint8)) is None
+
+    (metrics,) = recorded
+    assert metrics.source is None
+    assert metrics.faces == 0
+    assert "resize" not in metrics.timings
+
+
+def test_cache_hits_skip_detection_timing(image_path):
+    cropper, recorded = recording_cropper(detection_cache=DetectionCache())
+    cropper.crop(image_path)
+    cropper.crop(image_path)
+
+    assert [m.cache_hit for m in recorded] == [False, True]
+    assert "detect" in recorded[0].timings
+    assert "detect" not in recorded[1].timings
+    assert recorded[1].faces == 1
+
+
+def test_no_metrics_without_callback(image_path):
+    cropper = Cropper(width=4, height=4, face_detector=TopLeftFaceDetector())
+    assert cropper._load(image_path).metrics is None
+
+
+def test_crop_many_reports_encode_timings():
+    cropper, recorded = recording_cropper()
+    items = [np.full((8, 8, 3), value, dtype=np.uint8) for value in (0, 50, 100)]
+    results = list(cropper.crop_many(items, workers=2, encode="PNG"))
+
+    assert len(recorded) == 3
+    assert [result.metrics.faces for result in results] == [0, 1, 1]
+    assert "encode" not in results[0].metrics.timings
+    assert "encode" in results[1].metrics.timings
+    assert {id(result.metrics) for result in results} == {id(m) for m in recorded}
+
+
+def test_metrics_as_dict_orders_stages_in_milliseconds():
+    metrics = CropMetrics("a.jpg")
+    metrics.add("write", 0.003)
+    metrics.add("detect", 0.002)
+    metrics.add("decode", 0.001)
+    metrics.add("decode", 0.001)
+
+    record = metrics.as_dict()
+    assert list(record["timings_ms"]) == ["decode", "detect", "write"]
+    assert record["timings_ms"]["decode"] == pytest.approx(2.0)
+    assert record["total_ms"] == pytest.approx(7.0)
+    json.dumps(record)
+
+
+def test_metrics_recorder_is_per_thread_and_picklable():
+    recorder = MetricsRecorder()
+    metrics = CropMetrics()
+    recorder(metrics)
+    assert recorder.take() is metrics
+    assert recorder.take() is None
+    assert isinstance(pickle.loads(pickle.dumps(recorder)), MetricsRecorder)
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_cli_metrics_json_single_file(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    output_path = tmp_path / "out.jpg"
+    sys.argv = [
+        "autocrop", "tests/data/obama.jpg", "-o", str(output_path), "--metrics-json", str(path)
+    ]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 0
+
+    (record,) = read_records(path)
+    assert record["status"] == "ok"
+    assert record["input"].endswith("obama.jpg")
+    assert record["output"] == str(output_path)
+    assert record["faces"] >= 1
+    assert {"read", "decode", "detect", "resize", "write"} <= set(record["timings_ms"])
+
+
+def test_cli_metrics_json_batch(tmp_path):
+    source = tmp_path / "in"
+    source.mkdir()
+    Image.open("tests/data/obama.jpg").save(source / "face.jpg")
+    Image.fromarray(np.zeros((64, 64, 3), dtype=np.uint8)).save(source / "black.png")
+    path = tmp_path / "metrics.jsonl"
+    sys.argv = [
+        "autocrop", str(source), "-o", str(tmp_path / "out"), "--metrics-json", str(path)
+    ]
+    with pytest.raises(SystemExit):
+        command_line_interface()
+
+    records = {os.path.basename(record["input"]): record for record in read_records(path)}
+    assert records["face.jpg"]["status"] == "ok"
+    assert records["black.png"]["status"] == "no_face"
+    assert records["black.png"]["faces"] == 0
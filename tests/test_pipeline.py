@@ -0,0 +1,144 @@
+"""Tests for the crop_many pipeline"""
+
+import io
+import itertools
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from autocrop.autocrop import Cropper
+from autocrop.pipeline import CropResult
+
+from .helpers import TopLeftFaceDetector, gray, mock_cropper
+
+
+def test_crop_many_streams_results_in_input_order(tmp_path):
+    image_path = tmp_path / "face.png"
+    Image.fromarray(gray(200)).save(image_path)
+    items = [gray(10), str(image_path), gray(0), "missing.png", gray(30)]
+
+    results = list(mock_cropper().crop_many(items, workers=3))
+
+    assert [result.index for result in results] == [0, 1, 2, 3, 4]
+    assert all(isinstance(result, CropResult) for result in results)
+    assert [result.source is item for result, item in zip(results, items)] == [True] * 5
+    np.testing.assert_array_equal(results[0].image, gray(10)[:4, :4])
+    np.testing.assert_array_equal(results[1].image, gray(200)[:4, :4])
+    assert results[2].image is None and results[2].error is None
+    assert isinstance(results[3].error, FileNotFoundError)
+    assert results[3].image is None
+    assert results[4].error is None
+
+
+def test_crop_many_unordered_yields_every_item():
+    items = [gray(value) for value in range(1, 40)]
+    results = list(mock_cropper().crop_many(items, workers=4, ordered=False))
+    assert sorted(result.index for result in results) == list(range(39))
+    for result in results:
+        assert result.image[0, 0, 0] == result.index + 1
+
+
+def test_crop_many_matches_crop():
+    cropper = mock_cropper()
+    items = [gray(value) for value in (5, 0, 50)]
+    for result, item in zip(cropper.crop_many(items), items):
+        expected = cropper.crop(item)
+        if expected is None:
+            assert result.image is None
+        else:
+            np.testing.assert_array_equal(result.image, expected)
+
+
+def test_crop_many_encodes_results():
+    result = next(mock_cropper().crop_many([gray(90)], encode="PNG"))
+    with Image.open(io.BytesIO(result.data)) as img:
+        assert img.format == "PNG"
+        assert img.size == (4, 4)
+
+
+def test_crop_many_pulls_items_lazily():
+    pulled = []
+
+    def endless():
+        for value in itertools.count(1):
+            pulled.append(value)
+            yield gray(value % 255 or 1)
+
+    results = mock_cropper().crop_many(endless(), workers=2)
+    first = list(itertools.islice(results, 5))
+    results.close()
+
+    assert [result.index for result in first] == [0, 1, 2, 3, 4]
+    # Only a bounded number of items are in flight ahead of the consumer.
+    assert len(pulled) < 50
+
+
+def test_crop_many_bounds_items_waiting_behind_a_slow_item():
+    pulled = []
+
+    class SlowFirstCropper(Cropper):
+        def _load(self, source):
+            if source[0, 0, 0] == 1:
+                time.sleep(0.5)
+            return super()._load(source)
+
+    def endless():
+        for value in itertools.count(1):
+            pulled.append(value)
+            yield gray(value % 255 or 2)
+
+    cropper = SlowFirstCropper(width=4, height=4, face_percent=100, face_detector=TopLeftFaceDetector())
+    results = cropper.crop_many(endless(), workers=2)
+    assert next(results).index == 0
+    results.close()
+
+    # Later items finish while the first decodes, but only a bounded number
+    # are fed while they wait to be yielded in order.
+    assert len(pulled) < 30
+
+
+def test_crop_many_reraises_input_iterable_errors():
+    def broken():
+        yield gray(20)
+        raise RuntimeError("listing failed")
+
+    results = mock_cropper().crop_many(broken())
+    assert next(results).index == 0
+    with pytest.raises(RuntimeError, match="listing failed"):
+        next(results)
+
+
+def test_crop_many_rejects_invalid_worker_count():
+    with pytest.raises(ValueError):
+        next(mock_cropper().crop_many([gray(1)], workers=0))
+
+
+@pytest.mark.slow
+def test_crop_many_matches_crop_with_yunet():
+    cropper = Cropper(detect_max_side=640)
+    paths = [f"tests/data/{name}" for name in ["obama.jpg", "noise.png", "kwong.png"]]
+    results = list(cropper.crop_many(paths, workers=2))
+    for result, path in zip(results, paths):
+        expected = cropper.crop(path)
+        assert result.error is None
+        if expected is None:
+            assert result.image is None
+        else:
+            np.testing.assert_array_equal(result.image, expected)
+
+
+def test_crop_many_encode_callable_follows_input_format():
+    buffer = io.BytesIO()
+    Image.fromarray(gray(120)).save(buffer, format="BMP")
+    items = [buffer.getvalue(), gray(60)]
+
+    results = list(
+        mock_cropper().crop_many(items, encode=lambda source_format: source_format or "PNG")
+    )
+
+    assert [result.format for result in results] == ["BMP", "PNG"]
+    for result in results:
+        with Image.open(io.BytesIO(result.data)) as img:
+            assert img.format == result.format
@@ -0,0 +1,184 @@
+"""Tests for reduced-resolution and region decoding"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from autocrop.autocrop import Cropper, decode_file, decode_region, open_file_reduced
+from autocrop.regions import decode_window, jpeg2000_levels
+
+from .helpers import CentreFaceDetector, traced_peak
+
+
+class CountingFile(io.FileIO):
+    """Binary file counting the bytes read from it."""
+
+    bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def gradient(width, height):
+    x = np.linspace(0, 255, width, dtype=np.uint8)
+    y = np.linspace(0, 255, height, dtype=np.uint8)
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[..., 0] = x
+    image[..., 1] = y[:, None]
+    image[..., 2] = 128
+    return image
+
+
+def save_pyramid(path, image, levels=3):
+    base = Image.fromarray(image)
+    pages = [
+        base.resize((base.width >> level, base.height >> level), Image.BOX)
+        for level in range(1, levels + 1)
+    ]
+    base.save(path, save_all=True, append_images=pages)
+
+
+def test_jpeg2000_decodes_at_reduced_resolution(tmp_path):
+    path = tmp_path / "master.jp2"
+    Image.fromarray(gradient(2048, 1536)).save(path, num_resolutions=4)
+
+    with open(path, "rb") as f:
+        assert jpeg2000_levels(f) == 3
+    image, full_shape = open_file_reduced(str(path), 200)
+
+    assert full_shape == (1536, 2048)
+    assert image.shape == (192, 256, 3)
+
+
+def test_jpeg2000_reduction_stops_at_codestream_levels(tmp_path):
+    path = tmp_path / "shallow.j2k"
+    Image.fromarray(gradient(1024, 768)).save(path, num_resolutions=2)
+
+    image, _ = open_file_reduced(str(path), 100)
+
+    assert image.shape == (384, 512, 3)
+
+
+def test_tiff_pyramid_decodes_smallest_sufficient_page(tmp_path):
+    path = tmp_path / "pyramid.tif"
+    save_pyramid(path, gradient(1600, 1200))
+
+    image, full_shape, image_format = decode_file(str(path), 300)
+
+    assert image_format == "TIFF"
+    assert full_shape == (1200, 1600)
+    assert image.shape == (300, 400, 3)
+
+
+def test_decode_window_reads_only_rows_of_the_box(tmp_path):
+    path = tmp_path / "raw.tif"
+    full = gradient(1200, 900)
+    Image.fromarray(full).save(path)
+    box = (300, 400, 500, 520)
+
+    with CountingFile(path) as f, Image.open(f) as img:
+        assert decode_window(img, box)
+        window = np.array(img)
+        window_bytes = f.bytes_read
+    with CountingFile(path) as f, Image.open(f) as img:
+        img.load()
+        full_bytes = f.bytes_read
+
+    np.testing.assert_array_equal(window, full[400:520, 300:500])
+    assert window_bytes < full_bytes * 0.2
+
+
+def test_decode_window_leaves_compressed_images_alone(tmp_path):
+    path = tmp_path / "compressed.png"
+    Image.fromarray(gradient(64, 64)).save(path)
+    with Image.open(path) as img:
+        assert not decode_window(img, (0, 0, 10, 10))
+        assert img.size == (64, 64)
+
+
+def test_decode_region_reads_less_and_peaks_lower_than_full_decode(tmp_path):
+    path = tmp_path / "pyramid.tif"
+    full = gradient(4000, 3000)
+    save_pyramid(path, full)
+    box = (1800, 1000, 2400, 1600)
+
+    with CountingFile(path) as f:
+        (image, level_shape, origin), region_peak = traced_peak(
+            lambda: decode_region(f, 4000, box)
+        )
+        region_bytes = f.bytes_read
+    with CountingFile(path) as f:
+        (full_image, _, _), full_peak = traced_peak(lambda: decode_file(f))
+        full_bytes = f.bytes_read
+
+    assert level_shape == (3000, 4000)
+    top, left = origin
+    assert top <= 1000 and left <= 1800
+    np.testing.assert_array_equal(
+        image[1000 - top : 1600 - top, 1800 - left : 2400 - left], full[1000:1600, 1800:2400]
+    )
+    assert region_bytes < full_bytes * 0.25
+    assert region_peak < full_peak * 0.1
+
+
+def test_decode_region_keeps_level_shape_of_window_at_top_left_corner(tmp_path):
+    path = tmp_path / "pyramid.tif"
+    full = gradient(4000, 3000)
+    save_pyramid(path, full)
+
+    image, level_shape, origin = decode_region(str(path), 4000, (0, 0, 400, 300))
+
+    assert origin == (0, 0)
+    assert level_shape == (3000, 4000)
+    assert image.shape[:2] < level_shape
+    np.testing.assert_array_equal(image[:300, :400], full[:300, :400])
+
+
+def test_decode_region_decodes_rotated_files_whole(tmp_path):
+    path = tmp_path / "rotated.tif"
+    exif = Image.Exif()
+    exif[274] = 6
+    Image.fromarray(gradient(200, 100)).save(path, exif=exif)
+
+    image, level_shape, origin = decode_region(str(path), 200, (10, 10, 20, 20))
+
+    assert image.shape[:2] == level_shape == (200, 100)
+    assert origin == (0, 0)
+
+
+@pytest.mark.parametrize("size", [(500, 500), (64, 64)])
+def test_region_crop_matches_full_decode_crop(tmp_path, size):
+    path = tmp_path / "pyramid.tif"
+    save_pyramid(path, gradient(3200, 2400))
+    options = dict(width=size[0], height=size[1], face_detector=CentreFaceDetector())
+
+    region = Cropper(detect_max_side=400, **options).crop(str(path))
+    full = Cropper(**options).crop(str(path))
+
+    assert region.shape == full.shape == (size[1], size[0], 3)
+    assert np.abs(region.astype(int) - full.astype(int)).mean() < 2
+
+
+class CornerFaceDetector:
+    """Finds a face in the top-left corner of every image."""
+
+    def detect(self, image):
+        height, width = image.shape[:2]
+        return np.array([[0, 0, width // 10, height // 10]])
+
+
+def test_region_crop_at_top_left_corner_matches_full_decode_crop(tmp_path):
+    path = tmp_path / "pyramid.tif"
+    # A square face keeps the crop box, and so the decode window, at (0, 0).
+    save_pyramid(path, gradient(3200, 3200))
+    options = dict(width=200, height=200, face_detector=CornerFaceDetector())
+
+    region = Cropper(detect_max_side=400, **options).crop(str(path))
+    full = Cropper(**options).crop(str(path))
+
+    assert region.shape == full.shape == (200, 200, 3)
+    assert np.abs(region.astype(int) - full.astype(int)).mean() < 2
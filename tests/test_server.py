@@ -0,0 +1,260 @@
+"""Tests for the crop server"""
+
+import http.client
+import io
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from autocrop import command_line_interface
+from autocrop.server import BatchingDetector, CropService, create_server, percentile
+
+from .helpers import TopLeftFaceDetector, encoded
+
+
+class SlowBatchDetector:
+    """Records the batch sizes it is called with."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def detect_batch(self, images):
+        time.sleep(0.05)
+        self.batch_sizes.append(len(images))
+        return [np.array([[i, 0, 1, 1]]) for i, _ in enumerate(images)]
+
+
+@pytest.fixture
+def service():
+    service = CropService(
+        width=8, height=8, face_percent=100, face_detector=TopLeftFaceDetector(size=8)
+    )
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def server(service):
+    server = create_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, body=None):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    try:
+        connection.request(method, path, body=body)
+        response = connection.getresponse()
+        return response.status, response.getheader("Content-Type"), response.read()
+    finally:
+        connection.close()
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([], 50) is None
+
+
+def test_post_crop_returns_image_in_input_format(server):
+    status, content_type, body = request(server, "POST", "/crop", encoded("white", "JPEG"))
+    assert status == 200
+    assert content_type == "image/jpeg"
+    with Image.open(io.BytesIO(body)) as result:
+        assert result.format == "JPEG"
+        assert result.size == (8, 8)
+
+
+def test_post_crop_honours_query_parameters(server):
+    status, content_type, body = request(
+        server, "POST", "/crop?width=4&height=6&face_percent=90&format=png", encoded("white", "JPEG")
+    )
+    assert status == 200
+    assert content_type == "image/png"
+    with Image.open(io.BytesIO(body)) as result:
+        assert result.size == (4, 6)
+
+
+def test_post_crop_falls_back_to_png_for_unwritable_input_formats(server):
+    # Pillow reads XPM but cannot write it.
+    xpm = b'/* XPM */\nstatic char *x[] = {\n"16 16 2 1",\n"  c #000000",\n". c #FFFFFF",\n'
+    xpm += b'"................",\n' * 16 + b"};\n"
+    status, content_type, body = request(server, "POST", "/crop", xpm)
+    assert status == 200
+    assert content_type == "image/png"
+    with Image.open(io.BytesIO(body)) as result:
+        assert result.format == "PNG"
+
+
+@pytest.mark.parametrize(
+    "path, body, expected_status",
+    [
+        ("/crop", encoded("black"), 422),
+        ("/crop", b"not an image", 400),
+        ("/crop?width=0", encoded("white"), 400),
+        ("/crop?width=abc", encoded("white"), 400),
+        ("/crop?width=200000&height=200000", encoded("white"), 400),
+        ("/crop?height=10001", encoded("white"), 400),
+        ("/crop?face_percent=101", encoded("white"), 400),
+        ("/crop?format=nope", encoded("white"), 400),
+        ("/crop?format=BUFR", encoded("white"), 400),
+        ("/crop?format=palm", encoded("white"), 400),
+        ("/elsewhere", encoded("white"), 404),
+    ],
+)
+def test_post_crop_errors_are_json(server, path, body, expected_status):
+    status, content_type, response = request(server, "POST", path, body)
+    assert status == expected_status
+    assert content_type == "application/json"
+    assert json.loads(response)["error"]
+
+
+def test_health_reports_counts_and_latency(server):
+    request(server, "POST", "/crop", encoded("white"))
+    request(server, "POST", "/crop", encoded("black"))
+
+    status, content_type, body = request(server, "GET", "/health")
+
+    assert status == 200
+    health = json.loads(body)
+    assert health["status"] == "ok"
+    assert health["requests"] == 2
+    assert health["statuses"] == {"200": 1, "422": 1}
+    assert health["latency_ms"]["window"] == 2
+    assert health["latency_ms"]["p50"] > 0
+    assert health["latency_ms"]["p99"] >= health["latency_ms"]["p50"]
+    assert health["detector"]["images"] == 2
+
+
+def test_keep_alive_connection_serves_several_requests(server):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    try:
+        for _ in range(3):
+            connection.request("POST", "/crop", body=encoded("white"))
+            response = connection.getresponse()
+            response.read()
+            assert response.status == 200
+    finally:
+        connection.close()
+
+
+def test_keep_alive_error_response_consumes_request_body(server):
+    # A raw socket, since http.client drops extra responses it has buffered.
+    smuggled = b"GET /smuggled HTTP/1.1\r\nHost: x\r\nContent-Length: 0\r\n\r\n"
+    with socket.create_connection(server.server_address[:2], timeout=10) as client:
+        client.sendall(
+            b"POST /wrong HTTP/1.1\r\nHost: x\r\nContent-Length: %d\r\n\r\n" % len(smuggled)
+            + smuggled
+            + b"GET /health HTTP/1.1\r\nHost: x\r\n\r\n"
+        )
+        received = b""
+        while b'"status": "ok"' not in received:
+            chunk = client.recv(65536)
+            assert chunk, received
+            received += chunk
+
+    assert received.count(b"HTTP/1.1 ") == 2
+    assert b"Not found: /wrong" in received
+    assert b"smuggled" not in received
+
+
+def test_service_reuses_croppers(service):
+    assert service.cropper(8, 8, 100) is service.cropper(8, 8, 100)
+    assert service.cropper(8, 8, 100) is not service.cropper(9, 8, 100)
+    assert service.cropper(8, 8, 100).face_detector is service.detector
+
+
+def test_batching_detector_coalesces_concurrent_calls():
+    detector = SlowBatchDetector()
+    batcher = BatchingDetector(detector, max_batch=4, max_wait=0.2)
+    results = [None] * 8
+
+    def call(i):
+        results[i] = batcher.detect(np.zeros((4, 4, 3), dtype=np.uint8))
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert sum(detector.batch_sizes) == 8
+    assert max(detector.batch_sizes) > 1
+    assert max(detector.batch_sizes) <= 4
+    assert batcher.batches == len(detector.batch_sizes)
+    assert all(result is not None for result in results)
+
+
+def test_batching_detector_reports_errors_per_call():
+    class FailingDetector:
+        def detect(self, image):
+            if image.any():
+                raise RuntimeError("boom")
+            return np.empty((0, 4), dtype=np.int32)
+
+    batcher = BatchingDetector(FailingDetector())
+    try:
+        assert len(batcher.detect(np.zeros((4, 4), dtype=np.uint8))) == 0
+        with pytest.raises(RuntimeError, match="boom"):
+            batcher.detect(np.ones((4, 4), dtype=np.uint8))
+    finally:
+        batcher.close()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets unavailable")
+def test_unix_socket_server(service):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "autocrop.sock")
+    server = create_server(service, unix_socket=path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(path)
+        connection = http.client.HTTPConnection("localhost", timeout=10)
+        connection.sock = client
+        connection.request("GET", "/health")
+        response = connection.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read())["status"] == "ok"
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(directory)
+    assert not os.path.exists(path)
+
+
+@mock.patch("autocrop.cli.run_serve_mode")
+def test_cli_serve_subcommand(mock_serve):
+    mock_serve.return_value = 0
+    sys.argv = ["autocrop", "serve", "--port", "0", "--max-batch", "4", "-w", "200"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 0
+    args = mock_serve.call_args.args[0]
+    assert (args.port, args.max_batch, args.width, args.max_wait_ms) == (0, 4, 200, 2.0)
+
+
+def test_cli_serve_rejects_invalid_port(capsys):
+    sys.argv = ["autocrop", "serve", "--port", "70000"]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 2
+    assert "Invalid port" in capsys.readouterr().err
@@ -0,0 +1,154 @@
+"""Tests for tiled face detection"""
+
+import tracemalloc
+
+import cv2
+import numpy as np
+import pytest
+
+from autocrop.autocrop import Cropper
+from autocrop.tiling import detect_tiled, merge_boxes, tile_starts, tile_windows
+
+
+class RecordingDetector:
+    """Finds a face in the top-left corner of every tile with a bright pixel."""
+
+    def __init__(self):
+        self.shapes = []
+
+    def detect(self, image):
+        self.shapes.append(image.shape)
+        if image.max() < 255:
+            return np.empty((0, 4), dtype=np.int32)
+        return np.array([[40, 40, 16, 16]])
+
+
+def test_tile_starts_cover_length_with_equal_windows():
+    assert tile_starts(100, 40, 30) == [0, 30, 60]
+    assert tile_starts(95, 40, 30) == [0, 30, 55]
+    assert tile_starts(30, 40, 30) == [0]
+
+
+def test_tile_windows_scale_to_image_pixels():
+    windows = list(tile_windows((300, 500), 100, 20, scale=0.5))
+    assert windows[0] == (0, 0, 200, 200)
+    assert {bottom - top for top, _, bottom, _ in windows} == {200}
+    assert max(right for _, _, _, right in windows) == 500
+    assert len(windows) == 2 * 3
+
+
+def test_merge_boxes_prefers_whole_faces_over_cut_ones():
+    boxes = np.array([[100, 100, 40, 60], [100, 100, 40, 30], [300, 0, 20, 20]], dtype=float)
+    scores = np.array([0.7, 0.9, 0.8])
+    cut = np.array([False, True, False])
+    assert list(merge_boxes(boxes, scores, cut)) == [2, 0]
+
+
+def test_merge_boxes_ranks_flagged_boxes_first():
+    boxes = np.array([[0, 0, 100, 100], [20, 20, 10, 10], [300, 0, 20, 20]], dtype=float)
+    scores = np.array([0.6, 0.9, 0.8])
+    first = np.array([True, False, False])
+    assert list(merge_boxes(boxes, scores, np.zeros(3, dtype=bool), first=first)) == [0, 2]
+
+
+def test_merge_boxes_ranks_by_area_without_scores():
+    boxes = np.array([[0, 0, 10, 10], [0, 0, 20, 20]], dtype=float)
+    assert list(merge_boxes(boxes, None, np.zeros(2, dtype=bool))) == [1]
+
+
+def test_detect_tiled_maps_boxes_to_image_coordinates():
+    image = np.zeros((400, 600, 3), dtype=np.uint8)
+    image[300, 450] = 255
+    detector = RecordingDetector()
+
+    boxes, scores = detect_tiled(image, lambda tile: (detector.detect(tile), None), 256, 64)
+
+    # One pass over the whole image shrunk to the tile size, then the tiles.
+    assert detector.shapes[0] == (171, 256, 3)
+    assert set(detector.shapes[1:]) == {(256, 256, 3)}
+    assert scores is None
+    assert [tuple(box) for box in boxes] == [(384, 184, 16, 16)]
+
+
+def test_cropper_tiles_only_large_images():
+    detector = RecordingDetector()
+    cropper = Cropper(face_detector=detector, detect_tile_size=128, detect_tile_overlap=32)
+
+    cropper._detect(np.zeros((100, 120, 3), dtype=np.uint8), image_is_bgr=True)
+    assert detector.shapes == [(100, 120, 3)]
+
+    detector.shapes.clear()
+    cropper._detect(np.zeros((300, 200, 3), dtype=np.uint8), image_is_bgr=True)
+    assert detector.shapes[0] == (128, 85, 3)
+    assert set(detector.shapes[1:]) == {(128, 128, 3)}
+    assert len(detector.shapes) == 1 + 3 * 2
+
+
+def test_cropper_tiles_at_detection_scale():
+    detector = RecordingDetector()
+    cropper = Cropper(face_detector=detector, detect_max_side=400, detect_tile_size=128)
+    cropper._detect(np.zeros((800, 400, 3), dtype=np.uint8), image_is_bgr=True)
+    assert set(detector.shapes[1:]) == {(128, 128, 3)}
+
+
+def test_invalid_tile_overlap():
+    with pytest.raises(ValueError):
+        Cropper(face_detector=RecordingDetector(), detect_tile_size=64, detect_tile_overlap=64)
+
+
+def face_canvas(shape, top, left):
+    face = cv2.imread("tests/data/obama.jpg")
+    canvas = np.full(shape, 90, dtype=np.uint8)
+    canvas[top:top + face.shape[0], left:left + face.shape[1]] = face
+    return canvas
+
+
+def test_tiled_detection_finds_face_across_tile_border():
+    image = face_canvas((1800, 2400, 3), 600, 900)
+    full, _ = Cropper()._detect_scored(image, True)
+    tiled, _ = Cropper(detect_tile_size=1024)._detect_scored(image, True)
+
+    assert len(tiled) == 1
+    np.testing.assert_allclose(tiled[0], full[0], atol=4)
+
+
+def test_tiled_detection_finds_face_larger_than_a_tile():
+    face = cv2.resize(cv2.imread("tests/data/obama.jpg"), None, fx=2, fy=2)
+    image = np.full((1600, 2000, 3), 90, dtype=np.uint8)
+    image[200:200 + face.shape[0], 600:600 + face.shape[1]] = face
+    full, _ = Cropper()._detect_scored(image, True)
+    tiled, _ = Cropper(detect_tile_size=320)._detect_scored(image, True)
+
+    assert len(full) == 1 and full[0][2] > 320
+    # The whole face comes from the overview pass, ahead of partial faces
+    # found by the tiles; small tile detections on the shirt may remain.
+    np.testing.assert_allclose(tiled[0], full[0], atol=full[0][2] * 0.1)
+    x, y, w, h = tiled[0]
+    others = tiled[1:]
+    overlapping = (
+        (others[:, 0] < x + w)
+        & (others[:, 0] + others[:, 2] > x)
+        & (others[:, 1] < y + h)
+        & (others[:, 1] + others[:, 3] > y)
+    )
+    assert not overlapping.any()
+
+
+def test_tiled_detection_memory_is_bounded_by_tile_size():
+    image = cv2.cvtColor(face_canvas((3000, 4000, 3), 1200, 2000), cv2.COLOR_BGR2RGB)
+    image_bytes = image.nbytes
+
+    def peak(cropper):
+        tracemalloc.start()
+        try:
+            faces, _ = cropper._detect_scored(image, image_is_bgr=False)
+            return tracemalloc.get_traced_memory()[1], faces
+        finally:
+            tracemalloc.stop()
+
+    full_peak, full = peak(Cropper())
+    tiled_peak, tiled = peak(Cropper(detect_tile_size=640))
+
+    assert full_peak >= image_bytes
+    assert tiled_peak < 4 * 640 * 640 * 3
+    assert len(tiled) == len(full) == 1
@@ -0,0 +1,166 @@
+"""Tests for video and frame-sequence cropping"""
+
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+from autocrop import command_line_interface
+from autocrop.autocrop import Cropper
+from autocrop.video import FrameWriter, crop_video, open_frames, smoothed_boxes, tracked_boxes
+
+FRAME_SHAPE = (48, 64, 3)
+
+
+class MovingFaceDetector:
+    """Finds a 16 px face whose left edge is the frame's first pixel value."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def detect(self, image):
+        self.calls += 1
+        x = int(image[0, 0, 0])
+        if x == 0:
+            return np.empty((0, 4), dtype=np.int32)
+        return np.array([[x, 16, 16, 16]])
+
+
+def frame(x):
+    image = np.full(FRAME_SHAPE, 128, dtype=np.uint8)
+    image[0, 0] = x
+    return image
+
+
+def video_cropper(detector=None):
+    return Cropper(width=24, height=24, face_percent=50, face_detector=detector or MovingFaceDetector())
+
+
+def write_frames(directory, xs):
+    os.makedirs(directory, exist_ok=True)
+    for i, x in enumerate(xs):
+        cv2.imwrite(os.path.join(directory, f"{i:03d}.png"), frame(x))
+    return str(directory)
+
+
+def test_tracked_boxes_interpolates_between_keyframes():
+    counts = {"keyframes": 0, "keyframes_with_faces": 0}
+    detected = []
+
+    def detect(image):
+        detected.append(image)
+        return np.array([float(image), 0, 10, 10])
+
+    pairs = list(tracked_boxes(iter([0, 1, 2, 3, 4, 5]), detect, 4, counts))
+
+    assert detected == [0, 4]
+    assert counts == {"keyframes": 2, "keyframes_with_faces": 2}
+    assert [item for item, _ in pairs] == [0, 1, 2, 3, 4, 5]
+    assert [box[0] for _, box in pairs] == [0, 1, 2, 3, 4, 4]
+
+
+def test_tracked_boxes_hold_last_face_through_misses():
+    counts = {"keyframes": 0, "keyframes_with_faces": 0}
+    boxes = {0: None, 2: np.array([8.0, 0, 4, 4]), 4: None}
+
+    pairs = list(tracked_boxes(iter(range(6)), boxes.get, 2, counts))
+
+    assert counts == {"keyframes": 3, "keyframes_with_faces": 1}
+    assert [None if box is None else box[0] for _, box in pairs] == [None, 8, 8, 8, 8, 8]
+
+
+def test_smoothed_boxes_moves_part_way():
+    pairs = [(0, np.array([0.0, 0, 4, 4])), (1, np.array([10.0, 0, 4, 4])), (2, None)]
+    smoothed = [box[0] for _, box in smoothed_boxes(pairs, 0.75)]
+    assert smoothed == [0, 2.5, 2.5]
+
+
+def test_crop_video_frame_directory(tmp_path):
+    source = write_frames(tmp_path / "in", [10, 12, 14, 16, 18, 20, 22])
+    detector = MovingFaceDetector()
+
+    report = crop_video(
+        video_cropper(detector), source, str(tmp_path / "out"), detect_every=3
+    )
+
+    assert detector.calls == 3
+    assert report.frames == 7
+    assert (report.keyframes, report.keyframes_with_faces) == (3, 3)
+    assert report.source_fps is None
+    assert report.fps > 0
+    names = sorted(os.listdir(tmp_path / "out"))
+    assert names == [f"frame_{i:06d}.png" for i in range(7)]
+    assert cv2.imread(str(tmp_path / "out" / names[0])).shape == (24, 24, 3)
+
+
+def test_crop_video_file_round_trip(tmp_path):
+    source = str(tmp_path / "in.avi")
+    with FrameWriter(source, fps=10) as writer:
+        for _ in range(8):
+            writer.write(np.full(FRAME_SHAPE, 128, dtype=np.uint8))
+
+    report = crop_video(video_cropper(), source, str(tmp_path / "out.avi"), detect_every=4)
+
+    assert report.source_fps == pytest.approx(10)
+    assert (report.frames, report.keyframes, report.keyframes_with_faces) == (8, 2, 2)
+    frames, fps = open_frames(str(tmp_path / "out.avi"))
+    shapes = [f.shape for f in frames]
+    assert fps == pytest.approx(10)
+    assert shapes == [(24, 24, 3)] * 8
+
+
+def test_crop_video_real_face(tmp_path):
+    face = cv2.imread("tests/data/obama.jpg")
+    source = tmp_path / "in"
+    source.mkdir()
+    for i in range(4):
+        canvas = np.full((face.shape[0] + 40, face.shape[1] + 40, 3), 60, dtype=np.uint8)
+        canvas[20 + i : 20 + i + face.shape[0], 20:20 + face.shape[1]] = face
+        cv2.imwrite(str(source / f"{i}.jpg"), canvas)
+
+    report = crop_video(Cropper(width=64, height=64), str(source), str(tmp_path / "out.mp4"))
+
+    assert (report.frames, report.keyframes, report.keyframes_with_faces) == (4, 1, 1)
+
+
+def test_crop_video_requires_resize(tmp_path):
+    with pytest.raises(ValueError):
+        crop_video(Cropper(resize=False), str(tmp_path), str(tmp_path / "out"))
+
+
+def test_open_frames_missing_video(tmp_path):
+    with pytest.raises(OSError):
+        open_frames(str(tmp_path / "missing.mp4"))
+
+
+def test_cli_video(tmp_path, capsys):
+    source = write_frames(tmp_path / "in", [10, 20, 30])
+    output = tmp_path / "out.avi"
+    sys.argv = [
+        "autocrop", "video", source, "-o", str(output), "-w", "32", "-H", "32",
+        "--detect-every", "2", "--fps", "12",
+    ]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+
+    assert e.value.code == 0
+    assert output.exists()
+    assert "Video: 3 frames" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("option", [["--smoothing", "1"], ["--detect-every", "0"], ["--fps", "0"]])
+def test_cli_video_rejects_invalid_options(tmp_path, option):
+    sys.argv = ["autocrop", "video", str(tmp_path), "-o", str(tmp_path / "out")] + option
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 2
+
+
+def test_cli_video_missing_source(tmp_path, capsys):
+    sys.argv = ["autocrop", "video", str(tmp_path / "missing.mp4"), "-o", str(tmp_path / "out.mp4")]
+    with pytest.raises(SystemExit) as e:
+        command_line_interface()
+    assert e.value.code == 2
+    assert "Input does not exist" in capsys.readouterr().err